@@ -0,0 +1,123 @@
+"""
+Read-through cache for public slot availability.
+
+Every student sees the same free slots, so the rendered JSON of the slot list and
+of /horarios/fechas-disponibles/ is cached per query string. Each entry depends
+on version stamps of the (especialista, fecha) cells its filters cover:
+
+- a range of at most MAX_DIAS_DETALLADOS days depends on one stamp per day: the
+  specialist's own (`esp:<id>:<fecha>`) when the query filters by specialist,
+  otherwise the all-specialists one (`*:<fecha>`);
+- wider or open-ended ranges depend on one stamp, `esp:<id>` or `*`.
+
+When a slot changes, `invalidar()` renews every stamp covering its cell, so only
+the entries that could contain that slot miss. Stamps are `time.time_ns()`
+values, which also give Last-Modified. A stamp evicted from the cache is
+recreated with a new value, so eviction can only invalidate old entries and
+never bring them back.
+"""
+
+import hashlib
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+MAX_DIAS_DETALLADOS = 31
+PREFIJO_SELLO = 'agenda:sello:'
+PREFIJO_ENTRADA = 'agenda:disponibilidad:'
+
+
+def _cache():
+    return caches[settings.AGENDA_CACHE_ALIAS]
+
+
+def _sellos_de_celda(especialista_id, fecha):
+    return (f'*:{fecha}', f'esp:{especialista_id}:{fecha}', '*', f'esp:{especialista_id}')
+
+
+def dependencias(filtros, hoy=None):
+    """Stamp names a query with these (validated) HorarioFiltroSerializer filters depends on."""
+    hoy = hoy or date.today()
+    especialista = filtros.get('especialista')
+    desde = max(filtros.get('desde') or hoy, hoy)
+    hasta = filtros.get('hasta')
+    if hasta is not None and hasta < desde:
+        return []
+    if hasta is not None and (hasta - desde).days < MAX_DIAS_DETALLADOS:
+        prefijo = f'esp:{especialista}:' if especialista else '*:'
+        return [f'{prefijo}{desde + timedelta(days=i)}' for i in range((hasta - desde).days + 1)]
+    return [f'esp:{especialista}' if especialista else '*']
+
+
+def _leer_sellos(nombres):
+    cache = _cache()
+    claves = [PREFIJO_SELLO + nombre for nombre in nombres]
+    sellos = cache.get_many(claves)
+    faltantes = [clave for clave in claves if clave not in sellos]
+    if faltantes:
+        for clave in faltantes:
+            # add() so a concurrent invalidation is never overwritten
+            cache.add(clave, time.time_ns(), timeout=None)
+        sellos.update(cache.get_many(faltantes))
+    return [sellos[clave] for clave in claves]
+
+
+def invalidar(celdas):
+    """
+    Renew the stamps of every `(especialista_id, fecha)` in `celdas`.
+
+    Renewed right away, so later reads in this transaction miss, and again after
+    commit, so a reader that cached the pre-commit rows under the first renewal
+    is invalidated too.
+    """
+    claves = {PREFIJO_SELLO + nombre for celda in celdas for nombre in _sellos_de_celda(*celda)}
+    if not claves:
+        return
+
+    def renovar():
+        _cache().set_many(dict.fromkeys(claves, time.time_ns()), timeout=None)
+
+    renovar()
+    transaction.on_commit(renovar)
+
+
+def respuesta_en_cache(request, filtros, calcular):
+    """
+    Serve a public availability response from the cache.
+
+    `calcular()` is only called on a miss and must return `(contenido, content_type)`.
+    Conditional requests whose ETag or Last-Modified still match get a 304 after
+    a single cache read.
+    """
+    hoy = date.today()
+    sellos = _leer_sellos(dependencias(filtros, hoy))
+    variante = f'{request.get_host()}{request.get_full_path()}|{hoy}|{sellos}'
+    etag = '"%s"' % hashlib.blake2b(variante.encode(), digest_size=12).hexdigest()
+    ultima_modificacion = max(sellos) // 1_000_000_000 if sellos else None
+    if ultima_modificacion is not None and ultima_modificacion >= int(time.time()):
+        # HTTP dates have one-second resolution: a second that has not ended yet could
+        # still see another change with the same Last-Modified, so rely on the ETag.
+        ultima_modificacion = None
+
+    response = get_conditional_response(request, etag=etag, last_modified=ultima_modificacion)
+    if response is None:
+        clave = PREFIJO_ENTRADA + etag
+        entrada = _cache().get(clave)
+        if entrada is None:
+            entrada = calcular()
+            _cache().set(clave, entrada, settings.AGENDA_CACHE_TIMEOUT)
+        contenido, content_type = entrada
+        response = HttpResponse(contenido, content_type=content_type)
+
+    response['ETag'] = etag
+    if ultima_modificacion is not None:
+        response['Last-Modified'] = http_date(ultima_modificacion)
+    # Stored by the browser but revalidated on every use
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,115 @@
+"""
+Bulk creation of HorarioDisponible rows, from explicit lists or recurring templates.
+
+Everything a batch needs to be validated is read with one query (the existing
+slots of the involved specialists in the batch's date range); the checks run in
+memory (see agenda.solapamientos) and the valid rows are inserted with a single
+bulk_create.
+"""
+
+from datetime import date, datetime, timedelta
+
+from django.db import IntegrityError, transaction
+
+from .cache import invalidar
+from .models import HorarioDisponible
+from .solapamientos import separar_solapados
+
+DIAS_HABILES = (0, 1, 2, 3, 4)
+BULK_BATCH_SIZE = 1000
+
+
+class AgendaModificada(Exception):
+    """A concurrent insert hit the unique constraint between the read and the bulk insert."""
+
+
+def expandir_plantilla(plantilla, desde=None):
+    """Yield one unsaved HorarioDisponible per block defined by `plantilla`, from `desde` on."""
+    dia = max(plantilla.fecha_inicio, desde or date.today())
+    duracion = timedelta(minutes=plantilla.duracion_minutos)
+    paso = duracion + timedelta(minutes=plantilla.descanso_minutos)
+    dias = set(plantilla.dias_semana)
+
+    while dia <= plantilla.fecha_fin:
+        if dia.weekday() in dias:
+            bloque = datetime.combine(dia, plantilla.hora_inicio)
+            limite = datetime.combine(dia, plantilla.hora_fin)
+            while bloque + duracion <= limite:
+                yield HorarioDisponible(
+                    especialista_id=plantilla.especialista_id,
+                    fecha=dia,
+                    hora_inicio=bloque.time(),
+                    hora_fin=(bloque + duracion).time(),
+                )
+                bloque += paso
+        dia += timedelta(days=1)
+
+
+def _horarios_existentes(horarios):
+    """Existing slots that may collide with the batch, read with one query."""
+    if not horarios:
+        return []
+    especialistas = {h.especialista_id for h in horarios}
+    fechas = [h.fecha for h in horarios]
+    return list(HorarioDisponible.objects.filter(
+        especialista_id__in=especialistas,
+        fecha__gte=min(fechas),
+        fecha__lte=max(fechas),
+    ).values_list('especialista_id', 'fecha', 'hora_inicio', 'hora_fin'))
+
+
+def _motivo_invalido(horario, hoy):
+    if horario.fecha.weekday() not in DIAS_HABILES:
+        return "Las citas solo pueden programarse de Lunes a Viernes."
+    if horario.fecha < hoy:
+        return "No se pueden crear horarios en fechas pasadas."
+    if horario.hora_inicio >= horario.hora_fin:
+        return "La hora de inicio debe ser anterior a la hora de fin."
+    return None
+
+
+def _conflicto(indice, horario, motivo):
+    return {
+        'indice': indice,
+        'fecha': horario.fecha,
+        'hora_inicio': horario.hora_inicio,
+        'hora_fin': horario.hora_fin,
+        'error': motivo,
+    }
+
+
+def crear_en_lote(horarios, dry_run=False):
+    """
+    Validate unsaved `horarios` against the agenda and each other and insert the valid ones.
+
+    Returns `(creados, conflictos)`: the number of rows inserted (or that would be,
+    with `dry_run`) and one report entry per rejected row, keyed by its position.
+    """
+    hoy = date.today()
+    candidatos, conflictos = [], []
+    for indice, horario in enumerate(horarios):
+        motivo = _motivo_invalido(horario, hoy)
+        if motivo:
+            conflictos.append(_conflicto(indice, horario, motivo))
+        else:
+            candidatos.append((indice, horario))
+
+    existentes = _horarios_existentes([horario for _, horario in candidatos])
+    aceptados, solapados = separar_solapados(existentes, [
+        (h.especialista_id, h.fecha, h.hora_inicio, h.hora_fin) for _, h in candidatos
+    ])
+    validos = [candidatos[posicion][1] for posicion in aceptados]
+    for posicion in solapados:
+        indice, horario = candidatos[posicion]
+        conflictos.append(_conflicto(indice, horario, "Se empalma con otro horario del especialista."))
+    conflictos.sort(key=lambda conflicto: conflicto['indice'])
+
+    if validos and not dry_run:
+        try:
+            with transaction.atomic():
+                HorarioDisponible.objects.bulk_create(validos, batch_size=BULK_BATCH_SIZE)
+        except IntegrityError as exc:
+            raise AgendaModificada from exc
+        # bulk_create sends no post_save signals
+        invalidar({(horario.especialista_id, horario.fecha) for horario in validos})
+    return len(validos), conflictos
@@ -0,0 +1,62 @@
+import json
+import time
+
+from django.core.cache import caches
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+
+from citas.benchmarks import proximo_dia_habil, sembrar_horarios, sembrar_usuarios
+from sistema_citas.benchmarks import base_de_datos_temporal, percentiles
+from usuarios.models import Usuario
+
+
+class Command(BaseCommand):
+    help = (
+        "Latency of the public slot list (booking page query) on a throwaway database: "
+        "cache miss, cache hit and conditional 304, through the full request stack."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--especialistas', type=int, default=20)
+        parser.add_argument('--horarios', type=int, default=200, help="Slots per specialist.")
+        parser.add_argument('--peticiones', type=int, default=500)
+
+    def handle(self, *args, **options):
+        with base_de_datos_temporal():
+            resultado = self.medir(options['especialistas'], options['horarios'], options['peticiones'])
+        self.stdout.write(json.dumps(resultado, indent=2))
+
+    def medir(self, n_especialistas, n_horarios, n_peticiones):
+        for especialista in sembrar_usuarios(n_especialistas, rol=Usuario.Roles.ESPECIALISTA, prefijo='especialista'):
+            sembrar_horarios(especialista, n_horarios)
+        alumno = sembrar_usuarios(1)[0]
+        client = APIClient()
+        client.force_authenticate(alumno)
+        dia = proximo_dia_habil().isoformat()
+        url = f'/api/agenda/horarios/?disponible=true&desde={dia}&hasta={dia}'
+        cache = caches[settings.AGENDA_CACHE_ALIAS]
+
+        def medir(peticion, antes=None):
+            muestras = []
+            for _ in range(n_peticiones):
+                if antes:
+                    antes()
+                inicio = time.perf_counter()
+                response = peticion()
+                muestras.append(time.perf_counter() - inicio)
+            return response, percentiles(muestras)
+
+        response, sin_cache = medir(lambda: client.get(url), antes=cache.clear)
+        etag = response['ETag']
+        _, acierto = medir(lambda: client.get(url))
+        response, no_modificado = medir(lambda: client.get(url, headers={'if-none-match': etag}))
+        assert response.status_code == 304
+        return {
+            'horarios': n_especialistas * n_horarios,
+            'peticiones': n_peticiones,
+            'bytes_respuesta': len(client.get(url).content),
+            'fallo_de_cache': sin_cache,
+            'acierto_de_cache': acierto,
+            'no_modificado_304': no_modificado,
+        }
@@ -0,0 +1,109 @@
+import re
+from datetime import date, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Count
+
+from agenda.models import HorarioDisponible
+from citas.models import Cita
+
+# Placeholder ids; EXPLAIN only needs the shape of the query, not real rows.
+USER_ID = 1
+
+# Any SQLite "SCAN table", with or without "USING [COVERING] INDEX": walking a whole
+# index is reading the whole table. Only "SEARCH ... (col=? / col>?)" seeks.
+_SQLITE_SCAN = re.compile(r'^.*\bSCAN (?!CONSTANT ROW)(?!SUBQUERY).*$', re.MULTILINE)
+_POSTGRESQL_INDEX_SCAN = re.compile(r'\bIndex (Only )?Scan\b')
+_MYSQL_FULL_SCAN = re.compile(r"^.*\btype\W+ALL\b.*$", re.MULTILINE)
+
+
+def _postgresql_full_scans(plan):
+    """Seq Scans, and Index (Only) Scans without an Index Cond, which read the whole index."""
+    lines = plan.splitlines()
+    found = []
+    for i, line in enumerate(lines):
+        if 'Seq Scan on' in line:
+            found.append(line.strip())
+        elif _POSTGRESQL_INDEX_SCAN.search(line) and 'Bitmap' not in line:
+            indent = len(line) - len(line.lstrip())
+            details = []
+            # A node's own details come right after it, indented deeper, before its children
+            for detail in lines[i + 1:]:
+                if len(detail) - len(detail.lstrip()) <= indent or detail.lstrip().startswith('->'):
+                    break
+                details.append(detail.strip())
+            if not any(detail.startswith('Index Cond:') for detail in details):
+                found.append(line.strip())
+    return found
+
+
+FULL_SCAN_RULES = {
+    'sqlite': _SQLITE_SCAN.findall,
+    'postgresql': _postgresql_full_scans,
+    'mysql': _MYSQL_FULL_SCAN.findall,
+}
+
+
+def hot_queries():
+    """The queries behind the agenda/citas endpoints, as built by the application code."""
+    today = date.today()
+    publicos = HorarioDisponible.objects.filter(disponible=True, fecha__gte=today)
+    propios = HorarioDisponible.objects.filter(especialista_id=USER_ID)
+    # HorarioViewSet.get_visible_queryset for a specialist
+    visibles = HorarioDisponible.objects.filter(pk__in=publicos.values('pk').union(propios.values('pk')))
+    return [
+        ('horarios publicos',
+         publicos.order_by('fecha', 'hora_inicio', 'id')),
+        ('horarios del especialista',
+         visibles.order_by('fecha', 'hora_inicio', 'id')),
+        ('horarios por rango y especialista',
+         publicos.filter(fecha__lte=today, especialista_id=USER_ID).order_by('fecha', 'hora_inicio', 'id')),
+        ('fechas disponibles',
+         publicos.values('fecha').annotate(libres=Count('id')).order_by('fecha')),
+        ('horario duplicado',
+         HorarioDisponible.objects.filter(especialista_id=USER_ID, fecha=today, hora_inicio=time(9))),
+        ('citas del alumno',
+         Cita.objects.con_detalles().filter(alumno_id=USER_ID).order_by('-fecha_creacion', '-id')),
+        ('citas del especialista',
+         Cita.objects.con_detalles().filter(especialista_id=USER_ID).order_by('-fecha_creacion', '-id')),
+        ('cita activa del alumno',
+         Cita.objects.filter(alumno_id=USER_ID, estado__in=[Cita.Estado.PENDIENTE, Cita.Estado.CONFIRMADA])),
+        ('citas del especialista por estado',
+         Cita.objects.filter(especialista_id=USER_ID, estado=Cita.Estado.PENDIENTE)),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Runs EXPLAIN on the hot agenda/citas queries and fails if any of them does a full table scan."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--verbose-plans', action='store_true', help="Print every plan, not only failures.")
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        full_scans = FULL_SCAN_RULES.get(connection.vendor)
+        if full_scans is None:
+            raise CommandError(f"No hay reglas de plan para el backend '{connection.vendor}'.")
+
+        failures = []
+        with transaction.atomic(using=options['database']):
+            if connection.vendor == 'postgresql':
+                # On small tables the planner prefers a seq scan even when an index exists.
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for name, queryset in hot_queries():
+                plan = queryset.using(options['database']).explain()
+                full_scan = full_scans(plan)
+                if full_scan:
+                    failures.append(name)
+                    self.stdout.write(self.style.ERROR(f"FULL SCAN  {name}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"ok         {name}"))
+                if full_scan or options['verbose_plans']:
+                    self.stdout.write(f"    {plan}".replace('\n', '\n    '))
+
+        if failures:
+            raise CommandError(f"{len(failures)} consulta(s) sin índice: {', '.join(failures)}")
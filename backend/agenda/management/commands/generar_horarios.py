@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from agenda.generacion import AgendaModificada, crear_en_lote, expandir_plantilla
+from agenda.models import PlantillaHorario
+
+
+class Command(BaseCommand):
+    help = "Expands recurring availability templates into HorarioDisponible rows with a single bulk insert."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--especialista', type=int, action='append', help="Only this specialist (repeatable).")
+        parser.add_argument('--plantilla', type=int, action='append', help="Only this template (repeatable).")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and report without inserting.")
+
+    def handle(self, *args, **options):
+        plantillas = PlantillaHorario.objects.all()
+        if options['especialista']:
+            plantillas = plantillas.filter(especialista_id__in=options['especialista'])
+        if options['plantilla']:
+            plantillas = plantillas.filter(pk__in=options['plantilla'])
+
+        inicio = time.perf_counter()
+        horarios = [horario for plantilla in plantillas for horario in expandir_plantilla(plantilla)]
+        try:
+            creados, conflictos = crear_en_lote(horarios, dry_run=options['dry_run'])
+        except AgendaModificada:
+            raise CommandError("La agenda cambió durante la generación; vuelve a ejecutar el comando.")
+        duracion = time.perf_counter() - inicio
+
+        for conflicto in conflictos:
+            self.stdout.write(
+                f"  {conflicto['fecha']} {conflicto['hora_inicio']}-{conflicto['hora_fin']}: {conflicto['error']}"
+            )
+        verbo = "se crearían" if options['dry_run'] else "creados"
+        self.stdout.write(self.style.SUCCESS(
+            f"{creados} horarios {verbo}, {len(conflictos)} conflictos en {duracion:.2f}s"
+        ))
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-17 18:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='horariodisponible',
+            index=models.Index(condition=models.Q(('disponible', True)), fields=['fecha', 'hora_inicio'], name='horario_libre_fecha_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='horariodisponible',
+            constraint=models.UniqueConstraint(fields=('especialista', 'fecha', 'hora_inicio'), name='horario_unico_especialista_fecha_hora'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.2 on 2026-10-17 18:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0003_indices_consultas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlantillaHorario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(blank=True, max_length=100)),
+                ('dias_semana', models.JSONField(default=list)),
+                ('fecha_inicio', models.DateField()),
+                ('fecha_fin', models.DateField()),
+                ('hora_inicio', models.TimeField()),
+                ('hora_fin', models.TimeField()),
+                ('duracion_minutos', models.PositiveSmallIntegerField(default=50)),
+                ('descanso_minutos', models.PositiveSmallIntegerField(default=0)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('especialista', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='plantillas_horario', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# PostgreSQL can enforce non-overlapping slots itself. Other backends rely on the
+# range query in HorarioDisponibleSerializer.validate and the unique constraint.
+CREATE_EXCLUSION = """
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+ALTER TABLE agenda_horariodisponible
+    ADD CONSTRAINT horario_sin_solapamiento
+    EXCLUDE USING gist (
+        especialista_id WITH =,
+        tsrange(fecha + hora_inicio, fecha + hora_fin) WITH &&
+    );
+"""
+
+DROP_EXCLUSION = """
+ALTER TABLE agenda_horariodisponible DROP CONSTRAINT IF EXISTS horario_sin_solapamiento;
+"""
+
+
+def crear_restriccion(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_EXCLUSION)
+
+
+def eliminar_restriccion(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_EXCLUSION)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0004_plantillahorario'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_restriccion, eliminar_restriccion),
+    ]
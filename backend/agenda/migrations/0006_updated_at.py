@@ -0,0 +1,20 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0005_horario_sin_solapamiento'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='horariodisponible',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0006_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='horariodisponible',
+            index=models.Index(fields=['fecha', 'hora_inicio'], name='horario_fecha_hora_idx'),
+        ),
+    ]
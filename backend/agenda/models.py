@@ -7,6 +7,53 @@ class HorarioDisponible(models.Model):
     hora_inicio = models.TimeField()
     hora_fin = models.TimeField()
     disponible = models.BooleanField(default=True)
+    # Set on every save; queryset .update() calls must set it too (see sistema_citas.condicional)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['especialista', 'fecha', 'hora_inicio'],
+                name='horario_unico_especialista_fecha_hora',
+            ),
+        ]
+        indexes = [
+            # Public availability: disponible=True, fecha >= today, ordered by fecha/hora_inicio.
+            models.Index(
+                fields=['fecha', 'hora_inicio'],
+                condition=models.Q(disponible=True),
+                name='horario_libre_fecha_idx',
+            ),
+            # Time-window scans over booked slots (notificaciones.recordatorios)
+            models.Index(fields=['fecha', 'hora_inicio'], name='horario_fecha_hora_idx'),
+        ]
+
+    # (especialista_id, fecha) as loaded from the database, so a save that moves the
+    # slot can invalidate the cached availability of both cells (agenda.signals)
+    _celda_cargada = (None, None)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._celda_cargada = (instance.__dict__.get('especialista_id'), instance.__dict__.get('fecha'))
+        return instance
 
     def __str__(self):
         return f"{self.especialista} - {self.fecha} ({self.hora_inicio} - {self.hora_fin})"
+
+class PlantillaHorario(models.Model):
+    """Recurring availability, e.g. Mon–Fri 9:00–14:00 in 50-minute blocks for the semester."""
+    especialista = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='plantillas_horario')
+    nombre = models.CharField(max_length=100, blank=True)
+    # Weekdays as in date.weekday(): 0=Monday ... 4=Friday
+    dias_semana = models.JSONField(default=list)
+    fecha_inicio = models.DateField()
+    fecha_fin = models.DateField()
+    hora_inicio = models.TimeField()
+    hora_fin = models.TimeField()
+    duracion_minutos = models.PositiveSmallIntegerField(default=50)
+    descanso_minutos = models.PositiveSmallIntegerField(default=0)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.especialista} - {self.nombre or 'Plantilla'} ({self.fecha_inicio} - {self.fecha_fin})"
@@ -1,6 +1,8 @@
 from rest_framework import serializers
-from .models import HorarioDisponible
+from rest_framework.settings import api_settings
+from .models import HorarioDisponible, PlantillaHorario
 from datetime import date
+from django.db import IntegrityError, transaction
 
 class HorarioDisponibleSerializer(serializers.ModelSerializer):
     especialista_nombre = serializers.SerializerMethodField()
@@ -22,20 +24,119 @@ class HorarioDisponibleSerializer(serializers.ModelSerializer):
         return value
 
     def validate(self, data):
-        # Check for overlapping slots for the same specialist
-        user = self.context['request'].user
-        if HorarioDisponible.objects.filter(
-            especialista=user,
-            fecha=data['fecha'],
-            hora_inicio=data['hora_inicio']
-        ).exists():
-            raise serializers.ValidationError("Ya existe un horario con la misma fecha y hora de inicio.")
-        
-        if data['hora_inicio'] >= data['hora_fin']:
+        fecha = data.get('fecha', getattr(self.instance, 'fecha', None))
+        hora_inicio = data.get('hora_inicio', getattr(self.instance, 'hora_inicio', None))
+        hora_fin = data.get('hora_fin', getattr(self.instance, 'hora_fin', None))
+        if hora_inicio >= hora_fin:
             raise serializers.ValidationError("La hora de inicio debe ser anterior a la hora de fin.")
+
+        # Range predicate on the (especialista, fecha, hora_inicio) index
+        solapados = HorarioDisponible.objects.filter(
+            especialista=self.context['request'].user,
+            fecha=fecha,
+            hora_inicio__lt=hora_fin,
+            hora_fin__gt=hora_inicio,
+        )
+        if self.instance is not None:
+            solapados = solapados.exclude(pk=self.instance.pk)
+        if solapados.exists():
+            raise serializers.ValidationError("El horario se empalma con otro horario existente.")
             
         return data
 
+    def create(self, validated_data):
+        validated_data['especialista'] = self.context['request'].user
+        # A concurrent insert that slipped past validate() is caught by the unique
+        # constraint (and, on PostgreSQL, the horario_sin_solapamiento exclusion constraint)
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: ["El horario se empalma con otro horario existente."]
+            })
+
+
+class HorarioFiltroSerializer(serializers.Serializer):
+    """Query parameters accepted by the slot list and /horarios/fechas-disponibles/."""
+    desde = serializers.DateField(required=False)
+    hasta = serializers.DateField(required=False)
+    especialista = serializers.IntegerField(required=False, min_value=1)
+    departamento = serializers.IntegerField(required=False, min_value=1)
+    hora_desde = serializers.TimeField(required=False)
+    hora_hasta = serializers.TimeField(required=False)
+    # default=None so an absent parameter is not read as False (DRF's checkbox semantics)
+    disponible = serializers.BooleanField(required=False, allow_null=True, default=None)
+
+    def validate(self, data):
+        if data.get('desde') and data.get('hasta') and data['desde'] > data['hasta']:
+            raise serializers.ValidationError("'desde' debe ser anterior o igual a 'hasta'.")
+        if data.get('hora_desde') and data.get('hora_hasta') and data['hora_desde'] >= data['hora_hasta']:
+            raise serializers.ValidationError("'hora_desde' debe ser anterior a 'hora_hasta'.")
+        return data
+
+    def filter_queryset(self, queryset):
+        data = self.validated_data
+        if data.get('desde'):
+            queryset = queryset.filter(fecha__gte=data['desde'])
+        if data.get('hasta'):
+            queryset = queryset.filter(fecha__lte=data['hasta'])
+        if data.get('especialista'):
+            queryset = queryset.filter(especialista_id=data['especialista'])
+        if data.get('departamento'):
+            queryset = queryset.filter(especialista__departamento_id=data['departamento'])
+        # Time-of-day window: the whole slot must fit inside it
+        if data.get('hora_desde'):
+            queryset = queryset.filter(hora_inicio__gte=data['hora_desde'])
+        if data.get('hora_hasta'):
+            queryset = queryset.filter(hora_fin__lte=data['hora_hasta'])
+        if data.get('disponible') is not None:
+            queryset = queryset.filter(disponible=data['disponible'])
+        return queryset
+
+
+class HorarioLoteItemSerializer(serializers.Serializer):
+    fecha = serializers.DateField()
+    hora_inicio = serializers.TimeField()
+    hora_fin = serializers.TimeField()
+
+
+class HorarioLoteSerializer(serializers.Serializer):
+    # Row-level rules (weekday, past date, overlaps) are reported per row by
+    # agenda.generacion.crear_en_lote instead of failing the whole batch.
+    horarios = serializers.ListField(child=HorarioLoteItemSerializer(), allow_empty=False, max_length=10000)
+    dry_run = serializers.BooleanField(default=False)
+
+
+class PlantillaHorarioSerializer(serializers.ModelSerializer):
+    dias_semana = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=4), allow_empty=False
+    )
+
+    class Meta:
+        model = PlantillaHorario
+        fields = '__all__'
+        read_only_fields = ('especialista', 'fecha_creacion')
+
+    def validate_dias_semana(self, value):
+        return sorted(set(value))
+
+    def validate_duracion_minutos(self, value):
+        if value < 5:
+            raise serializers.ValidationError("La duración mínima de un bloque es de 5 minutos.")
+        return value
+
+    def validate(self, data):
+        fecha_inicio = data.get('fecha_inicio', getattr(self.instance, 'fecha_inicio', None))
+        fecha_fin = data.get('fecha_fin', getattr(self.instance, 'fecha_fin', None))
+        hora_inicio = data.get('hora_inicio', getattr(self.instance, 'hora_inicio', None))
+        hora_fin = data.get('hora_fin', getattr(self.instance, 'hora_fin', None))
+        if fecha_inicio > fecha_fin:
+            raise serializers.ValidationError("La fecha de inicio debe ser anterior a la fecha de fin.")
+        if hora_inicio >= hora_fin:
+            raise serializers.ValidationError("La hora de inicio debe ser anterior a la hora de fin.")
+        return data
+
     def create(self, validated_data):
         validated_data['especialista'] = self.context['request'].user
         return super().create(validated_data)
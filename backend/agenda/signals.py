@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidar
+from .models import HorarioDisponible
+
+
+@receiver(post_save, sender=HorarioDisponible)
+def horario_guardado(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    celdas = {(instance.especialista_id, instance.fecha)}
+    # A save that moves the slot to another day empties the cell it came from
+    if None not in instance._celda_cargada:
+        celdas.add(instance._celda_cargada)
+    invalidar(celdas)
+
+
+@receiver(post_delete, sender=HorarioDisponible)
+def horario_borrado(sender, instance, **kwargs):
+    invalidar([(instance.especialista_id, instance.fecha)])
@@ -0,0 +1,59 @@
+"""
+Interval-overlap detection for HorarioDisponible.
+
+Slots are half-open intervals [hora_inicio, hora_fin) within one (especialista,
+fecha): 9:00–10:00 and 10:00–11:00 can coexist, 9:00–10:00 and 9:30–10:30 cannot.
+"""
+
+from bisect import bisect_left
+from collections import defaultdict
+from itertools import accumulate
+
+
+def solapan(inicio_a, fin_a, inicio_b, fin_b):
+    return inicio_a < fin_b and inicio_b < fin_a
+
+
+def _por_dia(horarios):
+    grupos = defaultdict(list)
+    for posicion, (especialista_id, fecha, hora_inicio, hora_fin) in enumerate(horarios):
+        grupos[(especialista_id, fecha)].append((hora_inicio, hora_fin, posicion))
+    return grupos
+
+
+def separar_solapados(existentes, nuevos):
+    """
+    Split `nuevos` into the positions that can be inserted and the ones that overlap.
+
+    Both arguments are sequences of `(especialista_id, fecha, hora_inicio, hora_fin)`.
+    A new slot is rejected when it overlaps an existing slot, or a new slot that
+    starts earlier (ties: the one listed first) and was itself accepted.
+
+    Every day is resolved with sorts and one sweep, so checking N new slots against
+    M existing ones costs O((N + M) log(N + M)) instead of N queries or N * M comparisons.
+    Returns `(aceptados, rechazados)` as sorted lists of positions in `nuevos`.
+    """
+    ocupados = _por_dia(existentes)
+    aceptados, rechazados = [], []
+
+    for clave, intervalos in _por_dia(nuevos).items():
+        # Existing slots sorted by start, with the running max of their ends: a new
+        # slot overlaps one of them iff, among those starting before it ends, the
+        # latest end is after its start.
+        existentes_dia = sorted(ocupados.get(clave, ()))
+        inicios = [inicio for inicio, _, _ in existentes_dia]
+        fin_maximo = list(accumulate((fin for _, fin, _ in existentes_dia), max))
+
+        # Sweep the new slots by start; an accepted slot blocks later ones until it ends.
+        fin_aceptado = None
+        for inicio, fin, posicion in sorted(intervalos, key=lambda intervalo: (intervalo[0], intervalo[2])):
+            previos = bisect_left(inicios, fin)
+            choca_existente = previos > 0 and fin_maximo[previos - 1] > inicio
+            choca_nuevo = fin_aceptado is not None and fin_aceptado > inicio
+            if choca_existente or choca_nuevo:
+                rechazados.append(posicion)
+            else:
+                aceptados.append(posicion)
+                fin_aceptado = fin if fin_aceptado is None else max(fin_aceptado, fin)
+
+    return sorted(aceptados), sorted(rechazados)
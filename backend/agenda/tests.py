@@ -1,3 +1,289 @@
+import base64
+import json
+from datetime import date, time, timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from usuarios.models import Usuario
+from .management.commands.check_query_plans import FULL_SCAN_RULES
+from .models import HorarioDisponible
+from .solapamientos import separar_solapados
+
+
+def _proximo_dia_habil(offset=1):
+    dia = date.today() + timedelta(days=offset)
+    while dia.weekday() > 4:
+        dia += timedelta(days=1)
+    return dia
+
+
+class HorarioTestData(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.especialista = Usuario.objects.create_user(
+            username='esp', email='esp@tecnl.mx', password='x',
+            first_name='Ana', last_name='Ruiz', rol=Usuario.Roles.ESPECIALISTA,
+        )
+
+    def setUp(self):
+        # The availability cache outlives the rollback of each test
+        cache.clear()
+
+    def _client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+
+class HorarioCreateTests(HorarioTestData):
+    def test_horario_duplicado_rechazado_por_la_base_de_datos(self):
+        client = self._client(self.especialista)
+        payload = {'fecha': _proximo_dia_habil().isoformat(), 'hora_inicio': '09:00:00', 'hora_fin': '10:00:00'}
+        self.assertEqual(client.post('/api/agenda/horarios/', payload).status_code, 201)
+        response = client.post('/api/agenda/horarios/', payload)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('non_field_errors', response.data)
+        self.assertEqual(HorarioDisponible.objects.count(), 1)
+
+
+class QueryPlanTests(TestCase):
+    def test_consultas_frecuentes_usan_indices(self):
+        # Raises CommandError if any hot query falls back to a full table scan.
+        call_command('check_query_plans', stdout=StringIO())
+
+    def test_recorrer_un_indice_completo_es_un_escaneo(self):
+        self.assertTrue(FULL_SCAN_RULES['sqlite']('5 0 0 SCAN agenda_horariodisponible USING INDEX horario_fecha_hora_idx'))
+        self.assertFalse(FULL_SCAN_RULES['sqlite']('4 0 0 SEARCH agenda_horariodisponible USING INDEX horario_libre_fecha_idx (fecha>?)'))
+        recorrido = (
+            'Limit  (cost=0.29..8.31 rows=1 width=4)\n'
+            '  ->  Index Scan using horario_fecha_hora_idx on agenda_horariodisponible  (cost=0.29..80.31 rows=9 width=4)\n'
+            '        Filter: (disponible OR (especialista_id = 1))'
+        )
+        busqueda = (
+            'Index Only Scan using cita_alumno_estado_idx on citas_cita  (cost=0.15..8.17 rows=1 width=8)\n'
+            "  Index Cond: ((alumno_id = 1) AND (estado = 'PENDIENTE'))"
+        )
+        self.assertEqual(len(FULL_SCAN_RULES['postgresql'](recorrido)), 1)
+        self.assertEqual(FULL_SCAN_RULES['postgresql'](busqueda), [])
+
+
+class HorarioFiltroTests(HorarioTestData):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.otro = Usuario.objects.create_user(
+            username='otro', email='otro@tecnl.mx', password='x', rol=Usuario.Roles.ESPECIALISTA,
+        )
+        cls.dia1 = _proximo_dia_habil(1)
+        cls.dia2 = _proximo_dia_habil((cls.dia1 - date.today()).days + 1)
+        for especialista in (cls.especialista, cls.otro):
+            for dia in (cls.dia1, cls.dia2):
+                for hora in (9, 12, 16):
+                    HorarioDisponible.objects.create(
+                        especialista=especialista, fecha=dia,
+                        hora_inicio=f'{hora:02d}:00', hora_fin=f'{hora:02d}:50',
+                    )
+        HorarioDisponible.objects.filter(especialista=cls.otro, fecha=cls.dia2).update(disponible=False)
+        cls.alumno = Usuario.objects.create_user(username='alumno', email='alumno@tecnl.mx', password='x')
+
+    def _list(self, **params):
+        response = self._client(self.alumno).get('/api/agenda/horarios/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['results']
+
+    def test_rango_de_fechas(self):
+        horarios = self._list(desde=self.dia2.isoformat(), hasta=self.dia2.isoformat())
+        self.assertEqual({h['fecha'] for h in horarios}, {self.dia2.isoformat()})
+        self.assertEqual(len(horarios), 3)
+
+    def test_especialista_y_franja_horaria(self):
+        horarios = self._list(especialista=self.otro.pk, hora_desde='08:00', hora_hasta='13:00')
+        self.assertEqual(len(horarios), 2)
+        self.assertTrue(all(h['especialista'] == self.otro.pk for h in horarios))
+
+    def test_parametros_invalidos(self):
+        response = self._client(self.alumno).get('/api/agenda/horarios/', {'desde': '2030-01-10', 'hasta': '2030-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_con_valores_invalidos(self):
+        client = self._client(self.alumno)
+        for posicion in (
+            ['notadate', 'x', 1], ['2024-01-01', '25:99', 1], [{'a': 1}, 1, 1], ['2024-01-01', '10:00', 'abc'],
+            ['2024-01-01', None, 1],
+        ):
+            with self.subTest(posicion=posicion):
+                cursor = base64.urlsafe_b64encode(json.dumps(posicion).encode()).decode()
+                response = client.get('/api/agenda/horarios/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json()['detail'], 'Cursor inválido.')
+
+    def test_cursor_siguiente_pagina(self):
+        client = self._client(self.alumno)
+        pagina = client.get('/api/agenda/horarios/', {'page_size': 4}).json()
+        ids = [h['id'] for h in pagina['results']]
+        while pagina['next']:
+            pagina = client.get(pagina['next']).json()
+            ids += [h['id'] for h in pagina['results']]
+        self.assertEqual(ids, [h['id'] for h in self._list(page_size=500)])
+
+    def test_fechas_disponibles(self):
+        response = self._client(self.alumno).get('/api/agenda/horarios/fechas-disponibles/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(f['fecha'], f['libres']) for f in response.json()],
+            [(self.dia1.isoformat(), 6), (self.dia2.isoformat(), 3)],
+        )
+        response = self._client(self.alumno).get(
+            '/api/agenda/horarios/fechas-disponibles/', {'especialista': self.otro.pk}
+        )
+        self.assertEqual([f['libres'] for f in response.json()], [3])
+
+
+class HorarioLoteTests(HorarioTestData):
+    def test_lote_crea_validos_y_reporta_conflictos(self):
+        dia = _proximo_dia_habil()
+        HorarioDisponible.objects.create(
+            especialista=self.especialista, fecha=dia, hora_inicio='09:00', hora_fin='10:00'
+        )
+        payload = {'horarios': [
+            {'fecha': dia.isoformat(), 'hora_inicio': '09:30', 'hora_fin': '10:30'},  # overlaps existing
+            {'fecha': dia.isoformat(), 'hora_inicio': '10:00', 'hora_fin': '11:00'},
+            {'fecha': dia.isoformat(), 'hora_inicio': '10:30', 'hora_fin': '11:30'},  # overlaps row 1
+            {'fecha': '2020-01-06', 'hora_inicio': '09:00', 'hora_fin': '10:00'},  # past
+        ]}
+        # One read of the existing agenda and one INSERT (inside a savepoint)
+        with self.assertNumQueries(4):
+            response = self._client(self.especialista).post('/api/agenda/horarios/lote/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['creados'], 1)
+        self.assertEqual([c['indice'] for c in response.data['conflictos']], [0, 2, 3])
+        self.assertEqual(HorarioDisponible.objects.filter(especialista=self.especialista).count(), 2)
+
+    def test_plantilla_genera_bloques(self):
+        inicio = _proximo_dia_habil()
+        client = self._client(self.especialista)
+        response = client.post('/api/agenda/plantillas/', {
+            'nombre': 'Semestre',
+            'dias_semana': [0, 1, 2, 3, 4],
+            'fecha_inicio': inicio.isoformat(),
+            'fecha_fin': (inicio + timedelta(days=13)).isoformat(),
+            'hora_inicio': '09:00',
+            'hora_fin': '14:00',
+            'duracion_minutos': 50,
+            'descanso_minutos': 10,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        url = f"/api/agenda/plantillas/{response.data['id']}/generar/"
+
+        preview = client.post(url + '?dry_run=true')
+        self.assertEqual(preview.status_code, 200)
+        self.assertEqual(HorarioDisponible.objects.count(), 0)
+
+        response = client.post(url)
+        self.assertEqual(response.status_code, 201)
+        # 10 weekdays x 5 blocks (9:00, 10:00, ... 13:00)
+        self.assertEqual(response.data['creados'], 50)
+        self.assertEqual(response.data['creados'], preview.data['creados'])
+
+        # Generating again only reports conflicts
+        response = client.post(url)
+        self.assertEqual(response.data['creados'], 0)
+        self.assertEqual(len(response.data['conflictos']), 50)
+
+
+class SolapamientoTests(HorarioTestData):
+    def test_alta_individual_rechaza_empalmes(self):
+        client = self._client(self.especialista)
+        dia = _proximo_dia_habil().isoformat()
+        self.assertEqual(
+            client.post('/api/agenda/horarios/', {'fecha': dia, 'hora_inicio': '09:00', 'hora_fin': '10:00'}).status_code,
+            201,
+        )
+        response = client.post('/api/agenda/horarios/', {'fecha': dia, 'hora_inicio': '09:30', 'hora_fin': '10:30'})
+        self.assertEqual(response.status_code, 400)
+        # Back-to-back slots are fine
+        response = client.post('/api/agenda/horarios/', {'fecha': dia, 'hora_inicio': '10:00', 'hora_fin': '11:00'})
+        self.assertEqual(response.status_code, 201)
+
+    def test_barrido(self):
+        dia = date(2030, 1, 7)
+        existentes = [(1, dia, time(9), time(10)), (1, dia, time(12), time(13)), (2, dia, time(9), time(17))]
+        nuevos = [
+            (1, dia, time(8), time(9)),        # 0: ends where an existing one starts
+            (1, dia, time(9, 30), time(10)),   # 1: inside existing
+            (1, dia, time(10), time(12)),      # 2: fills the gap exactly
+            (1, dia, time(11), time(11, 30)),  # 3: inside accepted 2
+            (1, dia, time(11, 30), time(12, 30)),  # 4: overlaps existing 12:00
+            (2, date(2030, 1, 8), time(9), time(10)),  # 5: other day
+            (1, dia, time(7), time(14)),       # 6: spans everything
+        ]
+        self.assertEqual(separar_solapados(existentes, nuevos), ([0, 2, 5], [1, 3, 4, 6]))
+
+
+class DisponibilidadCacheTests(HorarioTestData):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.otro = Usuario.objects.create_user(
+            username='otro', email='otro@tecnl.mx', password='x', rol=Usuario.Roles.ESPECIALISTA,
+        )
+        cls.alumno = Usuario.objects.create_user(username='alumno', email='alumno@tecnl.mx', password='x')
+        cls.dia = _proximo_dia_habil()
+        cls.horario = HorarioDisponible.objects.create(
+            especialista=cls.especialista, fecha=cls.dia, hora_inicio=time(9), hora_fin=time(10),
+        )
+
+    def _get(self, **headers):
+        params = {'desde': self.dia.isoformat(), 'hasta': self.dia.isoformat(), 'especialista': self.especialista.pk}
+        return self._client(self.alumno).get('/api/agenda/horarios/', params, headers=headers)
+
+    def _crear(self, especialista, hora):
+        return HorarioDisponible.objects.create(
+            especialista=especialista, fecha=self.dia, hora_inicio=time(hora), hora_fin=time(hora, 50),
+        )
+
+    def test_acierto_sin_consultas_y_304(self):
+        primera = self._get()
+        with self.assertNumQueries(0):
+            segunda = self._get()
+        self.assertEqual(segunda.content, primera.content)
+        self.assertEqual(segunda['ETag'], primera['ETag'])
+        with self.assertNumQueries(0):
+            response = self._get(if_none_match=primera['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_invalidacion_precisa_por_especialista_y_dia(self):
+        self._get()
+        # Another specialist's slot on the same day does not touch this entry
+        self._crear(self.otro, 11)
+        with self.assertNumQueries(0):
+            self._get()
+
+        etag = self._get()['ETag']
+        self._crear(self.especialista, 11)
+        response = self._get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_reserva_y_rechazo_invalidan(self):
+        self.assertEqual(len(self._get().json()['results']), 1)
+        response = self._client(self.alumno).post(
+            '/api/citas/citas/', {'horario_id': self.horario.pk, 'motivo': 'Motivo'}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self._get().json()['results'], [])
+
+        self._client(self.especialista).post(f"/api/citas/citas/{response.data['id']}/rechazar/")
+        self.assertEqual(len(self._get().json()['results']), 1)
 
-# Create your tests here.
+    def test_mover_horario_invalida_ambos_dias(self):
+        self.assertEqual(len(self._get().json()['results']), 1)
+        horario = HorarioDisponible.objects.get(pk=self.horario.pk)
+        horario.fecha = _proximo_dia_habil((self.dia - date.today()).days + 1)
+        horario.save()
+        self.assertEqual(self._get().json()['results'], [])
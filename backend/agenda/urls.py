@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import HorarioViewSet
+from .views import HorarioViewSet, PlantillaHorarioViewSet
 
 router = DefaultRouter()
 router.register(r'horarios', HorarioViewSet, basename='horario')
+router.register(r'plantillas', PlantillaHorarioViewSet, basename='plantilla-horario')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,7 +1,22 @@
-from rest_framework import viewsets, permissions
-from .models import HorarioDisponible
-from .serializers import HorarioDisponibleSerializer
+from datetime import date
+from functools import lru_cache
+from django.db.models import Count
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from .cache import respuesta_en_cache
+from .generacion import AgendaModificada, crear_en_lote, expandir_plantilla
+from .models import HorarioDisponible, PlantillaHorario
+from .serializers import (
+    HorarioDisponibleSerializer,
+    HorarioFiltroSerializer,
+    HorarioLoteSerializer,
+    PlantillaHorarioSerializer,
+)
 from usuarios.models import Usuario
+from sistema_citas.condicional import ConditionalGetMixin
+from sistema_citas.pagination import KeysetPagination, StreamingListMixin
+from sistema_citas.routers import ReplicaReadMixin
 
 class IsEspecialistaOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -9,11 +24,44 @@ class IsEspecialistaOrReadOnly(permissions.BasePermission):
             return True
         return request.user.is_authenticated and request.user.rol == Usuario.Roles.ESPECIALISTA
 
-class HorarioViewSet(viewsets.ModelViewSet):
+class IsEspecialista(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and request.user.rol == Usuario.Roles.ESPECIALISTA
+
+def _respuesta_lote(creados, conflictos, dry_run):
+    body = {"creados": creados, "conflictos": conflictos}
+    if dry_run or not creados:
+        return Response(body, status=status.HTTP_200_OK)
+    return Response(body, status=status.HTTP_201_CREATED)
+
+def _agenda_modificada():
+    return Response(
+        {"error": "La agenda cambió mientras se generaban los horarios. Intenta de nuevo."},
+        status=status.HTTP_409_CONFLICT,
+    )
+
+@lru_cache(maxsize=1024)
+def _filtros_publicos(parametros):
+    # Validated once per distinct query string: the cache-hit path never builds a serializer
+    filtros = HorarioFiltroSerializer(data=dict(parametros))
+    filtros.is_valid(raise_exception=True)
+    return filtros.validated_data
+
+class HorarioPagination(KeysetPagination):
+    ordering = ('fecha', 'hora_inicio', 'id')
+
+class HorarioViewSet(ReplicaReadMixin, ConditionalGetMixin, StreamingListMixin, viewsets.ModelViewSet):
     serializer_class = HorarioDisponibleSerializer
     permission_classes = [IsEspecialistaOrReadOnly]
+    pagination_class = HorarioPagination
+    replica_actions = ('list', 'fechas_disponibles')
+    # especialista_nombre
+    fingerprint_related = ('especialista__updated_at',)
 
     def get_queryset(self):
+        return self.filter_by_params(self.get_visible_queryset()).select_related('especialista')
+
+    def get_visible_queryset(self):
         # Everyone can see available slots
         # Specialists can see their own slots (even if booked)
         if self.request.user.is_staff:
@@ -24,8 +72,96 @@ class HorarioViewSet(viewsets.ModelViewSet):
         if self.request.user.is_authenticated and self.request.user.rol == Usuario.Roles.ESPECIALISTA:
              # Specialist sees their own schedule including taken slots
              my_slots = HorarioDisponible.objects.filter(especialista=self.request.user)
-             return (queryset | my_slots).distinct()
+             # A UNION of ids lets each branch seek its own index; an OR of the two
+             # filters can only be answered by walking the whole table
+             return HorarioDisponible.objects.filter(pk__in=queryset.values('pk').union(my_slots.values('pk')))
              
         return queryset
 
-from datetime import date
+    def get_filtros(self):
+        if not hasattr(self, '_filtros'):
+            filtros = HorarioFiltroSerializer(data=self.request.query_params)
+            filtros.is_valid(raise_exception=True)
+            self._filtros = filtros
+        return self._filtros
+
+    def filter_by_params(self, queryset):
+        if self.action not in ('list', 'fechas_disponibles'):
+            return queryset
+        return self.get_filtros().filter_queryset(queryset)
+
+    def usa_cache_publico(self):
+        # Students (and anonymous readers) all get the same answer; specialists
+        # and staff also see taken slots, and streamed exports are not cached.
+        user = self.request.user
+        return (
+            not user.is_staff
+            and getattr(user, 'rol', None) != Usuario.Roles.ESPECIALISTA
+            and self.request.accepted_renderer.format == 'json'
+            and self.request.query_params.get(self.stream_query_param, '').lower() not in ('1', 'true')
+        )
+
+    def conditional_get_enabled(self):
+        # The public list has its own cached ETags (agenda.cache)
+        return super().conditional_get_enabled() and not (self.action == 'list' and self.usa_cache_publico())
+
+    def respuesta_publica(self, vista, request, *args, **kwargs):
+        if not self.usa_cache_publico():
+            return vista(request, *args, **kwargs)
+
+        def calcular():
+            response = self.finalize_response(request, vista(request, *args, **kwargs), *args, **kwargs)
+            response.render()
+            return response.content, response['Content-Type']
+
+        filtros = _filtros_publicos(tuple(sorted(request.query_params.items())))
+        return respuesta_en_cache(request, filtros, calcular)
+
+    def list(self, request, *args, **kwargs):
+        return self.respuesta_publica(super().list, request, *args, **kwargs)
+
+    @action(detail=False, methods=['get'], url_path='fechas-disponibles', pagination_class=None)
+    def fechas_disponibles(self, request):
+        """Dates that still have free slots, with how many, for the booking calendar."""
+        return self.respuesta_publica(self._fechas_disponibles, request)
+
+    def _fechas_disponibles(self, request):
+        queryset = self.filter_by_params(
+            HorarioDisponible.objects.filter(disponible=True, fecha__gte=date.today())
+        )
+        fechas = queryset.values('fecha').annotate(libres=Count('id')).order_by('fecha')
+        return Response(list(fechas))
+
+    @action(detail=False, methods=['post'], permission_classes=[IsEspecialista])
+    def lote(self, request):
+        """Create many slots at once; rows that collide are reported instead of failing the batch."""
+        serializer = HorarioLoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        horarios = [
+            HorarioDisponible(especialista_id=request.user.pk, **item)
+            for item in serializer.validated_data['horarios']
+        ]
+        dry_run = serializer.validated_data['dry_run']
+        try:
+            creados, conflictos = crear_en_lote(horarios, dry_run=dry_run)
+        except AgendaModificada:
+            return _agenda_modificada()
+        return _respuesta_lote(creados, conflictos, dry_run)
+
+class PlantillaHorarioViewSet(viewsets.ModelViewSet):
+    serializer_class = PlantillaHorarioSerializer
+    permission_classes = [IsEspecialista]
+
+    def get_queryset(self):
+        return PlantillaHorario.objects.filter(especialista=self.request.user).order_by('fecha_inicio', 'id')
+
+    @action(detail=True, methods=['post'])
+    def generar(self, request, pk=None):
+        """Expand the template into HorarioDisponible rows (?dry_run=true only reports)."""
+        plantilla = self.get_object()
+        dry_run = request.query_params.get('dry_run', '').lower() in ('1', 'true')
+        try:
+            creados, conflictos = crear_en_lote(expandir_plantilla(plantilla), dry_run=dry_run)
+        except AgendaModificada:
+            return _agenda_modificada()
+        return _respuesta_lote(creados, conflictos, dry_run)
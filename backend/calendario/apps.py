@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class CalendarioConfig(AppConfig):
+    name = 'calendario'
+
+    def ready(self):
+        from . import signals  # noqa: F401
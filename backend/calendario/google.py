@@ -0,0 +1,166 @@
+"""
+Minimal Google Calendar v3 client over `requests`.
+
+Only what the sync needs: batch requests (up to 50 calls in one HTTP round trip,
+as multipart/mixed) and paged, incremental event listing with sync tokens.
+GOOGLE_CALENDAR_API_URL points it at Google or at the local stub
+(calendario.stub). Authentication is either a fixed bearer token
+(GOOGLE_CALENDAR_TOKEN, what the stub expects) or the service account key in
+GOOGLE_CALENDAR_CREDENTIALS, which needs google-auth.
+"""
+
+import json
+import uuid
+from collections import namedtuple
+from email.parser import BytesParser
+from email.policy import HTTP
+
+import requests
+from django.conf import settings
+
+SCOPE = 'https://www.googleapis.com/auth/calendar'
+RUTA_LOTE = '/batch/calendar/v3'
+# Google's limit of calls per batch request
+MAXIMO_POR_LOTE = 50
+RAZONES_DE_CUOTA = {'rateLimitExceeded', 'userRateLimitExceeded', 'quotaExceeded'}
+
+Peticion = namedtuple('Peticion', 'metodo ruta cuerpo')
+Respuesta = namedtuple('Respuesta', 'estado cuerpo')
+
+
+class ErrorCalendario(Exception):
+    def __init__(self, mensaje, estado=None, cuerpo=None):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.reintentable = estado is None or es_reintentable(estado, cuerpo)
+
+
+class SyncTokenInvalido(ErrorCalendario):
+    """410 Gone on an incremental listing: the sync has to start over."""
+
+
+def es_reintentable(estado, cuerpo):
+    """Quota errors (403 rate limits and 429) and server errors are worth retrying later."""
+    if estado == 429 or estado >= 500:
+        return True
+    if estado == 403 and isinstance(cuerpo, dict):
+        errores = cuerpo.get('error', {}).get('errors', [])
+        return any(error.get('reason') in RAZONES_DE_CUOTA for error in errores)
+    return False
+
+
+_credenciales = None
+
+
+def _token():
+    if settings.GOOGLE_CALENDAR_TOKEN:
+        return settings.GOOGLE_CALENDAR_TOKEN
+    global _credenciales
+    from google.auth.transport.requests import Request
+    from google.oauth2 import service_account
+
+    if _credenciales is None:
+        _credenciales = service_account.Credentials.from_service_account_file(
+            settings.GOOGLE_CALENDAR_CREDENTIALS, scopes=[SCOPE],
+        )
+    if not _credenciales.valid:
+        _credenciales.refresh(Request())
+    return _credenciales.token
+
+
+_sesion = None
+
+
+def _http(metodo, ruta, **kwargs):
+    global _sesion
+    if _sesion is None:
+        _sesion = requests.Session()
+    kwargs.setdefault('timeout', settings.GOOGLE_CALENDAR_TIMEOUT)
+    headers = {'Authorization': f'Bearer {_token()}', **kwargs.pop('headers', {})}
+    try:
+        return _sesion.request(metodo, settings.GOOGLE_CALENDAR_API_URL + ruta, headers=headers, **kwargs)
+    except requests.RequestException as error:
+        raise ErrorCalendario(f"{metodo} {ruta}: {error}") from error
+
+
+def _json(contenido):
+    try:
+        return json.loads(contenido) if contenido.strip() else None
+    except ValueError:
+        return None
+
+
+# multipart/mixed batches, shared with the stub
+
+def codificar_http(inicio, cuerpo=None):
+    """One embedded HTTP message: request or status line, then an optional JSON body."""
+    if cuerpo is None:
+        return f'{inicio}\r\n\r\n'
+    return f'{inicio}\r\nContent-Type: application/json\r\n\r\n{json.dumps(cuerpo)}'
+
+
+def decodificar_http(texto):
+    """`(first line, JSON body or None)` of an embedded HTTP message."""
+    cabecera, _, cuerpo = texto.replace('\r\n', '\n').partition('\n\n')
+    return cabecera.split('\n', 1)[0].strip(), _json(cuerpo)
+
+
+def codificar_multipart(partes, prefijo_id=''):
+    """`partes` is [(content id, embedded HTTP message)]; returns `(content type, body bytes)`."""
+    limite = f'batch_{uuid.uuid4().hex}'
+    trozos = [
+        f'--{limite}\r\nContent-Type: application/http\r\nContent-ID: <{prefijo_id}{parte_id}>\r\n\r\n{mensaje}\r\n'
+        for parte_id, mensaje in partes
+    ]
+    return f'multipart/mixed; boundary={limite}', (''.join(trozos) + f'--{limite}--\r\n').encode()
+
+
+def decodificar_multipart(content_type, contenido):
+    """[(content id, embedded HTTP message)] of a multipart/mixed body."""
+    mensaje = BytesParser(policy=HTTP).parsebytes(f'Content-Type: {content_type}\r\n\r\n'.encode() + contenido)
+    return [
+        (parte['Content-ID'].strip('<>'), parte.get_payload(decode=True).decode())
+        for parte in mensaje.iter_parts()
+    ]
+
+
+def lote(peticiones):
+    """Send up to 50 Peticion in one batch request; returns one Respuesta per request, in order."""
+    partes = [
+        (str(i), codificar_http(f'{p.metodo} /calendar/v3{p.ruta} HTTP/1.1', p.cuerpo))
+        for i, p in enumerate(peticiones)
+    ]
+    content_type, cuerpo = codificar_multipart(partes)
+    respuesta = _http('POST', RUTA_LOTE, data=cuerpo, headers={'Content-Type': content_type})
+    if respuesta.status_code != 200:
+        raise ErrorCalendario(
+            f"Lote rechazado: HTTP {respuesta.status_code}", respuesta.status_code, _json(respuesta.text),
+        )
+    respuestas = {}
+    for parte_id, mensaje in decodificar_multipart(respuesta.headers['Content-Type'], respuesta.content):
+        linea, cuerpo = decodificar_http(mensaje)
+        respuestas[parte_id.removeprefix('response-')] = Respuesta(int(linea.split()[1]), cuerpo)
+    faltante = Respuesta(500, {'error': {'message': 'Sin respuesta en el lote'}})
+    return [respuestas.get(str(i), faltante) for i in range(len(peticiones))]
+
+
+def listar_eventos(ruta, sync_token=None, **parametros):
+    """
+    Every event page of `ruta`, incrementally from `sync_token` if given.
+
+    Returns `(eventos, next sync token)`. Raises SyncTokenInvalido when Google
+    no longer accepts the token.
+    """
+    eventos = []
+    parametros = {'syncToken': sync_token} if sync_token else parametros
+    while True:
+        respuesta = _http('GET', f'/calendar/v3{ruta}', params=parametros)
+        cuerpo = _json(respuesta.text)
+        if respuesta.status_code == 410:
+            raise SyncTokenInvalido("Sync token vencido", 410, cuerpo)
+        if respuesta.status_code != 200:
+            raise ErrorCalendario(f"GET {ruta}: HTTP {respuesta.status_code}", respuesta.status_code, cuerpo)
+        eventos.extend(cuerpo.get('items', []))
+        if 'nextPageToken' not in cuerpo:
+            return eventos, cuerpo.get('nextSyncToken', '')
+        parametros = {**parametros, 'pageToken': cuerpo['nextPageToken']}
@@ -0,0 +1,192 @@
+"""
+Per-user iCalendar (.ics) feeds, for calendar apps other than Google.
+
+Each user gets a secret URL (FeedCalendario). Calendar apps cannot send our
+tokens, so the URL itself is the credential. They poll it every few minutes,
+so:
+
+- the feed's version stamp is a one-row aggregate over the user's appointments
+  (count, newest updated_at, newest slot updated_at). It gives the ETag, and an
+  unchanged feed costs that query and an empty 304;
+- on a change, the body is streamed from a server-side cursor
+  (`values_list(...).iterator(chunk_size=ICS_FEED_CHUNK_SIZE)`), so years of
+  history are never loaded at once;
+- feeds up to ICS_FEED_CACHE_MAX_BYTES are kept in the cache under their stamp,
+  so other clients of the same user skip the query.
+"""
+
+import hashlib
+import secrets
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Max
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from citas.models import Cita
+from usuarios.models import Usuario
+
+from .models import FeedCalendario
+
+PREFIJO_CACHE = 'calendario:ics:'
+# Event UIDs must stay the same across polls, whatever host the feed is fetched through
+DOMINIO_UID = 'sistema-citas'
+CONTENT_TYPE = 'text/calendar; charset=utf-8'
+# Events are sent in chunks of about this many characters rather than one write per event
+TAMANO_TROZO = 32 * 1024
+ESTADOS_FUERA = (Cita.Estado.RECHAZADA, Cita.Estado.CANCELADA)
+CAMPOS = (
+    'pk', 'estado', 'motivo', 'fecha_creacion', 'updated_at',
+    'horario__fecha', 'horario__hora_inicio', 'horario__hora_fin',
+    'alumno__first_name', 'alumno__last_name', 'especialista__first_name', 'especialista__last_name',
+)
+
+
+def _cache():
+    return caches[settings.ICS_FEED_CACHE_ALIAS]
+
+
+def feed_de(usuario, regenerar=False):
+    """The user's FeedCalendario, created on first use; `regenerar` revokes the current URL."""
+    feed = FeedCalendario.objects.filter(usuario=usuario).first()
+    if feed is None:
+        return FeedCalendario.objects.create(usuario=usuario, token=secrets.token_urlsafe(32))
+    if regenerar:
+        feed.token = secrets.token_urlsafe(32)
+        feed.save(update_fields=['token', 'fecha_creacion'])
+    return feed
+
+
+def citas_del_feed(usuario):
+    campo = 'especialista' if usuario.rol == Usuario.Roles.ESPECIALISTA else 'alumno'
+    return Cita.objects.filter(**{campo: usuario})
+
+
+def sello(usuario):
+    """Version stamp of the user's feed; any insert, update or delete in it changes it."""
+    return list(citas_del_feed(usuario).order_by().aggregate(
+        total=Count('pk'), ultima=Max('updated_at'), horario=Max('horario__updated_at'),
+    ).values())
+
+
+def escapar(texto):
+    """TEXT value escaping (RFC 5545, 3.3.11)."""
+    return (
+        texto.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+    )
+
+
+def plegar(linea):
+    """Fold a content line at 75 octets, without splitting a UTF-8 character (RFC 5545, 3.1)."""
+    datos = linea.encode()
+    if len(datos) <= 75:
+        return linea + '\r\n'
+    partes, inicio, limite = [], 0, 75
+    while inicio < len(datos):
+        fin = min(inicio + limite, len(datos))
+        while fin < len(datos) and (datos[fin] & 0xC0) == 0x80:
+            fin -= 1
+        partes.append(datos[inicio:fin].decode())
+        inicio, limite = fin, 74  # continuation lines start with a space
+    return '\r\n '.join(partes) + '\r\n'
+
+
+def _utc(momento):
+    return momento.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _local(fecha, hora):
+    return _utc(timezone.make_aware(datetime.combine(fecha, hora)))
+
+
+def evento(fila, es_especialista):
+    """VEVENT of one CAMPOS row."""
+    (pk, estado, motivo, creada, modificada, fecha, hora_inicio, hora_fin,
+     alumno_nombre, alumno_apellido, especialista_nombre, especialista_apellido) = fila
+    if es_especialista:
+        resumen = f"Cita con {alumno_nombre} {alumno_apellido}"
+    else:
+        resumen = f"Cita con {especialista_nombre} {especialista_apellido}"
+    lineas = (
+        'BEGIN:VEVENT',
+        f'UID:cita-{pk}@{DOMINIO_UID}',
+        f'DTSTAMP:{_utc(modificada)}',
+        f'CREATED:{_utc(creada)}',
+        f'LAST-MODIFIED:{_utc(modificada)}',
+        f'DTSTART:{_local(fecha, hora_inicio)}',
+        f'DTEND:{_local(fecha, hora_fin)}',
+        f'SUMMARY:{escapar(resumen.strip())}',
+        f'DESCRIPTION:{escapar(motivo)}',
+        f'STATUS:{"TENTATIVE" if estado == Cita.Estado.PENDIENTE else "CONFIRMED"}',
+        'END:VEVENT',
+    )
+    return ''.join(plegar(linea) for linea in lineas)
+
+
+def generar(usuario):
+    """The feed as a sequence of text chunks of about TAMANO_TROZO bytes."""
+    yield (
+        'BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//TecNL//Sistema de Citas//ES\r\n'
+        'CALSCALE:GREGORIAN\r\nMETHOD:PUBLISH\r\n'
+        + plegar(f'X-WR-CALNAME:{escapar("Citas - " + usuario.get_full_name())}')
+    )
+    es_especialista = usuario.rol == Usuario.Roles.ESPECIALISTA
+    filas = (
+        citas_del_feed(usuario).exclude(estado__in=ESTADOS_FUERA)
+        .order_by('horario__fecha', 'horario__hora_inicio', 'pk')
+        .values_list(*CAMPOS)
+        .iterator(chunk_size=settings.ICS_FEED_CHUNK_SIZE)
+    )
+    trozo, tamano = [], 0
+    for fila in filas:
+        texto = evento(fila, es_especialista)
+        trozo.append(texto)
+        tamano += len(texto)
+        if tamano >= TAMANO_TROZO:
+            yield ''.join(trozo)
+            trozo, tamano = [], 0
+    trozo.append('END:VCALENDAR\r\n')
+    yield ''.join(trozo)
+
+
+def _guardar_al_terminar(trozos, clave):
+    """Pass `trozos` through, and cache them joined once the last one is sent, if they are small enough."""
+    guardados, tamano = [], 0
+    for trozo in trozos:
+        datos = trozo.encode()
+        if guardados is not None:
+            tamano += len(datos)
+            if tamano <= settings.ICS_FEED_CACHE_MAX_BYTES:
+                guardados.append(datos)
+            else:
+                guardados = None
+        yield datos
+    if guardados is not None:
+        _cache().set(clave, b''.join(guardados), settings.ICS_FEED_CACHE_TIMEOUT)
+
+
+def respuesta_feed(request, usuario):
+    etag = '"%s"' % hashlib.blake2b(
+        # token_version changes with the user's name, which titles the calendar
+        '|'.join(map(str, [usuario.pk, usuario.token_version, *sello(usuario)])).encode(), digest_size=12,
+    ).hexdigest()
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        clave = PREFIJO_CACHE + etag
+        contenido = _cache().get(clave)
+        if contenido is not None:
+            response = HttpResponse(contenido, content_type=CONTENT_TYPE)
+        else:
+            response = StreamingHttpResponse(
+                _guardar_al_terminar(generar(usuario), clave),
+                content_type=CONTENT_TYPE,
+            )
+        response['Content-Disposition'] = 'inline; filename="citas.ics"'
+    response['ETag'] = etag
+    # Revalidated on every poll; the token in the URL makes it private
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from calendario.stub import ServidorCalendario
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs a local fake of the Google Calendar API. Point GOOGLE_CALENDAR_API_URL at it and "
+        "set GOOGLE_CALENDAR_TOKEN to the same token."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--puerto', type=int, default=8089)
+        parser.add_argument('--token', default='stub', help="Bearer token the stub accepts.")
+
+    def handle(self, *args, **options):
+        servidor = ServidorCalendario((options['host'], options['puerto']), token=options['token'])
+        self.stdout.write(f"Calendario de prueba en {servidor.url} (token: {options['token']})")
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servidor.server_close()
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from calendario.sincronizacion import enviar_operaciones, sincronizar_ocupados
+
+
+class Command(BaseCommand):
+    help = (
+        "Sends queued Google Calendar operations in batch requests and pulls the specialists' "
+        "busy times back in as blocked slots, with incremental sync tokens."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=None, help="Operations claimed per batch (GOOGLE_CALENDAR_BATCH_SIZE).")
+        parser.add_argument('--loop', action='store_true', help="Keep polling instead of exiting when the outbox is empty.")
+        parser.add_argument('--intervalo', type=float, default=5.0, help="Seconds to sleep when there is nothing to send.")
+        parser.add_argument(
+            '--intervalo-ocupados', type=float, default=300.0,
+            help="Seconds between pulls of the specialists' calendars.",
+        )
+        parser.add_argument('--sin-ocupados', action='store_true', help="Only send the outbox, do not pull calendars.")
+
+    def handle(self, *args, **options):
+        ultima_lectura = None
+        try:
+            while True:
+                enviadas, fallidas = enviar_operaciones(options['lote'])
+                if enviadas or fallidas:
+                    self.stdout.write(f"{enviadas} enviadas, {fallidas} fallidas")
+                    continue
+                if not options['sin_ocupados'] and (
+                    ultima_lectura is None or time.monotonic() - ultima_lectura >= options['intervalo_ocupados']
+                ):
+                    ultima_lectura = time.monotonic()
+                    calendarios, horarios = sincronizar_ocupados()
+                    self.stdout.write(f"{calendarios} calendarios leídos, {horarios} horarios actualizados")
+                if not options['loop']:
+                    break
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            pass
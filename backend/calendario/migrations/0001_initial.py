@@ -0,0 +1,62 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:57
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('citas', '0006_ejecucionbarrido'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarioEspecialista',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('calendario_id', models.CharField(help_text="Usually the specialist's Google email", max_length=255)),
+                ('sync_token', models.CharField(blank=True, max_length=255)),
+                ('sincronizado', models.DateTimeField(blank=True, null=True)),
+                ('especialista', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='calendario', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BloqueoExterno',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('evento_id', models.CharField(max_length=255)),
+                ('inicio', models.DateTimeField()),
+                ('fin', models.DateTimeField()),
+                ('especialista', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bloqueos_externos', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['especialista', 'inicio'], name='bloqueo_inicio_idx')],
+                'constraints': [models.UniqueConstraint(fields=('especialista', 'evento_id'), name='bloqueo_unico_por_evento')],
+            },
+        ),
+        migrations.CreateModel(
+            name='OperacionCalendario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('calendario_id', models.CharField(max_length=255)),
+                ('evento_id', models.CharField(max_length=255)),
+                ('accion', models.CharField(choices=[('CREAR', 'Crear'), ('ACTUALIZAR', 'Actualizar'), ('BORRAR', 'Borrar')], max_length=10)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('ENVIADA', 'Enviada'), ('FALLIDA', 'Fallida')], default='PENDIENTE', max_length=10)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_envio', models.DateTimeField(blank=True, null=True)),
+                ('cita', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='operaciones_calendario', to='citas.cita')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('estado', 'PENDIENTE')), fields=['proximo_intento'], name='operacion_pendiente_idx')],
+            },
+        ),
+    ]
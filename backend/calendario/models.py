@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class OperacionCalendario(models.Model):
+    """Outbox of Google Calendar writes, queued by requests and sent by `manage.py sincronizar_calendario`."""
+    class Accion(models.TextChoices):
+        CREAR = 'CREAR', 'Crear'
+        ACTUALIZAR = 'ACTUALIZAR', 'Actualizar'
+        BORRAR = 'BORRAR', 'Borrar'
+
+    class Estado(models.TextChoices):
+        PENDIENTE = 'PENDIENTE', 'Pendiente'
+        ENVIADA = 'ENVIADA', 'Enviada'
+        FALLIDA = 'FALLIDA', 'Fallida'  # dead letter: rejected, or retries exhausted
+
+    # Kept when the appointment is deleted, so its BORRAR can still be sent
+    cita = models.ForeignKey('citas.Cita', on_delete=models.SET_NULL, null=True, blank=True, related_name='operaciones_calendario')
+    calendario_id = models.CharField(max_length=255)
+    evento_id = models.CharField(max_length=255)
+    accion = models.CharField(max_length=10, choices=Accion.choices)
+    estado = models.CharField(max_length=10, choices=Estado.choices, default=Estado.PENDIENTE)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_envio = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['proximo_intento'],
+                condition=models.Q(estado='PENDIENTE'),
+                name='operacion_pendiente_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.accion} {self.evento_id} ({self.estado})"
+
+
+class CalendarioEspecialista(models.Model):
+    """A specialist's Google calendar, shared with the service account, and where its incremental sync left off."""
+    especialista = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='calendario')
+    calendario_id = models.CharField(max_length=255, help_text="Usually the specialist's Google email")
+    sync_token = models.CharField(max_length=255, blank=True)
+    sincronizado = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.especialista} - {self.calendario_id}"
+
+
+class BloqueoExterno(models.Model):
+    """A busy event from the specialist's own calendar; overlapping free slots are blocked."""
+    especialista = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='bloqueos_externos')
+    evento_id = models.CharField(max_length=255)
+    inicio = models.DateTimeField()
+    fin = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['especialista', 'evento_id'], name='bloqueo_unico_por_evento'),
+        ]
+        indexes = [
+            models.Index(fields=['especialista', 'inicio'], name='bloqueo_inicio_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.especialista} ocupado {self.inicio:%Y-%m-%d %H:%M} - {self.fin:%H:%M}"
+
+
+class FeedCalendario(models.Model):
+    """Secret URL of a user's .ics feed (calendario.ics). Regenerating the token revokes the old URL."""
+    usuario = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='feed_calendario')
+    token = models.CharField(max_length=64, unique=True)
+    fecha_creacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Feed de {self.usuario}"
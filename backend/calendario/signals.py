@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from agenda.models import HorarioDisponible
+from citas.models import Cita
+
+from .models import OperacionCalendario
+from .sincronizacion import encolar
+
+
+@receiver(post_save, sender=HorarioDisponible)
+def horario_guardado(sender, instance, raw=False, created=False, **kwargs):
+    """A slot edited after its appointment's event was created moves the event with it."""
+    if raw or created or not settings.GOOGLE_CALENDAR_ENABLED:
+        return
+    cita = (
+        Cita.objects.filter(horario=instance, estado=Cita.Estado.CONFIRMADA, google_event_id__isnull=False)
+        .only('pk', 'especialista_id').first()
+    )
+    if cita is not None:
+        encolar(cita, OperacionCalendario.Accion.ACTUALIZAR)
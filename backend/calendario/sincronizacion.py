@@ -0,0 +1,360 @@
+"""
+Google Calendar sync.
+
+Push: request handlers only INSERT an OperacionCalendario (`encolar`), inside
+their own transaction. `enviar_operaciones` claims due operations, merges the
+ones for the same event, and sends them as batch requests of up to 50 calls.
+Event ids are derived from the appointment (`evento_id`), so a retried create
+that already went through comes back as 409 and counts as sent. Quota and
+server errors are retried with exponential backoff; other rejections go
+straight to FALLIDA.
+
+Pull: `sincronizar_ocupados` lists each specialist's calendar incrementally
+with the sync token saved by the previous run, starting over with a full listing
+when Google answers 410. Busy events that are not ours become BloqueoExterno
+rows. Future free slots that overlap a block are marked unavailable, and slots
+blocked by an event that moved or went away are freed, unless an active
+appointment holds them.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CharField, Exists, OuterRef, Value
+from django.db.models.functions import Cast, Concat
+from django.utils import timezone
+
+from agenda.cache import invalidar
+from agenda.models import HorarioDisponible
+from citas.models import Cita
+
+from . import google
+from .models import BloqueoExterno, CalendarioEspecialista, OperacionCalendario
+
+logger = logging.getLogger(__name__)
+
+PREFIJO_EVENTO = 'cita'
+# Appointments in these states no longer need an event created or updated
+ESTADOS_SIN_EVENTO = (Cita.Estado.RECHAZADA, Cita.Estado.CANCELADA)
+
+
+def evento_id(cita):
+    """The event id of `cita`: deterministic, and within Google's base32hex alphabet."""
+    return f'{PREFIJO_EVENTO}{cita.pk}'
+
+
+def encolar(cita, accion):
+    """
+    Queue `accion` on `cita`'s event, if the sync is on and the specialist has a calendar.
+
+    Call it inside the transaction that changes the appointment, so both commit
+    or neither does.
+    """
+    if not settings.GOOGLE_CALENDAR_ENABLED:
+        return None
+    calendario_id = (
+        CalendarioEspecialista.objects.filter(especialista_id=cita.especialista_id)
+        .values_list('calendario_id', flat=True).first()
+    )
+    if calendario_id is None:
+        return None
+    return OperacionCalendario.objects.create(
+        cita=cita, calendario_id=calendario_id, evento_id=evento_id(cita), accion=accion,
+    )
+
+
+def _momento(fecha, hora):
+    return timezone.make_aware(datetime.combine(fecha, hora))
+
+
+def cuerpo_evento(cita):
+    horario = cita.horario
+    return {
+        'id': evento_id(cita),
+        'summary': f"Cita con {cita.alumno.get_full_name() or cita.alumno.email}",
+        'description': cita.motivo,
+        'start': {'dateTime': _momento(horario.fecha, horario.hora_inicio).isoformat()},
+        'end': {'dateTime': _momento(horario.fecha, horario.hora_fin).isoformat()},
+        'extendedProperties': {'private': {'cita_id': str(cita.pk)}},
+    }
+
+
+def _ruta_eventos(calendario_id):
+    return f'/calendars/{quote(calendario_id, safe="")}/events'
+
+
+def _reservar_lote(tamano):
+    """Claim up to `tamano` due operations, leased as in notificaciones.correo._reservar_lote."""
+    ahora = timezone.now()
+    with transaction.atomic():
+        lote = list(
+            OperacionCalendario.objects.select_for_update(skip_locked=True)
+            .filter(estado=OperacionCalendario.Estado.PENDIENTE, proximo_intento__lte=ahora)
+            .order_by('proximo_intento', 'pk')[:tamano]
+        )
+        if lote:
+            OperacionCalendario.objects.filter(pk__in=[o.pk for o in lote]).update(
+                proximo_intento=ahora + timedelta(seconds=settings.GOOGLE_CALENDAR_LEASE_SECONDS)
+            )
+    return lote
+
+
+def _registrar_fallo(operaciones, error, reintentable):
+    for operacion in operaciones:
+        operacion.intentos += 1
+        operacion.ultimo_error = str(error)[:2000]
+        if not reintentable or operacion.intentos >= settings.GOOGLE_CALENDAR_MAX_ATTEMPTS:
+            operacion.estado = OperacionCalendario.Estado.FALLIDA
+            logger.error("Operación %s sobre %s movida a FALLIDA: %s", operacion.accion, operacion.evento_id, error)
+        else:
+            espera = min(
+                settings.GOOGLE_CALENDAR_BACKOFF_SECONDS * 2 ** (operacion.intentos - 1),
+                settings.GOOGLE_CALENDAR_MAX_BACKOFF_SECONDS,
+            )
+            operacion.proximo_intento = timezone.now() + timedelta(seconds=espera)
+            logger.warning(
+                "Operación %s sobre %s falló (intento %s): %s",
+                operacion.accion, operacion.evento_id, operacion.intentos, error,
+            )
+        operacion.save(update_fields=['intentos', 'ultimo_error', 'estado', 'proximo_intento'])
+
+
+def _agrupar(lote):
+    """
+    `[(accion, operaciones)]`, one entry per event in claim order.
+
+    Only the newest operation of an event is sent: a create followed by updates
+    is still a create (with the current data), anything followed by a delete is
+    a delete.
+    """
+    por_evento = defaultdict(list)
+    for operacion in lote:
+        por_evento[(operacion.calendario_id, operacion.evento_id)].append(operacion)
+    grupos = []
+    for operaciones in por_evento.values():
+        operaciones.sort(key=lambda o: o.pk)
+        accion = operaciones[-1].accion
+        if accion == OperacionCalendario.Accion.ACTUALIZAR and any(
+            o.accion == OperacionCalendario.Accion.CREAR for o in operaciones
+        ):
+            accion = OperacionCalendario.Accion.CREAR
+        grupos.append((accion, operaciones))
+    return grupos
+
+
+def _peticion(accion, operacion, cita):
+    ruta = _ruta_eventos(operacion.calendario_id)
+    if accion == OperacionCalendario.Accion.CREAR:
+        return google.Peticion('POST', ruta, cuerpo_evento(cita))
+    if accion == OperacionCalendario.Accion.ACTUALIZAR:
+        return google.Peticion('PUT', f'{ruta}/{operacion.evento_id}', cuerpo_evento(cita))
+    return google.Peticion('DELETE', f'{ruta}/{operacion.evento_id}', None)
+
+
+def _exito(accion, estado):
+    if 200 <= estado < 300:
+        return True
+    if accion == OperacionCalendario.Accion.CREAR:
+        return estado == 409  # already created by an earlier attempt
+    if accion == OperacionCalendario.Accion.BORRAR:
+        return estado in (404, 410)  # already gone
+    return False
+
+
+def enviar_operaciones(tamano=None):
+    """
+    Send one claimed batch of due operations. Returns `(enviadas, fallidas)`.
+
+    The claim is cut into batch requests of at most 50 calls. A batch request
+    that fails as a whole counts as a failed attempt for every operation in it.
+    """
+    lote = _reservar_lote(tamano or settings.GOOGLE_CALENDAR_BATCH_SIZE)
+    if not lote:
+        return 0, 0
+
+    citas = Cita.objects.select_related('horario', 'alumno').in_bulk(
+        {o.cita_id for o in lote if o.cita_id is not None}
+    )
+    enviadas, creadas, pendientes = [], [], []
+    for accion, operaciones in _agrupar(lote):
+        ultima = operaciones[-1]
+        cita = citas.get(ultima.cita_id)
+        if accion != OperacionCalendario.Accion.BORRAR and (cita is None or cita.estado in ESTADOS_SIN_EVENTO):
+            # Nothing left to write; a later BORRAR (if any) removes what was sent
+            enviadas.extend(o.pk for o in operaciones)
+            continue
+        pendientes.append((accion, operaciones, _peticion(accion, ultima, cita)))
+
+    fallidas = 0
+    for inicio in range(0, len(pendientes), google.MAXIMO_POR_LOTE):
+        tramo = pendientes[inicio:inicio + google.MAXIMO_POR_LOTE]
+        try:
+            respuestas = google.lote([peticion for _, _, peticion in tramo])
+        except google.ErrorCalendario as error:
+            operaciones = [o for _, grupo, _ in tramo for o in grupo]
+            _registrar_fallo(operaciones, error, error.reintentable)
+            fallidas += len(operaciones)
+            continue
+        for (accion, operaciones, _), respuesta in zip(tramo, respuestas):
+            if _exito(accion, respuesta.estado):
+                enviadas.extend(o.pk for o in operaciones)
+                if accion == OperacionCalendario.Accion.CREAR and operaciones[-1].cita_id is not None:
+                    creadas.append(operaciones[-1].cita_id)
+                continue
+            _registrar_fallo(
+                operaciones, f"HTTP {respuesta.estado}: {respuesta.cuerpo}",
+                google.es_reintentable(respuesta.estado, respuesta.cuerpo),
+            )
+            fallidas += len(operaciones)
+
+    ahora = timezone.now()
+    if enviadas:
+        OperacionCalendario.objects.filter(pk__in=enviadas).update(
+            estado=OperacionCalendario.Estado.ENVIADA, fecha_envio=ahora, ultimo_error='',
+        )
+    if creadas:
+        # One UPDATE for every created event; its id is derived from the pk (evento_id)
+        Cita.objects.filter(pk__in=creadas).update(
+            google_event_id=Concat(Value(PREFIJO_EVENTO), Cast('pk', CharField())), updated_at=ahora,
+        )
+    return len(enviadas), fallidas
+
+
+def _limites(evento):
+    """`(inicio, fin)` of an event as aware datetimes; all-day events span whole days."""
+    def momento(extremo):
+        if 'dateTime' in extremo:
+            return datetime.fromisoformat(extremo['dateTime'])
+        return _momento(date.fromisoformat(extremo['date']), time.min)
+    return momento(evento['start']), momento(evento['end'])
+
+
+def _es_ocupado(evento):
+    return (
+        evento.get('status') != 'cancelled'
+        and evento.get('transparency') != 'transparent'
+        and 'cita_id' not in evento.get('extendedProperties', {}).get('private', {})
+        and 'start' in evento
+    )
+
+
+def _recalcular_horarios(especialista_id, rangos_liberados, rangos_ocupados):
+    """
+    Block free slots overlapping `rangos_ocupados` and free blocked ones overlapping
+    `rangos_liberados` that no block covers any more. Past slots and slots held by
+    an active appointment are left alone. Returns the number of slots changed.
+    """
+    rangos = rangos_liberados + rangos_ocupados
+    if not rangos:
+        return 0
+    desde = max(min(inicio for inicio, _ in rangos), timezone.now())
+    hasta = max(fin for _, fin in rangos)
+    if desde >= hasta:
+        return 0
+    desde_local, hasta_local = timezone.localtime(desde), timezone.localtime(hasta)
+    horarios = list(
+        HorarioDisponible.objects.filter(
+            especialista_id=especialista_id,
+            fecha__gte=desde_local.date(), fecha__lte=hasta_local.date(),
+        )
+        .exclude(Exists(Cita.objects.filter(horario=OuterRef('pk'), estado__in=Cita.ESTADOS_ACTIVOS)))
+        .values_list('pk', 'fecha', 'hora_inicio', 'hora_fin', 'disponible')
+    )
+    bloqueos = list(
+        BloqueoExterno.objects.filter(especialista_id=especialista_id, inicio__lt=hasta, fin__gt=desde)
+        .values_list('inicio', 'fin')
+    )
+
+    def se_cruza(inicio, fin, con):
+        return any(a < fin and inicio < b for a, b in con)
+
+    bloquear, liberar, celdas = [], [], set()
+    for pk, fecha, hora_inicio, hora_fin, disponible in horarios:
+        inicio, fin = _momento(fecha, hora_inicio), _momento(fecha, hora_fin)
+        if inicio < timezone.now():
+            continue
+        ocupado = se_cruza(inicio, fin, bloqueos)
+        if disponible and ocupado and se_cruza(inicio, fin, rangos_ocupados):
+            bloquear.append(pk)
+            celdas.add((especialista_id, fecha))
+        elif not disponible and not ocupado and se_cruza(inicio, fin, rangos_liberados):
+            liberar.append(pk)
+            celdas.add((especialista_id, fecha))
+
+    ahora = timezone.now()
+    cambiados = 0
+    if bloquear:
+        cambiados += HorarioDisponible.objects.filter(pk__in=bloquear, disponible=True).update(
+            disponible=False, updated_at=ahora,
+        )
+    if liberar:
+        cambiados += HorarioDisponible.objects.filter(pk__in=liberar, disponible=False).update(
+            disponible=True, updated_at=ahora,
+        )
+    invalidar(celdas)
+    return cambiados
+
+
+def _sincronizar(calendario):
+    """Pull one calendar's changes; returns the number of slots changed."""
+    ruta = _ruta_eventos(calendario.calendario_id)
+    completo = not calendario.sync_token
+    try:
+        eventos, sync_token = google.listar_eventos(
+            ruta, calendario.sync_token or None, singleEvents='true', timeMin=timezone.now().isoformat(),
+        )
+    except google.SyncTokenInvalido:
+        logger.info("Sync token de %s vencido, sincronizando desde cero", calendario.calendario_id)
+        completo = True
+        eventos, sync_token = google.listar_eventos(
+            ruta, None, singleEvents='true', timeMin=timezone.now().isoformat(),
+        )
+
+    ocupados = {}
+    for evento in eventos:
+        if _es_ocupado(evento):
+            ocupados[evento['id']] = _limites(evento)
+    cambiados = [evento['id'] for evento in eventos]
+
+    with transaction.atomic():
+        anteriores = BloqueoExterno.objects.filter(especialista_id=calendario.especialista_id)
+        if not completo:
+            anteriores = anteriores.filter(evento_id__in=cambiados)
+        rangos_liberados = list(anteriores.values_list('inicio', 'fin'))
+        # A full listing replaces every block; an incremental one only the changed events
+        anteriores.exclude(evento_id__in=list(ocupados)).delete()
+        BloqueoExterno.objects.bulk_create(
+            [
+                BloqueoExterno(especialista_id=calendario.especialista_id, evento_id=evento, inicio=inicio, fin=fin)
+                for evento, (inicio, fin) in ocupados.items()
+            ],
+            update_conflicts=True, unique_fields=['especialista', 'evento_id'], update_fields=['inicio', 'fin'],
+        )
+        horarios = _recalcular_horarios(calendario.especialista_id, rangos_liberados, list(ocupados.values()))
+        calendario.sync_token = sync_token
+        calendario.sincronizado = timezone.now()
+        calendario.save(update_fields=['sync_token', 'sincronizado'])
+    return horarios
+
+
+def sincronizar_ocupados():
+    """
+    Pull every specialist calendar. Returns `(calendarios, horarios cambiados)`.
+
+    A calendar that fails is logged and retried on the next run from the same
+    sync token; the others go on.
+    """
+    sincronizados = horarios = 0
+    for calendario in CalendarioEspecialista.objects.order_by('pk'):
+        try:
+            horarios += _sincronizar(calendario)
+        except google.ErrorCalendario as error:
+            logger.warning("No se pudo sincronizar %s: %s", calendario.calendario_id, error)
+            continue
+        sincronizados += 1
+    return sincronizados, horarios
+
@@ -0,0 +1,216 @@
+"""
+Local stand-in for the Google Calendar API, for tests and offline development.
+
+Serves the calls calendario.google makes: batch requests, event insert, update,
+delete and get, and paged listings with sync tokens. Deleted events stay listed
+as cancelled, as Google does. Beyond that it can:
+
+- reject requests without the expected bearer token (401);
+- fail the next N calls with a quota error (`fallar_proximas`);
+- expire every sync token issued so far, so the next incremental listing gets
+  410 (`expirar_sync_tokens`);
+- add or remove events as if the specialist had done it (`evento_externo`,
+  `borrar_evento`).
+
+Run it standalone with `manage.py calendario_stub`, or in a thread with
+`ServidorCalendario(...).iniciar()`.
+"""
+
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from .google import RUTA_LOTE, codificar_http, codificar_multipart, decodificar_http, decodificar_multipart
+
+RUTA_EVENTOS = re.compile(r'^/calendar/v3/calendars/(?P<calendario>[^/]+)/events(?:/(?P<evento>[^/]+))?$')
+RAZONES = {200: 'OK', 204: 'No Content', 400: 'Bad Request', 401: 'Unauthorized', 403: 'Forbidden',
+           404: 'Not Found', 409: 'Conflict', 410: 'Gone', 429: 'Too Many Requests'}
+
+
+def _error(estado, mensaje, razon=None):
+    return estado, {'error': {'code': estado, 'message': mensaje, 'errors': [{'reason': razon or 'invalid'}]}}
+
+
+class Calendarios:
+    """
+    The stub's state: events per calendar, each stamped with the change sequence
+    that last touched it, and a log of the calls (`peticiones`) and batch
+    requests (`lotes`) received.
+    """
+
+    def __init__(self, por_pagina=250):
+        self.por_pagina = por_pagina
+        self.eventos = {}
+        self.secuencia = 0
+        self.token_minimo = 0
+        self.fallos = []
+        self.peticiones = []
+        self.lotes = 0
+        self.cerrojo = threading.Lock()
+
+    def _guardar(self, calendario, evento):
+        self.secuencia += 1
+        evento['_secuencia'] = self.secuencia
+        self.eventos.setdefault(calendario, {})[evento['id']] = evento
+        return {k: v for k, v in evento.items() if k != '_secuencia'}
+
+    def evento_externo(self, calendario, evento_id, inicio, fin, **campos):
+        """An event the specialist created: busy from `inicio` to `fin` (aware datetimes)."""
+        with self.cerrojo:
+            self._guardar(calendario, {
+                'id': evento_id, 'status': 'confirmed',
+                'start': {'dateTime': inicio.isoformat()}, 'end': {'dateTime': fin.isoformat()}, **campos,
+            })
+
+    def borrar_evento(self, calendario, evento_id):
+        with self.cerrojo:
+            self._guardar(calendario, {'id': evento_id, 'status': 'cancelled'})
+
+    def fallar_proximas(self, veces, estado=403, razon='rateLimitExceeded'):
+        """Fail the next `veces` event calls (inside batches too) with a quota error."""
+        with self.cerrojo:
+            self.fallos.extend([(estado, razon)] * veces)
+
+    def expirar_sync_tokens(self):
+        with self.cerrojo:
+            self.token_minimo = self.secuencia + 1
+
+    def activos(self, calendario):
+        return {
+            evento_id: evento for evento_id, evento in self.eventos.get(calendario, {}).items()
+            if evento.get('status') != 'cancelled'
+        }
+
+    def atender(self, metodo, ruta, parametros, cuerpo):
+        """`(status, JSON body)` of one Calendar API call."""
+        coincidencia = RUTA_EVENTOS.match(ruta)
+        if not coincidencia:
+            return _error(404, f"No existe {ruta}")
+        calendario = unquote(coincidencia['calendario'])
+        evento_id = coincidencia['evento'] and unquote(coincidencia['evento'])
+        with self.cerrojo:
+            self.peticiones.append((metodo, ruta))
+            if self.fallos:
+                estado, razon = self.fallos.pop(0)
+                return _error(estado, "Límite de cuota", razon)
+            eventos = self.eventos.get(calendario, {})
+            actual = eventos.get(evento_id) if evento_id else None
+            if metodo == 'GET' and evento_id is None:
+                return self._listar(calendario, parametros)
+            if metodo == 'GET':
+                if actual is None:
+                    return _error(404, "Not Found", 'notFound')
+                return 200, {k: v for k, v in actual.items() if k != '_secuencia'}
+            if metodo == 'POST' and evento_id is None:
+                if not cuerpo or 'start' not in cuerpo:
+                    return _error(400, "Falta start", 'required')
+                cuerpo.setdefault('id', f'externo{self.secuencia + 1}')
+                if cuerpo['id'] in eventos:
+                    return _error(409, "The requested identifier already exists.", 'duplicate')
+                return 200, self._guardar(calendario, {**cuerpo, 'status': 'confirmed'})
+            if metodo in ('PUT', 'PATCH'):
+                if actual is None or actual.get('status') == 'cancelled':
+                    return _error(404, "Not Found", 'notFound')
+                base = actual if metodo == 'PATCH' else {}
+                return 200, self._guardar(calendario, {**base, **(cuerpo or {}), 'id': evento_id, 'status': 'confirmed'})
+            if metodo == 'DELETE':
+                if actual is None:
+                    return _error(404, "Not Found", 'notFound')
+                if actual.get('status') == 'cancelled':
+                    return _error(410, "Resource has been deleted", 'deleted')
+                self._guardar(calendario, {'id': evento_id, 'status': 'cancelled'})
+                return 204, None
+        return _error(405, f"{metodo} no soportado")
+
+    def _listar(self, calendario, parametros):
+        token = parametros.get('syncToken')
+        if token is not None and int(token) < self.token_minimo:
+            return _error(410, "Sync token is no longer valid, a full sync is required.", 'fullSyncRequired')
+        desde = int(token) if token is not None else 0
+        eventos = sorted(
+            (e for e in self.eventos.get(calendario, {}).values() if e['_secuencia'] > desde),
+            key=lambda e: e['_secuencia'],
+        )
+        if token is None:
+            # A full listing only returns live events
+            eventos = [e for e in eventos if e.get('status') != 'cancelled']
+        inicio = int(parametros.get('pageToken', 0))
+        pagina = eventos[inicio:inicio + self.por_pagina]
+        respuesta = {'items': [{k: v for k, v in e.items() if k != '_secuencia'} for e in pagina]}
+        if inicio + self.por_pagina < len(eventos):
+            respuesta['nextPageToken'] = str(inicio + self.por_pagina)
+        else:
+            respuesta['nextSyncToken'] = str(self.secuencia)
+        return 200, respuesta
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, estado, cuerpo, content_type='application/json'):
+        datos = b'' if cuerpo is None else (cuerpo if isinstance(cuerpo, bytes) else json.dumps(cuerpo).encode())
+        self.send_response(estado)
+        if datos:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _atender(self):
+        contenido = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if self.headers.get('Authorization') != f'Bearer {self.server.token}':
+            return self._responder(*_error(401, "Invalid Credentials", 'authError'))
+        partes = urlsplit(self.path)
+        calendarios = self.server.calendarios
+        if self.command == 'POST' and partes.path == RUTA_LOTE:
+            with calendarios.cerrojo:
+                calendarios.lotes += 1
+            return self._lote(contenido)
+        parametros = {clave: valores[-1] for clave, valores in parse_qs(partes.query).items()}
+        cuerpo = json.loads(contenido) if contenido else None
+        self._responder(*calendarios.atender(self.command, partes.path, parametros, cuerpo))
+
+    def _lote(self, contenido):
+        respuestas = []
+        for parte_id, mensaje in decodificar_multipart(self.headers['Content-Type'], contenido):
+            linea, cuerpo = decodificar_http(mensaje)
+            metodo, objetivo, _ = linea.split(' ', 2)
+            partes = urlsplit(objetivo)
+            parametros = {clave: valores[-1] for clave, valores in parse_qs(partes.query).items()}
+            estado, cuerpo = self.server.calendarios.atender(metodo, partes.path, parametros, cuerpo)
+            respuestas.append((parte_id, codificar_http(f'HTTP/1.1 {estado} {RAZONES.get(estado, "")}', cuerpo)))
+        content_type, cuerpo = codificar_multipart(respuestas, prefijo_id='response-')
+        self._responder(200, cuerpo, content_type)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _atender
+
+
+class ServidorCalendario(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, direccion=('127.0.0.1', 0), token='stub', calendarios=None):
+        super().__init__(direccion, _Manejador)
+        self.token = token
+        self.calendarios = calendarios or Calendarios()
+        self._hilo = None
+
+    @property
+    def url(self):
+        host, puerto = self.server_address[:2]
+        return f'http://{host}:{puerto}'
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self.shutdown()
+        self.server_close()
+        if self._hilo:
+            self._hilo.join()
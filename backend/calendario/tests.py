@@ -0,0 +1,342 @@
+from datetime import date, datetime, time, timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from agenda.models import HorarioDisponible
+from citas.models import Cita
+from usuarios.models import Usuario
+
+from .ics import plegar
+from .models import BloqueoExterno, CalendarioEspecialista, FeedCalendario, OperacionCalendario
+from .sincronizacion import encolar, enviar_operaciones, sincronizar_ocupados
+from .stub import Calendarios, ServidorCalendario
+
+CALENDARIO = 'esp@tecnl.mx'
+
+
+def _proximo_dia_habil(offset=1):
+    dia = date.today() + timedelta(days=offset)
+    while dia.weekday() > 4:
+        dia += timedelta(days=1)
+    return dia
+
+
+class StubTestCase(TestCase):
+    """Runs the fake Calendar API in a thread and points the sync at it."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.servidor = ServidorCalendario(token='prueba').iniciar()
+        cls.addClassCleanup(cls.servidor.detener)
+        cls.ajustes = override_settings(
+            GOOGLE_CALENDAR_ENABLED=True, GOOGLE_CALENDAR_API_URL=cls.servidor.url, GOOGLE_CALENDAR_TOKEN='prueba',
+        )
+        cls.ajustes.enable()
+        cls.addClassCleanup(cls.ajustes.disable)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.especialista = Usuario.objects.create_user(
+            username='esp', email=CALENDARIO, password='x', rol=Usuario.Roles.ESPECIALISTA,
+        )
+        CalendarioEspecialista.objects.create(especialista=cls.especialista, calendario_id=CALENDARIO)
+        cls.dia = _proximo_dia_habil()
+
+    def setUp(self):
+        self.calendarios = self.servidor.calendarios = Calendarios()
+
+    def _horario(self, hora, disponible=True):
+        return HorarioDisponible.objects.create(
+            especialista=self.especialista, fecha=self.dia, hora_inicio=time(hora),
+            hora_fin=time(hora, 50), disponible=disponible,
+        )
+
+    def _cita(self, hora, estado=Cita.Estado.CONFIRMADA):
+        alumno = Usuario.objects.create_user(username=f'alumno{hora}', email=f'alumno{hora}@tecnl.mx')
+        return Cita.objects.create(
+            alumno=alumno, especialista=self.especialista, horario=self._horario(hora, disponible=False),
+            motivo='Motivo', estado=estado,
+        )
+
+    def _momento(self, hora, minuto=0):
+        return timezone.make_aware(datetime.combine(self.dia, time(hora, minuto)))
+
+
+class EnvioTests(StubTestCase):
+    def test_confirmar_solo_encola_y_el_worker_envia_un_lote(self):
+        cita = self._cita(9, estado=Cita.Estado.PENDIENTE)
+        client = APIClient()
+        client.force_authenticate(self.especialista)
+
+        response = client.post(f'/api/citas/citas/{cita.pk}/confirmar/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.calendarios.peticiones, [])
+        operacion = OperacionCalendario.objects.get()
+        self.assertEqual((operacion.accion, operacion.evento_id), (OperacionCalendario.Accion.CREAR, f'cita{cita.pk}'))
+
+        self.assertEqual(enviar_operaciones(), (1, 0))
+        self.assertEqual(self.calendarios.lotes, 1)
+        evento = self.calendarios.activos(CALENDARIO)[f'cita{cita.pk}']
+        self.assertEqual(evento['start']['dateTime'], self._momento(9).isoformat())
+        cita.refresh_from_db()
+        self.assertEqual(cita.google_event_id, f'cita{cita.pk}')
+        self.assertEqual(OperacionCalendario.objects.get().estado, OperacionCalendario.Estado.ENVIADA)
+
+    def test_sin_sincronizacion_activa_no_encola(self):
+        cita = self._cita(9)
+        with override_settings(GOOGLE_CALENDAR_ENABLED=False):
+            self.assertIsNone(encolar(cita, OperacionCalendario.Accion.CREAR))
+        self.assertFalse(OperacionCalendario.objects.exists())
+
+    def test_agrupa_en_lotes_de_cincuenta(self):
+        for hora in range(8, 20):
+            for minuto in range(0, 60, 10):
+                alumno = Usuario.objects.create_user(
+                    username=f'a{hora}_{minuto}', email=f'a{hora}_{minuto}@tecnl.mx',
+                )
+                horario = HorarioDisponible.objects.create(
+                    especialista=self.especialista, fecha=self.dia, hora_inicio=time(hora, minuto),
+                    hora_fin=time(hora, minuto + 9), disponible=False,
+                )
+                encolar(Cita.objects.create(
+                    alumno=alumno, especialista=self.especialista, horario=horario, motivo='M',
+                    estado=Cita.Estado.CONFIRMADA,
+                ), OperacionCalendario.Accion.CREAR)
+
+        self.assertEqual(enviar_operaciones(100), (72, 0))
+        self.assertEqual(self.calendarios.lotes, 2)
+        self.assertEqual(len(self.calendarios.activos(CALENDARIO)), 72)
+        self.assertEqual(Cita.objects.filter(google_event_id__isnull=True).count(), 0)
+
+    def test_error_de_cuota_se_reintenta_con_espera(self):
+        cita = self._cita(9)
+        encolar(cita, OperacionCalendario.Accion.CREAR)
+        self.calendarios.fallar_proximas(1)
+
+        with self.assertLogs('calendario.sincronizacion', 'WARNING'):
+            self.assertEqual(enviar_operaciones(), (0, 1))
+        operacion = OperacionCalendario.objects.get()
+        self.assertEqual((operacion.estado, operacion.intentos), (OperacionCalendario.Estado.PENDIENTE, 1))
+        self.assertGreater(operacion.proximo_intento, timezone.now() + timedelta(seconds=20))
+        self.assertEqual(enviar_operaciones(), (0, 0))
+
+        OperacionCalendario.objects.update(proximo_intento=timezone.now())
+        self.assertEqual(enviar_operaciones(), (1, 0))
+        self.assertIn(f'cita{cita.pk}', self.calendarios.activos(CALENDARIO))
+
+    def test_rechazo_definitivo_va_a_fallida(self):
+        encolar(self._cita(9), OperacionCalendario.Accion.CREAR)
+        self.calendarios.fallar_proximas(1, estado=403, razon='forbidden')
+
+        with self.assertLogs('calendario.sincronizacion', 'ERROR'):
+            self.assertEqual(enviar_operaciones(), (0, 1))
+        self.assertEqual(OperacionCalendario.objects.get().estado, OperacionCalendario.Estado.FALLIDA)
+
+    def test_creacion_repetida_cuenta_como_enviada(self):
+        cita = self._cita(9)
+        encolar(cita, OperacionCalendario.Accion.CREAR)
+        enviar_operaciones()
+        encolar(cita, OperacionCalendario.Accion.CREAR)
+
+        self.assertEqual(enviar_operaciones(), (1, 0))
+
+    def test_operaciones_del_mismo_evento_se_combinan(self):
+        cita = self._cita(9)
+        for accion in ('CREAR', 'ACTUALIZAR', 'BORRAR'):
+            encolar(cita, accion)
+
+        self.assertEqual(enviar_operaciones(), (3, 0))
+        self.assertEqual(self.calendarios.peticiones, [('DELETE', f'/calendar/v3/calendars/esp%40tecnl.mx/events/cita{cita.pk}')])
+
+    def test_mover_el_horario_actualiza_el_evento(self):
+        cita = self._cita(9)
+        encolar(cita, OperacionCalendario.Accion.CREAR)
+        enviar_operaciones()
+        horario = cita.horario
+        horario.hora_inicio, horario.hora_fin = time(11), time(11, 50)
+        horario.save()
+
+        self.assertEqual(enviar_operaciones(), (1, 0))
+        evento = self.calendarios.activos(CALENDARIO)[f'cita{cita.pk}']
+        self.assertEqual(evento['start']['dateTime'], self._momento(11).isoformat())
+
+
+class OcupadosTests(StubTestCase):
+    def _disponibles(self):
+        return dict(HorarioDisponible.objects.values_list('hora_inicio__hour', 'disponible'))
+
+    def test_eventos_externos_bloquean_y_liberan_horarios(self):
+        for hora in (9, 10, 11):
+            self._horario(hora)
+        self._cita(12)
+        self.calendarios.evento_externo(CALENDARIO, 'junta', self._momento(9, 30), self._momento(10, 30))
+        self.calendarios.evento_externo(CALENDARIO, 'comida', self._momento(12), self._momento(13))
+        self.calendarios.evento_externo(
+            CALENDARIO, 'libre', self._momento(11), self._momento(12), transparency='transparent',
+        )
+
+        self.assertEqual(sincronizar_ocupados(), (1, 2))
+        self.assertEqual(self._disponibles(), {9: False, 10: False, 11: True, 12: False})
+        self.assertEqual(BloqueoExterno.objects.count(), 2)
+        self.assertEqual(Cita.objects.get().estado, Cita.Estado.CONFIRMADA)
+
+        # Moved later: 9:00 frees up, 11:00 is taken
+        self.calendarios.evento_externo(CALENDARIO, 'junta', self._momento(10), self._momento(11, 30))
+        peticiones = len(self.calendarios.peticiones)
+        self.assertEqual(sincronizar_ocupados(), (1, 2))
+        self.assertEqual(self._disponibles(), {9: True, 10: False, 11: False, 12: False})
+        self.assertEqual(len(self.calendarios.peticiones), peticiones + 1)
+
+        self.calendarios.borrar_evento(CALENDARIO, 'junta')
+        sincronizar_ocupados()
+        self.assertEqual(self._disponibles(), {9: True, 10: True, 11: True, 12: False})
+        self.assertEqual(list(BloqueoExterno.objects.values_list('evento_id', flat=True)), ['comida'])
+
+    def test_los_eventos_propios_no_bloquean(self):
+        self._horario(10)
+        cita = self._cita(9)
+        encolar(cita, OperacionCalendario.Accion.CREAR)
+        enviar_operaciones()
+        self.calendarios.activos(CALENDARIO)[f'cita{cita.pk}']['end'] = {'dateTime': self._momento(10, 30).isoformat()}
+
+        sincronizar_ocupados()
+        self.assertFalse(BloqueoExterno.objects.exists())
+        self.assertEqual(self._disponibles(), {9: False, 10: True})
+
+    def test_token_vencido_sincroniza_desde_cero(self):
+        self._horario(9)
+        self.calendarios.evento_externo(CALENDARIO, 'junta', self._momento(9), self._momento(10))
+        sincronizar_ocupados()
+        self.assertEqual(self._disponibles(), {9: False})
+
+        self.calendarios.borrar_evento(CALENDARIO, 'junta')
+        self.calendarios.expirar_sync_tokens()
+        self.assertEqual(sincronizar_ocupados(), (1, 1))
+
+        self.assertEqual(self._disponibles(), {9: True})
+        self.assertFalse(BloqueoExterno.objects.exists())
+        calendario = CalendarioEspecialista.objects.get()
+        self.assertEqual(calendario.sync_token, str(self.calendarios.secuencia))
+
+    def test_token_incorrecto_no_cambia_nada(self):
+        self._horario(9)
+        self.calendarios.evento_externo(CALENDARIO, 'junta', self._momento(9), self._momento(10))
+        with override_settings(GOOGLE_CALENDAR_TOKEN='otro'), self.assertLogs('calendario.sincronizacion', 'WARNING'):
+            self.assertEqual(sincronizar_ocupados(), (0, 0))
+        self.assertEqual(self._disponibles(), {9: True})
+
+
+class FeedIcsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.especialista = Usuario.objects.create_user(
+            username='esp', email='esp@tecnl.mx', first_name='Ana', last_name='Ruiz', rol=Usuario.Roles.ESPECIALISTA,
+        )
+        cls.alumno = Usuario.objects.create_user(
+            username='alumno', email='alumno@tecnl.mx', first_name='Luis', last_name='Pérez',
+        )
+        cls.dia = _proximo_dia_habil()
+        cls.citas = []
+        for hora, estado, motivo in (
+            (9, Cita.Estado.CONFIRMADA, 'Ansiedad; exámenes, tarea\nsegunda línea'),
+            (10, Cita.Estado.PENDIENTE, 'Seguimiento'),
+            (11, Cita.Estado.CANCELADA, 'Cancelada'),
+        ):
+            horario = HorarioDisponible.objects.create(
+                especialista=cls.especialista, fecha=cls.dia, hora_inicio=time(hora), hora_fin=time(hora, 50),
+                disponible=False,
+            )
+            cls.citas.append(Cita.objects.create(
+                alumno=Usuario.objects.create_user(username=f'a{hora}', email=f'a{hora}@tecnl.mx', first_name='Luis')
+                if hora != 9 else cls.alumno,
+                especialista=cls.especialista, horario=horario, motivo=motivo, estado=estado,
+            ))
+
+    def setUp(self):
+        cache.clear()
+
+    def _url(self, usuario):
+        client = APIClient()
+        client.force_authenticate(usuario)
+        return client.get('/api/calendario/feed/').json()['url']
+
+    def _leer(self, url, **headers):
+        response = self.client.get(url, headers=headers)
+        contenido = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, contenido.decode()
+
+    def test_feed_del_especialista(self):
+        url = self._url(self.especialista)
+        self.assertTrue(url.startswith('http://testserver/api/calendario/feed/'))
+
+        with self.assertNumQueries(3):
+            response, contenido = self._leer(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        self.assertEqual(contenido.count('BEGIN:VEVENT'), 2)
+        self.assertIn(f'UID:cita-{self.citas[0].pk}@sistema-citas', contenido)
+        inicio = self._utc(self.dia, 9)
+        self.assertIn(f'DTSTART:{inicio}', contenido)
+        self.assertIn('DESCRIPTION:Ansiedad\\; exámenes\\, tarea\\nsegunda línea', contenido.replace('\r\n ', ''))
+        self.assertIn('SUMMARY:Cita con Luis Pérez', contenido)
+        self.assertIn('STATUS:TENTATIVE', contenido)
+        self.assertNotIn('Cancelada', contenido)
+        self.assertTrue(all(len(linea.encode()) <= 75 for linea in contenido.split('\r\n')))
+
+    def test_feed_del_alumno(self):
+        _, contenido = self._leer(self._url(self.alumno))
+        self.assertEqual(contenido.count('BEGIN:VEVENT'), 1)
+        self.assertIn('SUMMARY:Cita con Ana Ruiz', contenido)
+
+    def test_revalidacion_y_cache(self):
+        url = self._url(self.especialista)
+        response, contenido = self._leer(url)
+        etag = response['ETag']
+
+        with self.assertNumQueries(2):
+            response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        # Fully sent once, so a client without the ETag gets the cached copy
+        with self.assertNumQueries(2):
+            response, cacheado = self._leer(url)
+        self.assertFalse(response.streaming)
+        self.assertEqual(cacheado, contenido)
+
+        cita = self.citas[1]
+        cita.estado = Cita.Estado.CONFIRMADA
+        cita.save()
+        response, contenido = self._leer(url, **{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertNotIn('STATUS:TENTATIVE', contenido)
+
+    def test_regenerar_revoca_la_url_anterior(self):
+        url = self._url(self.especialista)
+        client = APIClient()
+        client.force_authenticate(self.especialista)
+        nueva = client.post('/api/calendario/feed/').json()['url']
+
+        self.assertNotEqual(nueva, url)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(nueva).status_code, 200)
+        self.assertEqual(FeedCalendario.objects.count(), 1)
+
+    def test_plegar_no_parte_caracteres(self):
+        linea = 'DESCRIPTION:' + 'ñ' * 100
+        plegada = plegar(linea)
+        partes = plegada.split('\r\n')
+        self.assertTrue(all(len(parte.encode()) <= 75 for parte in partes))
+        self.assertEqual(plegada.replace('\r\n ', '').rstrip('\r\n'), linea)
+
+    def _utc(self, fecha, hora):
+        return timezone.make_aware(datetime.combine(fecha, time(hora))).astimezone(
+            timezone.get_fixed_timezone(0)
+        ).strftime('%Y%m%dT%H%M%SZ')
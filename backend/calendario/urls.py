@@ -0,0 +1,8 @@
+from django.urls import path
+
+from .views import feed, feed_ics
+
+urlpatterns = [
+    path('feed/', feed, name='calendario-feed'),
+    path('feed/<str:token>.ics', feed_ics, name='calendario-ics'),
+]
@@ -0,0 +1,31 @@
+from django.http import Http404
+from django.urls import reverse
+from django.views.decorators.http import require_safe
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from .ics import feed_de, respuesta_feed
+from .models import FeedCalendario
+
+
+@api_view(['GET', 'POST'])
+def feed(request):
+    """The URL of the user's .ics feed; POST replaces it with a new one, revoking the old."""
+    feed = feed_de(request.user, regenerar=request.method == 'POST')
+    url = request.build_absolute_uri(reverse('calendario-ics', args=[feed.token]))
+    return Response({'url': url, 'webcal': 'webcal://' + url.split('://', 1)[1]})
+
+
+# A plain Django view: DRF content negotiation would answer 406 to calendar apps
+# that send `Accept: text/calendar`, and the token in the URL is the only credential.
+@require_safe
+def feed_ics(request, token):
+    feed = (
+        FeedCalendario.objects.select_related('usuario')
+        .only('usuario__id', 'usuario__rol', 'usuario__first_name', 'usuario__last_name',
+              'usuario__token_version', 'usuario__is_active')
+        .filter(token=token).first()
+    )
+    if feed is None or not feed.usuario.is_active:
+        raise Http404
+    return respuesta_feed(request, feed.usuario)
@@ -0,0 +1,95 @@
+"""
+Appointment sweeper: moves appointments that nobody will act on any more.
+
+- PENDIENTE whose slot starts within SWEEPER_PENDING_EXPIRY_MINUTES (or already
+  started) becomes CANCELADA. Otherwise the request keeps the slot taken and the
+  student blocked (cita_activa_unica_por_alumno).
+- CONFIRMADA whose slot ended SWEEPER_NO_SHOW_GRACE_MINUTES ago or more becomes
+  NO_ASISTIO. Specialists have the grace period to mark it COMPLETADA.
+
+Both free the slot, as rechazar does. Work is done in primary-key chunks of
+SWEEPER_BATCH_SIZE, each in its own short transaction. A chunk is one SELECT of
+the ids, then one UPDATE of the appointments and one of their slots. Rows being
+edited by a specialist are skipped where the backend supports SKIP LOCKED, and
+picked up by the next run. Every run is recorded as an EjecucionBarrido.
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from agenda.cache import invalidar
+from agenda.models import HorarioDisponible
+
+from .models import Cita, EjecucionBarrido
+
+logger = logging.getLogger(__name__)
+
+
+def _hasta(campo, momento):
+    """The slot's `campo` (hora_inicio or hora_fin) at or before the naive local datetime `momento`."""
+    return Q(horario__fecha__lt=momento.date()) | Q(
+        horario__fecha=momento.date(), **{f'horario__{campo}__lte': momento.time()}
+    )
+
+
+def barridos(ahora):
+    """`(campo de EjecucionBarrido, estado actual, estado nuevo, filtro)` of every sweep at `ahora`."""
+    local = timezone.localtime(ahora).replace(tzinfo=None)
+    return (
+        ('expiradas', Cita.Estado.PENDIENTE, Cita.Estado.CANCELADA, _hasta(
+            'hora_inicio', local + timedelta(minutes=settings.SWEEPER_PENDING_EXPIRY_MINUTES),
+        )),
+        ('no_asistio', Cita.Estado.CONFIRMADA, Cita.Estado.NO_ASISTIO, _hasta(
+            'hora_fin', local - timedelta(minutes=settings.SWEEPER_NO_SHOW_GRACE_MINUTES),
+        )),
+    )
+
+
+def _barrer_lote(estado, nuevo_estado, filtro, despues_de, lote):
+    """Move the next chunk after pk `despues_de`; returns `(last pk, citas, horarios)`, or None when done."""
+    with transaction.atomic():
+        filas = list(
+            Cita.objects.filter(filtro, estado=estado, pk__gt=despues_de)
+            .select_for_update(skip_locked=True, of=('self',))
+            .order_by('pk')
+            .values_list('pk', 'horario_id', 'especialista_id', 'horario__fecha')[:lote]
+        )
+        if not filas:
+            return None
+        ahora = timezone.now()
+        citas = Cita.objects.filter(pk__in=[fila[0] for fila in filas], estado=estado).update(
+            estado=nuevo_estado, updated_at=ahora,
+        )
+        horarios = HorarioDisponible.objects.filter(pk__in=[fila[1] for fila in filas], disponible=False).update(
+            disponible=True, updated_at=ahora,
+        )
+        invalidar({(fila[2], fila[3]) for fila in filas})
+    return filas[-1][0], citas, horarios
+
+
+def barrer_citas(ahora=None, lote=None):
+    """Run every sweep once and record it; returns the saved EjecucionBarrido."""
+    ahora = ahora or timezone.now()
+    lote = lote or settings.SWEEPER_BATCH_SIZE
+    ejecucion = EjecucionBarrido(inicio=timezone.now())
+    inicio = time.perf_counter()
+    for campo, estado, nuevo_estado, filtro in barridos(ahora):
+        ultimo = 0
+        while (resultado := _barrer_lote(estado, nuevo_estado, filtro, ultimo, lote)) is not None:
+            ultimo, citas, horarios = resultado
+            ejecucion.lotes += 1
+            setattr(ejecucion, campo, getattr(ejecucion, campo) + citas)
+            ejecucion.horarios_liberados += horarios
+    ejecucion.segundos = time.perf_counter() - inicio
+    ejecucion.save()
+    logger.info(
+        "Barrido: %s expiradas, %s no asistió, %s horarios liberados en %s lotes (%.3f s)",
+        ejecucion.expiradas, ejecucion.no_asistio, ejecucion.horarios_liberados, ejecucion.lotes, ejecucion.segundos,
+    )
+    return ejecucion
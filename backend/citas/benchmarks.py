@@ -0,0 +1,217 @@
+"""
+Booking load generation, shared by the citas bench_* commands and the concurrency tests.
+"""
+
+import time
+from contextlib import ExitStack
+from datetime import date, datetime, time as dtime, timedelta
+
+from django.db import connections
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework.test import APIClient
+
+from agenda.models import HorarioDisponible
+from sistema_citas.benchmarks import en_paralelo, percentiles
+from usuarios.models import Usuario
+from usuarios.tokens import account_activation_token
+
+
+def proximo_dia_habil(offset=1):
+    dia = date.today() + timedelta(days=offset)
+    while dia.weekday() > 4:
+        dia += timedelta(days=1)
+    return dia
+
+
+def cliente(numero):
+    """An APIClient with its own address, so per-IP login throttles see distinct clients."""
+    return APIClient(REMOTE_ADDR=f'10.{numero >> 16 & 255}.{numero >> 8 & 255}.{numero & 255}')
+
+
+def sembrar_usuarios(cantidad, rol=Usuario.Roles.ALUMNO, prefijo='alumno'):
+    """Bulk-create users without hashing passwords (hashing would dominate the seeding time)."""
+    usuarios = []
+    for i in range(cantidad):
+        usuario = Usuario(
+            username=f'{prefijo}{i}', email=f'{prefijo}{i}@tecnl.mx',
+            first_name=prefijo.capitalize(), last_name=str(i), rol=rol, email_verified=True,
+        )
+        usuario.set_unusable_password()
+        usuarios.append(usuario)
+    Usuario.objects.bulk_create(usuarios, batch_size=1000)
+    return list(Usuario.objects.filter(username__startswith=prefijo, rol=rol).order_by('id'))
+
+
+def sembrar_horarios(especialista, cantidad, por_dia=24):
+    """`cantidad` 30-minute slots from 8:00, `por_dia` per working day, starting tomorrow."""
+    horarios = []
+    dia = proximo_dia_habil()
+    for i in range(cantidad):
+        bloque = i % por_dia
+        if i and bloque == 0:
+            dia = proximo_dia_habil((dia - date.today()).days + 1)
+        inicio = datetime.combine(dia, dtime(8)) + timedelta(minutes=30 * bloque)
+        horarios.append(HorarioDisponible(
+            especialista=especialista, fecha=dia,
+            hora_inicio=inicio.time(), hora_fin=(inicio + timedelta(minutes=30)).time(),
+        ))
+    HorarioDisponible.objects.bulk_create(horarios, batch_size=1000)
+    return list(HorarioDisponible.objects.filter(especialista=especialista).order_by('id').values_list('id', flat=True))
+
+
+def reservar(alumno, horario_id):
+    """Book `horario_id` as `alumno` through the API; returns the HTTP status code."""
+    client = APIClient()
+    client.force_authenticate(alumno)
+    response = client.post('/api/citas/citas/', {'horario_id': horario_id, 'motivo': 'Carga'}, format='json')
+    return response.status_code
+
+
+def reservar_en_paralelo(pares, hilos):
+    """
+    Fire one booking per `(alumno, horario_id)` pair on `hilos` threads.
+
+    Returns `(codigos, segundos)`: the status code of every booking, in order, and
+    the wall-clock time of the whole burst.
+    """
+    inicio = time.perf_counter()
+    codigos = en_paralelo(lambda par: reservar(*par), pares, hilos)
+    return codigos, time.perf_counter() - inicio
+
+
+def medir_peticion(client, metodo, url, data=None):
+    """
+    Send one request through the full stack: `(response, segundos, consultas)`.
+
+    Queries are counted with an execute wrapper on every database alias of the
+    calling thread, so reads routed to the replica are counted too.
+    """
+    consultas = 0
+
+    def contar(execute, sql, params, many, context):
+        nonlocal consultas
+        consultas += 1
+        return execute(sql, params, many, context)
+
+    with ExitStack() as pila:
+        for alias in connections:
+            pila.enter_context(connections[alias].execute_wrapper(contar))
+        inicio = time.perf_counter()
+        response = getattr(client, metodo)(url, data, format='json')
+        segundos = time.perf_counter() - inicio
+    return response, segundos, consultas
+
+
+def fase(paso, participantes, hilos):
+    """
+    Run `paso(participante)` for everyone on `hilos` threads and summarize the requests.
+
+    `paso` returns the `(response, segundos, consultas)` of its request and raises
+    AssertionError for an unexpected status code, which counts as an error.
+    """
+    def ejecutar(participante):
+        try:
+            return paso(participante)
+        except AssertionError:
+            return None
+
+    inicio = time.perf_counter()
+    mediciones = en_paralelo(ejecutar, participantes, hilos)
+    segundos = time.perf_counter() - inicio
+    correctas = [m for m in mediciones if m is not None]
+    consultas = [m[2] for m in correctas]
+    return {
+        'peticiones': len(mediciones),
+        'errores': len(mediciones) - len(correctas),
+        'segundos': round(segundos, 3),
+        'peticiones_por_segundo': round(len(mediciones) / segundos, 1),
+        'latencia': percentiles([m[1] for m in correctas]),
+        'consultas_por_peticion': {
+            'media': round(sum(consultas) / len(consultas), 2) if consultas else None,
+            'max': max(consultas, default=None),
+        },
+    }
+
+
+def _esperar(resultado, codigo):
+    response = resultado[0]
+    assert response.status_code == codigo, (response.status_code, getattr(response, 'data', None))
+    return resultado
+
+
+def flujo_reserva(n_especialistas, n_alumnos, n_horarios, hilos, password='Benchmark-2024'):
+    """
+    Drive register → verify → login → list slots → book → confirm through the API.
+
+    Seeds `n_especialistas` specialists with `n_horarios` slots between them. Each
+    endpoint runs as one phase, with every student hitting it concurrently on
+    `hilos` threads. Returns `{endpoint: fase() summary}`.
+    """
+    if n_horarios < n_alumnos:
+        raise ValueError("Se necesita al menos un horario por alumno.")
+    especialistas = sembrar_usuarios(n_especialistas, rol=Usuario.Roles.ESPECIALISTA, prefijo='especialista')
+    for especialista in especialistas:
+        especialista.set_password(password)
+    Usuario.objects.bulk_update(especialistas, ['password'])
+    por_especialista = -(-n_horarios // n_especialistas)
+    for especialista in especialistas:
+        sembrar_horarios(especialista, por_especialista)
+    # Round-robin over specialists, so every agenda gets bookings
+    por_agenda = {}
+    for horario in HorarioDisponible.objects.order_by('id').values_list('id', 'especialista_id', 'fecha'):
+        por_agenda.setdefault(horario[1], []).append(horario)
+    intercalados = [h for ronda in zip(*por_agenda.values()) for h in ronda]
+
+    alumnos = [
+        {'email': f'flujo{i}@tecnl.mx', 'client': cliente(i), 'horario': intercalados[i]}
+        for i in range(n_alumnos)
+    ]
+    resultados = {}
+
+    def registrar(alumno):
+        return _esperar(medir_peticion(alumno['client'], 'post', '/api/auth/register/', {
+            'email': alumno['email'], 'first_name': 'Flujo', 'last_name': alumno['email'][5:-9],
+            'password': password, 'matricula': alumno['email'][:-9],
+        }), 201)
+
+    def verificar(alumno):
+        usuario = Usuario.objects.get(email=alumno['email'])
+        uid = urlsafe_base64_encode(force_bytes(usuario.pk))
+        url = f'/api/auth/verify-email/{uid}/{account_activation_token.make_token(usuario)}/'
+        return _esperar(medir_peticion(alumno['client'], 'get', url), 200)
+
+    def iniciar_sesion(participante):
+        resultado = _esperar(medir_peticion(
+            participante['client'], 'post', '/api/auth/login/',
+            {'email': participante['email'], 'password': password},
+        ), 200)
+        participante['client'].credentials(HTTP_AUTHORIZATION=f"Bearer {resultado[0].data['access']}")
+        return resultado
+
+    def listar(alumno):
+        _, especialista_id, fecha = alumno['horario']
+        url = f'/api/agenda/horarios/?disponible=true&especialista={especialista_id}&desde={fecha}&hasta={fecha}'
+        return _esperar(medir_peticion(alumno['client'], 'get', url), 200)
+
+    def reservar_horario(alumno):
+        resultado = _esperar(medir_peticion(alumno['client'], 'post', '/api/citas/citas/', {
+            'horario_id': alumno['horario'][0], 'motivo': 'Benchmark',
+        }), 201)
+        alumno['cita'] = resultado[0].data['id']
+        return resultado
+
+    def confirmar(alumno):
+        client = sesiones[alumno['horario'][1]]['client']
+        return _esperar(medir_peticion(client, 'post', f"/api/citas/citas/{alumno['cita']}/confirmar/"), 200)
+
+    sesiones = {
+        e.pk: {'email': e.email, 'client': cliente(n_alumnos + i)} for i, e in enumerate(especialistas)
+    }
+    resultados['register'] = fase(registrar, alumnos, hilos)
+    resultados['verify_email'] = fase(verificar, alumnos, hilos)
+    resultados['login'] = fase(iniciar_sesion, alumnos + list(sesiones.values()), hilos)
+    resultados['horarios_list'] = fase(listar, alumnos, hilos)
+    resultados['citas_create'] = fase(reservar_horario, alumnos, hilos)
+    resultados['citas_confirmar'] = fase(confirmar, [a for a in alumnos if 'cita' in a], hilos)
+    return resultados
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from citas.barrido import barrer_citas
+
+
+class Command(BaseCommand):
+    help = (
+        "Cancels PENDIENTE appointments whose slot has passed and marks finished CONFIRMADA ones "
+        "as NO_ASISTIO, freeing their slots, in primary-key chunks. Each run is recorded."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=None, help="Appointments per chunk (SWEEPER_BATCH_SIZE).")
+        parser.add_argument('--loop', action='store_true', help="Keep sweeping once per interval instead of exiting.")
+        parser.add_argument('--intervalo', type=float, default=300.0, help="Seconds between runs.")
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                ejecucion = barrer_citas(lote=options['lote'])
+                if ejecucion.lotes or not options['loop']:
+                    self.stdout.write(
+                        f"{ejecucion.expiradas} expiradas, {ejecucion.no_asistio} no asistió, "
+                        f"{ejecucion.horarios_liberados} horarios liberados ({ejecucion.segundos:.2f} s)"
+                    )
+                if not options['loop']:
+                    break
+                time.sleep(max(options['intervalo'] - ejecucion.segundos, 0))
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,73 @@
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from citas.benchmarks import flujo_reserva
+from sistema_citas.benchmarks import base_de_datos_temporal
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "End-to-end booking benchmark on a throwaway database: register, verify, login, list slots, "
+        "book and confirm through the full request stack, one concurrent phase per endpoint. Writes "
+        "p50/p95/p99 latency, requests per second and queries per request to a JSON file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--especialistas', type=int, default=5)
+        parser.add_argument('--alumnos', type=int, default=100)
+        parser.add_argument('--horarios', type=int, default=500, help="Slots in total, at least one per student.")
+        parser.add_argument('--hilos', type=int, default=8)
+        parser.add_argument('--salida', default='bench_flujo.json', help="JSON file for the results.")
+        parser.add_argument('--comparar', help="Earlier results file: print the p95 and throughput change.")
+
+    def handle(self, *args, **options):
+        with base_de_datos_temporal():
+            motor = connection.vendor
+            endpoints = flujo_reserva(
+                options['especialistas'], options['alumnos'], options['horarios'], options['hilos'],
+            )
+        resultado = {
+            'commit': _commit(),
+            'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'entorno': {
+                'python': platform.python_version(), 'django': django.get_version(), 'base_de_datos': motor,
+            },
+            'parametros': {k: options[k] for k in ('especialistas', 'alumnos', 'horarios', 'hilos')},
+            'endpoints': endpoints,
+        }
+        with open(options['salida'], 'w') as archivo:
+            json.dump(resultado, archivo, indent=2)
+        self.stdout.write(json.dumps(endpoints, indent=2))
+        self.stdout.write(f"Resultados en {options['salida']}")
+        if options['comparar']:
+            self.comparar(options['comparar'], resultado)
+
+    def comparar(self, ruta, actual):
+        with open(ruta) as archivo:
+            anterior = json.load(archivo)
+        self.stdout.write(f"\nComparado con {anterior.get('commit') or ruta}:")
+        for endpoint, datos in actual['endpoints'].items():
+            previo = anterior['endpoints'].get(endpoint)
+            if not previo or not previo['latencia']['p95_ms'] or not datos['latencia']['p95_ms']:
+                continue
+            p95 = datos['latencia']['p95_ms'] / previo['latencia']['p95_ms'] - 1
+            rps = datos['peticiones_por_segundo'] / previo['peticiones_por_segundo'] - 1
+            consultas = (datos['consultas_por_peticion']['media'] or 0) - (previo['consultas_por_peticion']['media'] or 0)
+            self.stdout.write(
+                f"  {endpoint:<16} p95 {p95:+.0%}  peticiones/s {rps:+.0%}  consultas {consultas:+.2f}"
+            )
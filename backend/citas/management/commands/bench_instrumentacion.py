@@ -0,0 +1,62 @@
+import json
+import time
+from statistics import median
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from citas.benchmarks import sembrar_horarios, sembrar_usuarios
+from citas.models import Cita
+from sistema_citas.benchmarks import base_de_datos_temporal, percentiles
+from usuarios.models import Usuario
+
+
+class Command(BaseCommand):
+    help = (
+        "Overhead of PerformanceMiddleware on a throwaway database: the same requests through a "
+        "handler with PERFORMANCE_METRICS on and one with it off, in alternating rounds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--citas', type=int, default=50)
+        parser.add_argument('--rondas', type=int, default=20)
+        parser.add_argument('--peticiones', type=int, default=50, help="Requests per round and handler.")
+
+    def handle(self, *args, **options):
+        with base_de_datos_temporal():
+            resultado = self.medir(options['citas'], options['rondas'], options['peticiones'])
+        self.stdout.write(json.dumps(resultado, indent=2))
+
+    def cliente(self, usuario, activado):
+        client = APIClient()
+        client.force_authenticate(usuario)
+        # The middleware chain is built on the first request and kept by the client
+        with override_settings(PERFORMANCE_METRICS=activado):
+            client.get('/api/citas/citas/')
+        return client
+
+    def medir(self, n_citas, rondas, n_peticiones):
+        especialista = sembrar_usuarios(1, rol=Usuario.Roles.ESPECIALISTA, prefijo='especialista')[0]
+        horarios = sembrar_horarios(especialista, n_citas)
+        Cita.objects.bulk_create([
+            Cita(alumno=alumno, especialista=especialista, horario_id=horario_id, motivo='Carga')
+            for alumno, horario_id in zip(sembrar_usuarios(n_citas), horarios)
+        ])
+        clientes = {'desactivado': self.cliente(especialista, False), 'activado': self.cliente(especialista, True)}
+        resultado = {'citas': n_citas, 'peticiones_por_variante': rondas * n_peticiones}
+        for url in ('/api/citas/citas/', '/api/agenda/horarios/'):
+            muestras = {nombre: [] for nombre in clientes}
+            for _ in range(rondas):
+                # Alternating rounds so drift (caches, CPU frequency) hits both alike
+                for nombre, client in clientes.items():
+                    for _ in range(n_peticiones):
+                        inicio = time.perf_counter()
+                        client.get(url)
+                        muestras[nombre].append(time.perf_counter() - inicio)
+            base, medido = median(muestras['desactivado']), median(muestras['activado'])
+            resultado[url] = {
+                **{nombre: percentiles(valores) for nombre, valores in muestras.items()},
+                'sobrecarga_mediana': f"{medido / base - 1:+.2%}",
+            }
+        return resultado
@@ -0,0 +1,142 @@
+import csv
+import io
+import json
+import resource
+import time
+from datetime import date, datetime, time as dtime, timedelta
+
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+
+from agenda.models import HorarioDisponible
+from citas.benchmarks import sembrar_usuarios
+from citas.models import Cita
+from citas.reportes import exportar
+from departamentos.models import Departamento
+from sistema_citas.benchmarks import base_de_datos_temporal
+from usuarios.models import Usuario
+
+POR_DIA = 16
+ESTADOS = (Cita.Estado.COMPLETADA, Cita.Estado.COMPLETADA, Cita.Estado.NO_ASISTIO, Cita.Estado.CANCELADA)
+
+
+def _rss_pico_mb():
+    # ru_maxrss is the process peak, in KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Report exports on a throwaway database holding a year of appointments: rows per second, "
+        "bytes and peak RSS of each streamed report and format, then of a materialized CSV export "
+        "(every row loaded first) for comparison. Peak RSS only grows, so the streamed runs go first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--citas', type=int, default=100000)
+        parser.add_argument('--especialistas', type=int, default=40)
+
+    def handle(self, *args, **options):
+        with base_de_datos_temporal():
+            resultado = self.medir(options['citas'], options['especialistas'])
+        self.stdout.write(json.dumps(resultado, indent=2))
+
+    def sembrar(self, n, n_especialistas):
+        """Past slots and appointments in chunks, so seeding does not raise the peak RSS itself."""
+        departamento = Departamento.objects.create(nombre='Psicología')
+        especialistas = sembrar_usuarios(n_especialistas, rol=Usuario.Roles.ESPECIALISTA, prefijo='especialista')
+        Usuario.objects.filter(pk__in=[e.pk for e in especialistas]).update(departamento=departamento)
+        alumnos = [alumno.pk for alumno in sembrar_usuarios(500)]
+        primer_dia = date.today() - timedelta(days=365)
+        tramo = 5000
+        for inicio in range(0, n, tramo):
+            horarios = []
+            for i in range(inicio, min(inicio + tramo, n)):
+                especialista = especialistas[i % n_especialistas]
+                orden = i // n_especialistas
+                comienzo = datetime.combine(primer_dia + timedelta(days=orden // POR_DIA), dtime(8)) + timedelta(
+                    minutes=30 * (orden % POR_DIA)
+                )
+                horarios.append(HorarioDisponible(
+                    especialista=especialista, fecha=comienzo.date(), hora_inicio=comienzo.time(),
+                    hora_fin=(comienzo + timedelta(minutes=30)).time(), disponible=i % 4 == 3,
+                ))
+            creados = HorarioDisponible.objects.bulk_create(horarios, batch_size=1000)
+            Cita.objects.bulk_create([
+                Cita(alumno_id=alumnos[i % len(alumnos)], especialista_id=horario.especialista_id,
+                     horario_id=horario.pk, motivo='Benchmark', estado=ESTADOS[i % len(ESTADOS)])
+                for i, horario in zip(range(inicio, inicio + tramo), creados)
+            ], batch_size=1000)
+
+    def exportar(self, tipo, formato, filas):
+        contenido, _, _ = exportar(tipo, {'formato': formato})
+        inicio = time.perf_counter()
+        primer_trozo = None
+        tamano = 0
+        for trozo in contenido:
+            if primer_trozo is None:
+                primer_trozo = time.perf_counter() - inicio
+            tamano += len(trozo)
+        segundos = time.perf_counter() - inicio
+        return {
+            'filas': filas,
+            'segundos': round(segundos, 2),
+            'filas_por_segundo': round(filas / segundos),
+            'primer_trozo_ms': round(primer_trozo * 1000, 1),
+            'mb': round(tamano / 2 ** 20, 1),
+            'rss_pico_mb': _rss_pico_mb(),
+        }
+
+    def materializado(self, filas):
+        """The pre-streaming way: load every appointment with its relations, then write the file."""
+        inicio = time.perf_counter()
+        citas = list(Cita.objects.select_related('horario', 'especialista__departamento', 'alumno'))
+        salida = io.StringIO()
+        escritor = csv.writer(salida)
+        for cita in citas:
+            escritor.writerow([
+                cita.pk, cita.horario.fecha, cita.horario.hora_inicio, cita.horario.hora_fin, cita.estado,
+                cita.especialista.departamento.nombre, cita.especialista.get_full_name(),
+                cita.alumno.matricula, cita.alumno.get_full_name(), cita.alumno.email, cita.fecha_creacion,
+            ])
+        contenido = salida.getvalue().encode()
+        segundos = time.perf_counter() - inicio
+        return {
+            'filas': filas,
+            'segundos': round(segundos, 2),
+            'filas_por_segundo': round(filas / segundos),
+            'mb': round(len(contenido) / 2 ** 20, 1),
+            'rss_pico_mb': _rss_pico_mb(),
+        }
+
+    def por_http(self, filas):
+        admin = Usuario.objects.create(username='admin', email='admin@tecnl.mx', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        inicio = time.perf_counter()
+        response = client.get('/api/citas/reportes/citas/', {'formato': 'xlsx'})
+        tamano = sum(len(trozo) for trozo in response.streaming_content)
+        segundos = time.perf_counter() - inicio
+        return {
+            'status': response.status_code,
+            'segundos': round(segundos, 2),
+            'filas_por_segundo': round(filas / segundos),
+            'mb': round(tamano / 2 ** 20, 1),
+            'rss_pico_mb': _rss_pico_mb(),
+        }
+
+    def medir(self, n, n_especialistas):
+        inicio = time.perf_counter()
+        self.sembrar(n, n_especialistas)
+        dias = HorarioDisponible.objects.values('fecha', 'especialista_id').distinct().count()
+        resultado = {
+            'citas': n,
+            'segundos_sembrando': round(time.perf_counter() - inicio, 1),
+            'rss_pico_tras_sembrar_mb': _rss_pico_mb(),
+        }
+        for tipo, filas in (('citas', n), ('horarios', dias)):
+            for formato in ('csv', 'xlsx'):
+                resultado[f'{tipo}_{formato}'] = self.exportar(tipo, formato, filas)
+        resultado['citas_xlsx_por_http'] = self.por_http(n)
+        resultado['citas_csv_materializado'] = self.materializado(n)
+        return resultado
@@ -0,0 +1,56 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from agenda.models import HorarioDisponible
+from citas.benchmarks import reservar_en_paralelo, sembrar_horarios, sembrar_usuarios
+from citas.models import Cita
+from sistema_citas.benchmarks import base_de_datos_temporal
+from usuarios.models import Usuario
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrent booking load test on a throwaway database: N students racing for one "
+        "slot (exactly one must win) and N students booking distinct slots (throughput)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alumnos', type=int, default=200)
+        parser.add_argument('--hilos', type=int, default=16)
+
+    def handle(self, *args, **options):
+        with base_de_datos_temporal():
+            resultado = self.medir(options['alumnos'], options['hilos'])
+        self.stdout.write(json.dumps(resultado, indent=2))
+
+    def medir(self, n_alumnos, hilos):
+        especialista = sembrar_usuarios(1, rol=Usuario.Roles.ESPECIALISTA, prefijo='especialista')[0]
+        alumnos = sembrar_usuarios(n_alumnos)
+        horarios = sembrar_horarios(especialista, n_alumnos)
+
+        # Contention: everybody wants the same slot
+        codigos, segundos = reservar_en_paralelo([(alumno, horarios[0]) for alumno in alumnos], hilos)
+        contencion = {
+            'reservas': len(codigos),
+            'exitos': codigos.count(201),
+            'rechazos': codigos.count(400),
+            'segundos': round(segundos, 3),
+            'reservas_por_segundo': round(len(codigos) / segundos, 1),
+        }
+        Cita.objects.all().delete()
+        HorarioDisponible.objects.update(disponible=True)
+
+        # Throughput: every student books a different slot
+        codigos, segundos = reservar_en_paralelo(list(zip(alumnos, horarios)), hilos)
+        return {
+            'alumnos': n_alumnos,
+            'hilos': hilos,
+            'mismo_horario': contencion,
+            'horarios_distintos': {
+                'reservas': len(codigos),
+                'exitos': codigos.count(201),
+                'segundos': round(segundos, 3),
+                'reservas_por_segundo': round(codigos.count(201) / segundos, 1),
+            },
+        }
@@ -0,0 +1,64 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+
+from citas.benchmarks import sembrar_horarios, sembrar_usuarios
+from citas.models import Cita
+from sistema_citas.benchmarks import base_de_datos_temporal, percentiles
+from usuarios.models import Usuario
+
+
+class Command(BaseCommand):
+    help = (
+        "Cost of one dashboard poll on a throwaway database: response bytes, CPU and wall time "
+        "of the specialist's appointment and slot lists, full response versus If-None-Match 304."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--citas', type=int, default=50, help="Booked slots of the specialist.")
+        parser.add_argument('--horarios', type=int, default=200, help="Slots of the specialist.")
+        parser.add_argument('--sondeos', type=int, default=300)
+
+    def handle(self, *args, **options):
+        with base_de_datos_temporal():
+            resultado = self.medir(options['citas'], options['horarios'], options['sondeos'])
+        self.stdout.write(json.dumps(resultado, indent=2))
+
+    def medir(self, n_citas, n_horarios, n_sondeos):
+        especialista = sembrar_usuarios(1, rol=Usuario.Roles.ESPECIALISTA, prefijo='especialista')[0]
+        horarios = sembrar_horarios(especialista, max(n_horarios, n_citas))
+        alumnos = sembrar_usuarios(n_citas)
+        Cita.objects.bulk_create([
+            Cita(alumno=alumno, especialista=especialista, horario_id=horario_id, motivo='Sondeo')
+            for alumno, horario_id in zip(alumnos, horarios)
+        ])
+        client = APIClient()
+        client.force_authenticate(especialista)
+
+        def sondear(url, **cabeceras):
+            cpu, reloj = [], []
+            for _ in range(n_sondeos):
+                inicio_cpu, inicio = time.process_time(), time.perf_counter()
+                response = client.get(url, headers=cabeceras)
+                reloj.append(time.perf_counter() - inicio)
+                cpu.append(time.process_time() - inicio_cpu)
+            return response, {
+                'status': response.status_code,
+                'bytes': len(response.content),
+                'cpu_ms_media': round(sum(cpu) / len(cpu) * 1000, 3),
+                'latencia': percentiles(reloj),
+            }
+
+        resultado = {'citas': n_citas, 'horarios': max(n_horarios, n_citas), 'sondeos': n_sondeos}
+        for nombre, url in (('citas', '/api/citas/citas/'), ('horarios', '/api/agenda/horarios/')):
+            response, completo = sondear(url)
+            _, no_modificado = sondear(url, **{'if-none-match': response['ETag']})
+            assert no_modificado['status'] == 304
+            resultado[nombre] = {
+                'completo': completo,
+                'no_modificado_304': no_modificado,
+                'cpu_ahorrada': f"{1 - no_modificado['cpu_ms_media'] / completo['cpu_ms_media']:.0%}",
+            }
+        return resultado
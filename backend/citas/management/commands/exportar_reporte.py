@@ -0,0 +1,46 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from citas.reportes import REPORTES, ReporteFiltroSerializer, exportar
+from sistema_citas.exportacion import FORMATOS
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes an administrative report (appointments or slot utilization) as CSV or XLSX, "
+        "streamed from the database in constant memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=sorted(REPORTES))
+        parser.add_argument('--formato', choices=sorted(FORMATOS), default='csv')
+        parser.add_argument('--salida', help="Output file (default: standard output).")
+        parser.add_argument('--desde', help="First date, YYYY-MM-DD.")
+        parser.add_argument('--hasta', help="Last date, YYYY-MM-DD.")
+        parser.add_argument('--departamento', type=int)
+        parser.add_argument('--especialista', type=int)
+        parser.add_argument('--estado', help="Only appointments in this state (citas report).")
+
+    def handle(self, *args, **options):
+        parametros = {
+            campo: options[campo]
+            for campo in ('formato', 'desde', 'hasta', 'departamento', 'especialista', 'estado')
+            if options[campo] is not None
+        }
+        filtros = ReporteFiltroSerializer(data=parametros)
+        if not filtros.is_valid():
+            raise CommandError(filtros.errors)
+        contenido, _, _ = exportar(options['tipo'], filtros.validated_data)
+
+        salida = open(options['salida'], 'wb') if options['salida'] else sys.stdout.buffer
+        escritos = 0
+        try:
+            for trozo in contenido:
+                salida.write(trozo)
+                escritos += len(trozo)
+        finally:
+            if options['salida']:
+                salida.close()
+        if options['salida']:
+            self.stdout.write(self.style.SUCCESS(f"{options['salida']}: {escritos} bytes"))
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.2 on 2026-10-17 18:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0003_indices_consultas'),
+        ('citas', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['alumno', 'estado'], name='cita_alumno_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['especialista', 'estado'], name='cita_especialista_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['alumno', '-fecha_creacion', '-id'], name='cita_alumno_creacion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['especialista', '-fecha_creacion', '-id'], name='cita_especialista_creacion_idx'),
+        ),
+    ]
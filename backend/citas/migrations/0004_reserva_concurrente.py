@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-17 18:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0005_horario_sin_solapamiento'),
+        ('citas', '0003_indices_consultas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cita',
+            name='horario',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='citas', to='agenda.horariodisponible'),
+        ),
+        migrations.AddConstraint(
+            model_name='cita',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado__in', ['PENDIENTE', 'CONFIRMADA'])), fields=('alumno',), name='cita_activa_unica_por_alumno'),
+        ),
+        migrations.AddConstraint(
+            model_name='cita',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado__in', ['PENDIENTE', 'CONFIRMADA'])), fields=('horario',), name='cita_activa_unica_por_horario'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0004_reserva_concurrente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cita',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0005_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EjecucionBarrido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inicio', models.DateTimeField()),
+                ('segundos', models.FloatField()),
+                ('lotes', models.PositiveIntegerField(default=0)),
+                ('expiradas', models.PositiveIntegerField(default=0, help_text='PENDIENTE cuyo horario ya pasó, ahora CANCELADA')),
+                ('no_asistio', models.PositiveIntegerField(default=0, help_text='CONFIRMADA ya terminadas, ahora NO_ASISTIO')),
+                ('horarios_liberados', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -1,6 +1,21 @@
 from django.db import models
 from django.conf import settings
 
+
+class CitaQuerySet(models.QuerySet):
+    def con_detalles(self):
+        # Join every relation CitaSerializer reads and only fetch the columns it renders,
+        # so listing N appointments costs one query instead of 1 + 3N.
+        return self.select_related('horario', 'especialista', 'alumno').only(
+            'id', 'motivo', 'estado', 'fecha_creacion', 'updated_at', 'google_event_id',
+            'horario__id', 'horario__fecha', 'horario__hora_inicio', 'horario__hora_fin', 'horario__disponible',
+            'horario__updated_at',
+            'especialista__id', 'especialista__first_name', 'especialista__last_name', 'especialista__updated_at',
+            'alumno__id', 'alumno__first_name', 'alumno__last_name', 'alumno__email',
+            'alumno__telefono', 'alumno__matricula', 'alumno__updated_at',
+        )
+
+
 class Cita(models.Model):
     class Estado(models.TextChoices):
         PENDIENTE = 'PENDIENTE', 'Pendiente'
@@ -12,11 +27,52 @@ class Cita(models.Model):
 
     alumno = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='citas_alumno')
     especialista = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='citas_especialista')
-    horario = models.OneToOneField('agenda.HorarioDisponible', on_delete=models.CASCADE)
+    # A slot can be booked again after a rejection/cancellation; only one *active*
+    # appointment per slot is allowed (see cita_activa_unica_por_horario).
+    horario = models.ForeignKey('agenda.HorarioDisponible', on_delete=models.CASCADE, related_name='citas')
     motivo = models.TextField()
     estado = models.CharField(max_length=20, choices=Estado.choices, default=Estado.PENDIENTE)
     google_event_id = models.CharField(max_length=255, blank=True, null=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    # Set on every save; saves with update_fields must list it (see sistema_citas.condicional)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CitaQuerySet.as_manager()
+
+    ESTADOS_ACTIVOS = (Estado.PENDIENTE, Estado.CONFIRMADA)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['alumno'],
+                condition=models.Q(estado__in=['PENDIENTE', 'CONFIRMADA']),
+                name='cita_activa_unica_por_alumno',
+            ),
+            models.UniqueConstraint(
+                fields=['horario'],
+                condition=models.Q(estado__in=['PENDIENTE', 'CONFIRMADA']),
+                name='cita_activa_unica_por_horario',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['alumno', 'estado'], name='cita_alumno_estado_idx'),
+            models.Index(fields=['especialista', 'estado'], name='cita_especialista_estado_idx'),
+            models.Index(fields=['alumno', '-fecha_creacion', '-id'], name='cita_alumno_creacion_idx'),
+            models.Index(fields=['especialista', '-fecha_creacion', '-id'], name='cita_especialista_creacion_idx'),
+        ]
 
     def __str__(self):
         return f"Cita: {self.alumno} con {self.especialista} - {self.estado}"
+
+
+class EjecucionBarrido(models.Model):
+    """One run of the appointment sweeper (citas.barrido): what it changed and how long it took."""
+    inicio = models.DateTimeField()
+    segundos = models.FloatField()
+    lotes = models.PositiveIntegerField(default=0)
+    expiradas = models.PositiveIntegerField(default=0, help_text="PENDIENTE cuyo horario ya pasó, ahora CANCELADA")
+    no_asistio = models.PositiveIntegerField(default=0, help_text="CONFIRMADA ya terminadas, ahora NO_ASISTIO")
+    horarios_liberados = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Barrido {self.inicio:%Y-%m-%d %H:%M} ({self.expiradas} expiradas, {self.no_asistio} no asistió)"
@@ -0,0 +1,127 @@
+"""
+Administrative reports, exported as CSV or XLSX by `/api/citas/reportes/<tipo>/`
+and `manage.py exportar_reporte`.
+
+- citas: one row per appointment;
+- horarios: slot utilization, one row per specialist and day.
+
+Rows come from `values_list(...).iterator(chunk_size=REPORT_CHUNK_SIZE)` and go
+straight to sistema_citas.exportacion, so a year of the whole institute is
+exported in constant memory.
+"""
+
+from django.conf import settings
+from django.db.models import Count, Q, Value
+from django.db.models.functions import Concat
+from rest_framework import serializers
+
+from agenda.models import HorarioDisponible
+from sistema_citas.exportacion import FORMATOS
+
+from .models import Cita
+
+
+class ReporteFiltroSerializer(serializers.Serializer):
+    """Query parameters (or command options) of every report."""
+    formato = serializers.ChoiceField(choices=sorted(FORMATOS), default='csv')
+    desde = serializers.DateField(required=False)
+    hasta = serializers.DateField(required=False)
+    departamento = serializers.IntegerField(required=False, min_value=1)
+    especialista = serializers.IntegerField(required=False, min_value=1)
+    # Only the citas report; utilization counts every state
+    estado = serializers.ChoiceField(choices=Cita.Estado.choices, required=False)
+
+    def validate(self, data):
+        if data.get('desde') and data.get('hasta') and data['desde'] > data['hasta']:
+            raise serializers.ValidationError("'desde' debe ser anterior o igual a 'hasta'.")
+        return data
+
+
+def _filtrar(queryset, filtros, prefijo_horario=''):
+    if filtros.get('desde'):
+        queryset = queryset.filter(**{f'{prefijo_horario}fecha__gte': filtros['desde']})
+    if filtros.get('hasta'):
+        queryset = queryset.filter(**{f'{prefijo_horario}fecha__lte': filtros['hasta']})
+    if filtros.get('especialista'):
+        queryset = queryset.filter(especialista_id=filtros['especialista'])
+    if filtros.get('departamento'):
+        queryset = queryset.filter(especialista__departamento_id=filtros['departamento'])
+    return queryset
+
+
+def _nombre(prefijo):
+    return Concat(f'{prefijo}__first_name', Value(' '), f'{prefijo}__last_name')
+
+
+ENCABEZADOS_CITAS = (
+    'id', 'fecha', 'hora_inicio', 'hora_fin', 'estado', 'departamento', 'especialista',
+    'matricula', 'alumno', 'correo_alumno', 'solicitada',
+)
+
+
+def filas_citas(filtros):
+    queryset = _filtrar(Cita.objects.all(), filtros, prefijo_horario='horario__')
+    if filtros.get('estado'):
+        queryset = queryset.filter(estado=filtros['estado'])
+    return (
+        queryset.annotate(nombre_especialista=_nombre('especialista'), nombre_alumno=_nombre('alumno'))
+        .order_by('horario__fecha', 'horario__hora_inicio', 'pk')
+        .values_list(
+            'pk', 'horario__fecha', 'horario__hora_inicio', 'horario__hora_fin', 'estado',
+            'especialista__departamento__nombre', 'nombre_especialista',
+            'alumno__matricula', 'nombre_alumno', 'alumno__email', 'fecha_creacion',
+        )
+        .iterator(chunk_size=settings.REPORT_CHUNK_SIZE)
+    )
+
+
+ENCABEZADOS_HORARIOS = (
+    'fecha', 'departamento', 'especialista', 'horarios', 'libres', 'reservados',
+    'completadas', 'no_asistio', 'ocupacion',
+)
+
+
+def filas_horarios(filtros):
+    """
+    Utilization per specialist and day. `reservados` are slots taken by a pending
+    or confirmed appointment, or by an external block (calendario); `ocupacion`
+    is the share of slots not free.
+    """
+    filas = (
+        _filtrar(HorarioDisponible.objects.all(), filtros)
+        # The specialist's columns depend on especialista_id, so they do not split the groups
+        .values('fecha', 'especialista_id', 'especialista__departamento__nombre',
+                'especialista__first_name', 'especialista__last_name')
+        .annotate(
+            horarios=Count('pk', distinct=True),
+            libres=Count('pk', filter=Q(disponible=True), distinct=True),
+            completadas=Count('citas', filter=Q(citas__estado=Cita.Estado.COMPLETADA)),
+            no_asistio=Count('citas', filter=Q(citas__estado=Cita.Estado.NO_ASISTIO)),
+        )
+        .order_by('fecha', 'especialista_id')
+        .values_list(
+            'fecha', 'especialista__departamento__nombre', 'especialista__first_name', 'especialista__last_name',
+            'horarios', 'libres', 'completadas', 'no_asistio',
+        )
+        .iterator(chunk_size=settings.REPORT_CHUNK_SIZE)
+    )
+    for fecha, departamento, nombre, apellido, horarios, libres, completadas, no_asistio in filas:
+        reservados = horarios - libres
+        yield (
+            fecha, departamento, f'{nombre} {apellido}', horarios, libres, reservados, completadas, no_asistio,
+            round(reservados / horarios, 4),
+        )
+
+
+REPORTES = {
+    'citas': (ENCABEZADOS_CITAS, filas_citas),
+    'horarios': (ENCABEZADOS_HORARIOS, filas_horarios),
+}
+
+
+def exportar(tipo, filtros):
+    """`(byte chunks, content type, file name)` of report `tipo` with validated `filtros`."""
+    encabezados, filas = REPORTES[tipo]
+    escribir, content_type = FORMATOS[filtros['formato']]
+    nombre = f"{tipo}_{filtros.get('desde') or 'inicio'}_{filtros.get('hasta') or 'hoy'}.{filtros['formato']}"
+    return escribir(encabezados, filas(filtros)), content_type, nombre
@@ -1,7 +1,15 @@
 from rest_framework import serializers
 from .models import Cita
+from agenda.cache import invalidar
 from agenda.models import HorarioDisponible
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from notificaciones.models import Notificacion
+from notificaciones.eventos import publicar_horario
+from notificaciones.servicio import notificar_citas
+
+ACTIVE_APPOINTMENT_ERROR = "Ya tienes una cita activa. Debes completarla o cancelarla antes de agendar otra."
+SLOT_UNAVAILABLE_ERROR = "El horario seleccionado ya no está disponible."
 
 class CitaSerializer(serializers.ModelSerializer):
     horario_id = serializers.PrimaryKeyRelatedField(
@@ -37,14 +45,15 @@ class CitaSerializer(serializers.ModelSerializer):
     def validate(self, data):
         user = self.context['request'].user
         
-        # Check if user has an active appointment (PENDIENTE or CONFIRMADA)
+        # Check if user has an active appointment (PENDIENTE or CONFIRMADA).
+        # This is only the friendly early answer; cita_activa_unica_por_alumno enforces it.
         active_appointments = Cita.objects.filter(
             alumno=user,
-            estado__in=[Cita.Estado.PENDIENTE, Cita.Estado.CONFIRMADA]
+            estado__in=Cita.ESTADOS_ACTIVOS
         ).exists()
 
         if active_appointments:
-            raise serializers.ValidationError("Ya tienes una cita activa. Debes completarla o cancelarla antes de agendar otra.")
+            raise serializers.ValidationError(ACTIVE_APPOINTMENT_ERROR)
 
         return data
 
@@ -53,19 +62,35 @@ class CitaSerializer(serializers.ModelSerializer):
         horario = validated_data['horario']
 
         with transaction.atomic():
-            # Double check availability inside transaction
-            if not horario.disponible:
-                raise serializers.ValidationError("El horario seleccionado ya no está disponible.")
+            # Take the slot with a conditional UPDATE: of all concurrent requests for
+            # the same slot exactly one sees a matched row, the rest see 0.
+            taken = HorarioDisponible.objects.filter(pk=horario.pk, disponible=True).update(
+                disponible=False, updated_at=timezone.now()
+            )
+            if not taken:
+                raise serializers.ValidationError(SLOT_UNAVAILABLE_ERROR)
+
+            try:
+                with transaction.atomic():
+                    cita = Cita.objects.create(
+                        alumno=user,
+                        especialista_id=horario.especialista_id,
+                        horario=horario,
+                        motivo=validated_data['motivo'],
+                        estado=Cita.Estado.PENDIENTE
+                    )
+            except IntegrityError:
+                # A parallel request won one of the partial unique indexes; raising here
+                # also rolls back the slot UPDATE above. The conflicting row is committed
+                # by now, so asking again tells which of the two it was.
+                if Cita.objects.filter(alumno=user, estado__in=Cita.ESTADOS_ACTIVOS).exists():
+                    raise serializers.ValidationError(ACTIVE_APPOINTMENT_ERROR)
+                raise serializers.ValidationError(SLOT_UNAVAILABLE_ERROR)
 
-            # Mark slot as unavailable
             horario.disponible = False
-            horario.save()
+            # The conditional UPDATE above bypasses the model signals
+            invalidar([(horario.especialista_id, horario.fecha)])
+            publicar_horario(horario)
+            notificar_citas([cita], Notificacion.Tipo.CITA_SOLICITADA)
 
-            cita = Cita.objects.create(
-                alumno=user,
-                especialista=horario.especialista,
-                horario=horario,
-                motivo=validated_data['motivo'],
-                estado=Cita.Estado.PENDIENTE
-            )
-            return cita
+        return cita
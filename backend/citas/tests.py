@@ -1,3 +1,420 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+import zipfile
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from agenda.models import HorarioDisponible
+from departamentos.models import Departamento
+from usuarios.models import Usuario
+from .barrido import barrer_citas
+from .benchmarks import flujo_reserva, reservar_en_paralelo, sembrar_horarios, sembrar_usuarios
+from .models import Cita, EjecucionBarrido
+from .serializers import SLOT_UNAVAILABLE_ERROR, CitaSerializer
+
+
+def _proximo_dia_habil(offset=1):
+    dia = date.today() + timedelta(days=offset)
+    while dia.weekday() > 4:
+        dia += timedelta(days=1)
+    return dia
+
+
+class CitaTestData(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.especialista = Usuario.objects.create_user(
+            username='esp', email='esp@tecnl.mx', password='x',
+            first_name='Ana', last_name='Ruiz', rol=Usuario.Roles.ESPECIALISTA,
+        )
+        cls.alumnos = []
+        for i in range(12):
+            alumno = Usuario.objects.create_user(
+                username=f'alumno{i}', email=f'alumno{i}@tecnl.mx', password='x',
+                first_name='Alumno', last_name=str(i), matricula=f'A{i:04d}',
+            )
+            horario = HorarioDisponible.objects.create(
+                especialista=cls.especialista,
+                fecha=_proximo_dia_habil(),
+                hora_inicio=time(8 + i // 2, (i % 2) * 30),
+                hora_fin=time(8 + i // 2, (i % 2) * 30 + 29),
+                disponible=False,
+            )
+            Cita.objects.create(
+                alumno=alumno, especialista=cls.especialista, horario=horario, motivo='Motivo',
+            )
+            cls.alumnos.append(alumno)
+
+    def _client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+
+class CitaQueryCountTests(CitaTestData):
+    """The appointment endpoints must not issue per-row queries."""
+
+    # Authentication is forced, so these budgets cover only the view itself.
+    # Lists run the ETag fingerprint aggregate before the page query.
+    LIST_QUERIES = 2
+    DETAIL_QUERIES = 1
+
+    def test_lista_especialista_no_depende_del_numero_de_citas(self):
+        client = self._client(self.especialista)
+        with self.assertNumQueries(self.LIST_QUERIES):
+            response = client.get('/api/citas/citas/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 12)
+        detalles = response.data['results'][0]['horario_detalles']
+        self.assertEqual(detalles['especialista_nombre'], 'Ana Ruiz')
+
+    def test_lista_alumno(self):
+        client = self._client(self.alumnos[0])
+        with self.assertNumQueries(self.LIST_QUERIES):
+            response = client.get('/api/citas/citas/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['alumno_detalles']['matricula'], 'A0000')
+
+    def test_detalle(self):
+        cita = Cita.objects.filter(alumno=self.alumnos[3]).get()
+        client = self._client(self.especialista)
+        with self.assertNumQueries(self.DETAIL_QUERIES):
+            response = client.get(f'/api/citas/citas/{cita.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['alumno_detalles']['email'], 'alumno3@tecnl.mx')
+
+    def test_rechazar_libera_horario(self):
+        cita = Cita.objects.filter(alumno=self.alumnos[1]).get()
+        response = self._client(self.especialista).post(f'/api/citas/citas/{cita.pk}/rechazar/')
+        self.assertEqual(response.status_code, 200)
+        cita.refresh_from_db()
+        self.assertEqual(cita.estado, Cita.Estado.RECHAZADA)
+        self.assertTrue(HorarioDisponible.objects.get(pk=cita.horario_id).disponible)
+        self.assertEqual(cita.motivo, 'Motivo')
+
+    def test_rechazar_de_nuevo_no_libera_el_horario_reservado_otra_vez(self):
+        cita = Cita.objects.filter(alumno=self.alumnos[1]).get()
+        especialista = self._client(self.especialista)
+        self.assertEqual(especialista.post(f'/api/citas/citas/{cita.pk}/rechazar/').status_code, 200)
+        otro = Usuario.objects.create_user(username='otro', email='otro@tecnl.mx')
+        response = self._client(otro).post(
+            '/api/citas/citas/', {'horario_id': cita.horario_id, 'motivo': 'Otra'}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+
+        response = especialista.post(f'/api/citas/citas/{cita.pk}/rechazar/')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(HorarioDisponible.objects.get(pk=cita.horario_id).disponible)
+        self.assertEqual(Cita.objects.get(alumno=otro).estado, Cita.Estado.PENDIENTE)
+
+    def test_choque_con_la_cita_activa_del_horario(self):
+        # A slot marked free while an active appointment still holds it: the
+        # conditional UPDATE passes and cita_activa_unica_por_horario rejects the insert.
+        cita = Cita.objects.filter(alumno=self.alumnos[2]).get()
+        HorarioDisponible.objects.filter(pk=cita.horario_id).update(disponible=True)
+        otro = Usuario.objects.create_user(username='otro', email='otro@tecnl.mx')
+        # Straight to create(), as a request that passed validation before the race
+        serializer = CitaSerializer(context={'request': SimpleNamespace(user=otro)})
+        with self.assertRaises(ValidationError) as error:
+            serializer.create({'horario': HorarioDisponible.objects.get(pk=cita.horario_id), 'motivo': 'Otra'})
+        self.assertEqual(error.exception.detail, [SLOT_UNAVAILABLE_ERROR])
+        self.assertFalse(Cita.objects.filter(alumno=otro).exists())
+        self.assertTrue(HorarioDisponible.objects.get(pk=cita.horario_id).disponible)
+
+
+class CitaPaginationTests(CitaTestData):
+
+    def test_cursor_recorre_todas_las_citas_sin_repetir(self):
+        client = self._client(self.especialista)
+        vistos = []
+        url = '/api/citas/citas/?page_size=5'
+        while url:
+            with self.assertNumQueries(CitaQueryCountTests.LIST_QUERIES):
+                response = client.get(url)
+            vistos.extend(c['id'] for c in response.data['results'])
+            url = response.data['next']
+        esperados = list(
+            Cita.objects.filter(especialista=self.especialista)
+            .order_by('-fecha_creacion', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(vistos, esperados)
+
+    def test_cursor_invalido(self):
+        client = self._client(self.especialista)
+        response = client.get('/api/citas/citas/?cursor=no-es-un-cursor')
+        self.assertEqual(response.status_code, 404)
+
+    def test_modo_stream(self):
+        client = self._client(self.especialista)
+        response = client.get('/api/citas/citas/?stream=true')
+        self.assertEqual(response.status_code, 200)
+        cuerpo = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(cuerpo), 12)
+
+
+class CitaCondicionalTests(CitaTestData):
+    """Polls with a matching If-None-Match get a 304 without serializing anything."""
+
+    def test_lista_sin_cambios_responde_304_con_una_consulta(self):
+        client = self._client(self.especialista)
+        response = client.get('/api/citas/citas/')
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = client.get('/api/citas/citas/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_cambio_de_estado_cambia_el_etag(self):
+        client = self._client(self.especialista)
+        etag = client.get('/api/citas/citas/')['ETag']
+        cita = Cita.objects.filter(alumno=self.alumnos[2]).get()
+        self.assertEqual(client.post(f'/api/citas/citas/{cita.pk}/rechazar/').status_code, 200)
+        response = client.get('/api/citas/citas/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_cambio_del_horario_cambia_el_etag_del_detalle(self):
+        cita = Cita.objects.filter(alumno=self.alumnos[4]).get()
+        client = self._client(self.alumnos[4])
+        url = f'/api/citas/citas/{cita.pk}/'
+        etag = client.get(url)['ETag']
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        horario = cita.horario
+        horario.hora_fin = time(17, 0)
+        horario.save()
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_cambio_de_datos_del_alumno_cambia_el_etag(self):
+        client = self._client(self.especialista)
+        etag = client.get('/api/citas/citas/')['ETag']
+        alumno = Usuario.objects.get(pk=self.alumnos[5].pk)
+        alumno.telefono = '8112345678'
+        alumno.save()
+        response = client.get('/api/citas/citas/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        especialista = Usuario.objects.get(pk=self.especialista.pk)
+        especialista.last_name = 'Ruiz Paz'
+        especialista.save(update_fields=['last_name'])
+        self.assertEqual(client.get('/api/citas/citas/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_el_etag_depende_del_usuario(self):
+        etag = self._client(self.alumnos[0]).get('/api/citas/citas/')['ETag']
+        response = self._client(self.alumnos[1]).get('/api/citas/citas/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(SWEEPER_PENDING_EXPIRY_MINUTES=0, SWEEPER_NO_SHOW_GRACE_MINUTES=120)
+class BarridoTests(TestCase):
+    AHORA = timezone.make_aware(datetime(2030, 3, 4, 12, 0))
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.especialista = Usuario.objects.create_user(
+            username='esp', email='esp@tecnl.mx', password='x', rol=Usuario.Roles.ESPECIALISTA,
+        )
+        cls.citas = {}
+        for nombre, fecha, inicio, estado in (
+            ('pendiente_pasada1', date(2030, 3, 1), time(9), Cita.Estado.PENDIENTE),
+            ('pendiente_pasada2', date(2030, 3, 4), time(11, 30), Cita.Estado.PENDIENTE),
+            ('pendiente_pasada3', date(2030, 3, 4), time(12), Cita.Estado.PENDIENTE),
+            ('pendiente_futura', date(2030, 3, 4), time(12, 30), Cita.Estado.PENDIENTE),
+            ('confirmada_vieja', date(2030, 3, 4), time(9), Cita.Estado.CONFIRMADA),
+            ('confirmada_en_gracia', date(2030, 3, 4), time(10, 30), Cita.Estado.CONFIRMADA),
+            ('completada', date(2030, 3, 1), time(10), Cita.Estado.COMPLETADA),
+        ):
+            alumno = Usuario.objects.create_user(username=nombre, email=f'{nombre}@tecnl.mx', password='x')
+            horario = HorarioDisponible.objects.create(
+                especialista=cls.especialista, fecha=fecha, hora_inicio=inicio,
+                hora_fin=(datetime.combine(fecha, inicio) + timedelta(minutes=30)).time(), disponible=False,
+            )
+            cls.citas[nombre] = Cita.objects.create(
+                alumno=alumno, especialista=cls.especialista, horario=horario, motivo='M', estado=estado,
+            )
+
+    def _estados(self):
+        return dict(Cita.objects.values_list('alumno__username', 'estado'))
+
+    def test_mueve_las_citas_vencidas_y_libera_sus_horarios(self):
+        ejecucion = barrer_citas(self.AHORA, lote=2)
+        self.assertEqual((ejecucion.expiradas, ejecucion.no_asistio, ejecucion.horarios_liberados), (3, 1, 4))
+        self.assertEqual(ejecucion.lotes, 3)
+        self.assertEqual(EjecucionBarrido.objects.get(), ejecucion)
+        self.assertEqual(self._estados(), {
+            'pendiente_pasada1': Cita.Estado.CANCELADA,
+            'pendiente_pasada2': Cita.Estado.CANCELADA,
+            'pendiente_pasada3': Cita.Estado.CANCELADA,
+            'pendiente_futura': Cita.Estado.PENDIENTE,
+            'confirmada_vieja': Cita.Estado.NO_ASISTIO,
+            'confirmada_en_gracia': Cita.Estado.CONFIRMADA,
+            'completada': Cita.Estado.COMPLETADA,
+        })
+        self.assertEqual(HorarioDisponible.objects.filter(disponible=True).count(), 4)
+        self.assertFalse(HorarioDisponible.objects.get(citas=self.citas['pendiente_futura']).disponible)
+
+    def test_segunda_pasada_no_hace_nada(self):
+        barrer_citas(self.AHORA)
+        ejecucion = barrer_citas(self.AHORA)
+        self.assertEqual((ejecucion.lotes, ejecucion.expiradas, ejecucion.no_asistio), (0, 0, 0))
+
+    def test_el_alumno_puede_volver_a_reservar(self):
+        barrer_citas(self.AHORA)
+        alumno = self.citas['pendiente_pasada1'].alumno
+        horario = HorarioDisponible.objects.create(
+            especialista=self.especialista, fecha=_proximo_dia_habil(), hora_inicio=time(9), hora_fin=time(9, 30),
+        )
+        client = APIClient()
+        client.force_authenticate(alumno)
+        response = client.post('/api/citas/citas/', {'horario_id': horario.pk, 'motivo': 'Otra'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+
+class ReporteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.psicologia = Departamento.objects.create(nombre='Psicología')
+        cls.tutorias = Departamento.objects.create(nombre='Tutorías')
+        cls.admin = Usuario.objects.create_user(username='admin', email='admin@tecnl.mx', is_staff=True)
+        cls.jefa = Usuario.objects.create_user(
+            username='jefa', email='jefa@tecnl.mx', rol=Usuario.Roles.ADMIN, departamento=cls.tutorias,
+        )
+        cls.dia = date(2030, 3, 4)
+        for departamento, n, estados in (
+            (cls.psicologia, 'psi', (Cita.Estado.COMPLETADA, Cita.Estado.NO_ASISTIO, None)),
+            (cls.tutorias, 'tut', (Cita.Estado.CONFIRMADA,)),
+        ):
+            especialista = Usuario.objects.create_user(
+                username=n, email=f'{n}@tecnl.mx', first_name='Esp', last_name=n.upper(),
+                rol=Usuario.Roles.ESPECIALISTA, departamento=departamento,
+            )
+            for i, estado in enumerate(estados):
+                horario = HorarioDisponible.objects.create(
+                    especialista=especialista, fecha=cls.dia, hora_inicio=time(9 + i), hora_fin=time(9 + i, 50),
+                    disponible=estado is None,
+                )
+                if estado is not None:
+                    Cita.objects.create(
+                        alumno=Usuario.objects.create_user(
+                            username=f'{n}{i}', email=f'{n}{i}@tecnl.mx', first_name='José', last_name=f'Núñez, {i}',
+                        ),
+                        especialista=especialista, horario=horario, motivo='M', estado=estado,
+                    )
+
+    def _get(self, usuario, tipo, **parametros):
+        client = APIClient()
+        client.force_authenticate(usuario)
+        return client.get(f'/api/citas/reportes/{tipo}/', parametros)
+
+    def _csv(self, response):
+        contenido = b''.join(response.streaming_content).decode('utf-8-sig')
+        return list(csv.reader(io.StringIO(contenido)))
+
+    def test_reporte_de_citas_en_csv(self):
+        response = self._get(self.admin, 'citas', estado='COMPLETADA')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="citas_inicio_hoy.csv"', response['Content-Disposition'])
+        filas = self._csv(response)
+        self.assertEqual(filas[0][:5], ['id', 'fecha', 'hora_inicio', 'hora_fin', 'estado'])
+        self.assertEqual(len(filas), 2)
+        self.assertEqual(filas[1][1:6], ['2030-03-04', '09:00:00', '09:50:00', 'COMPLETADA', 'Psicología'])
+        self.assertEqual(filas[1][8], 'José Núñez, 0')
+
+    def test_reporte_de_horarios_en_xlsx(self):
+        response = self._get(self.admin, 'horarios', formato='xlsx', departamento=self.psicologia.pk)
+
+        self.assertEqual(response.status_code, 200)
+        libro = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(libro.testzip())
+        hoja = libro.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(hoja.count('<row '), 2)
+        # 3 slots, 1 free, 2 taken: one completed, one no-show
+        self.assertIn('<c r="D2"><v>3</v></c><c r="E2"><v>1</v></c><c r="F2"><v>2</v></c>', hoja)
+        self.assertIn('<c r="G2"><v>1</v></c><c r="H2"><v>1</v></c><c r="I2"><v>0.6667</v></c>', hoja)
+
+    def test_administrador_de_departamento_solo_ve_el_suyo(self):
+        filas = self._csv(self._get(self.jefa, 'citas', departamento=self.psicologia.pk))
+        self.assertEqual([fila[5] for fila in filas[1:]], ['Tutorías'])
+
+    def test_permisos_y_validacion(self):
+        alumno = Usuario.objects.get(username='psi0')
+        self.assertEqual(self._get(alumno, 'citas').status_code, 403)
+        self.assertEqual(self._get(self.admin, 'otro').status_code, 404)
+        self.assertEqual(self._get(self.admin, 'citas', formato='pdf').status_code, 400)
+        self.assertEqual(self._get(self.admin, 'citas', desde='2030-03-05', hasta='2030-03-04').status_code, 400)
+
+    def test_comando(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            salida = os.path.join(directorio, 'citas.csv')
+            call_command('exportar_reporte', 'citas', '--salida', salida, '--hasta', '2030-03-04', stdout=io.StringIO())
+            with open(salida, encoding='utf-8-sig') as archivo:
+                self.assertEqual(len(list(csv.reader(archivo))), 4)
+
+
+class ReservaConcurrenteTests(TransactionTestCase):
+    """Parallel bookings must never double-book a slot or give a student two active appointments."""
+
+    HILOS = 8
+
+    def setUp(self):
+        self.especialista = sembrar_usuarios(1, rol=Usuario.Roles.ESPECIALISTA, prefijo='especialista')[0]
+
+    def test_un_solo_ganador_por_horario(self):
+        alumnos = sembrar_usuarios(16)
+        horario_id = sembrar_horarios(self.especialista, 1)[0]
+        codigos, _ = reservar_en_paralelo([(alumno, horario_id) for alumno in alumnos], self.HILOS)
+        self.assertEqual(codigos.count(201), 1, codigos)
+        self.assertEqual(codigos.count(400), len(alumnos) - 1, codigos)
+        self.assertEqual(Cita.objects.filter(horario_id=horario_id).count(), 1)
+        self.assertFalse(HorarioDisponible.objects.get(pk=horario_id).disponible)
+
+    def test_una_cita_activa_por_alumno(self):
+        alumno = sembrar_usuarios(1)[0]
+        horarios = sembrar_horarios(self.especialista, 8)
+        codigos, _ = reservar_en_paralelo([(alumno, horario_id) for horario_id in horarios], self.HILOS)
+        self.assertEqual(codigos.count(201), 1, codigos)
+        self.assertEqual(Cita.objects.filter(alumno=alumno).count(), 1)
+        # Losing requests must not leave their slot taken
+        self.assertEqual(HorarioDisponible.objects.filter(disponible=False).count(), 1)
+
+    def test_horario_rechazado_se_puede_reservar_de_nuevo(self):
+        primero, segundo = sembrar_usuarios(2)
+        horario_id = sembrar_horarios(self.especialista, 1)[0]
+        self.assertEqual(reservar_en_paralelo([(primero, horario_id)], 1)[0], [201])
+        client = APIClient()
+        client.force_authenticate(self.especialista)
+        cita = Cita.objects.get(alumno=primero)
+        self.assertEqual(client.post(f'/api/citas/citas/{cita.pk}/rechazar/').status_code, 200)
+        self.assertEqual(reservar_en_paralelo([(segundo, horario_id)], 1)[0], [201])
+
+
+class FlujoReservaBenchmarkTests(TransactionTestCase):
+    """Keeps `manage.py bench_flujo` working: every phase of the flow must succeed."""
+
+    def setUp(self):
+        # Token versions cached by earlier tests may belong to reused primary keys
+        cache.clear()
+
+    def test_flujo_completo_sin_errores(self):
+        resultados = flujo_reserva(n_especialistas=1, n_alumnos=3, n_horarios=3, hilos=2)
+        self.assertEqual(
+            list(resultados),
+            ['register', 'verify_email', 'login', 'horarios_list', 'citas_create', 'citas_confirmar'],
+        )
+        for endpoint, datos in resultados.items():
+            self.assertEqual(datos['errores'], 0, endpoint)
+        self.assertEqual(resultados['login']['peticiones'], 4)
+        self.assertEqual(Cita.objects.filter(estado=Cita.Estado.CONFIRMADA).count(), 3)
@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CitaViewSet
+from .views import CitaViewSet, reporte
 
 router = DefaultRouter()
 router.register(r'citas', CitaViewSet, basename='cita')
 
 urlpatterns = [
+    path('reportes/<str:tipo>/', reporte, name='reporte'),
     path('', include(router.urls)),
 ]
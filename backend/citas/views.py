@@ -1,19 +1,51 @@
+from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
 from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from .models import Cita
+from .reportes import REPORTES, ReporteFiltroSerializer, exportar
 from .serializers import CitaSerializer
+from agenda.cache import invalidar
+from agenda.models import HorarioDisponible
+from calendario.models import OperacionCalendario
+from calendario.sincronizacion import encolar
 from usuarios.models import Usuario
+from notificaciones.models import Notificacion
+from notificaciones.eventos import publicar_horario
+from notificaciones.servicio import notificar_citas
+from sistema_citas.condicional import ConditionalGetMixin
+from sistema_citas.pagination import KeysetPagination, StreamingListMixin
+from sistema_citas.routers import ReplicaReadMixin
 
-class CitaViewSet(viewsets.ModelViewSet):
+class IsAdministrador(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and (request.user.is_staff or request.user.rol == Usuario.Roles.ADMIN)
+
+class CitaPagination(KeysetPagination):
+    ordering = ('-fecha_creacion', '-id')
+
+class CitaViewSet(ReplicaReadMixin, ConditionalGetMixin, StreamingListMixin, viewsets.ModelViewSet):
     serializer_class = CitaSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CitaPagination
+    # horario_detalles renders the slot's date and times, alumno_detalles and
+    # especialista_nombre the users' names and contact details
+    fingerprint_related = ('horario__updated_at', 'alumno__updated_at', 'especialista__updated_at')
 
     def get_queryset(self):
         user = self.request.user
+        queryset = Cita.objects.con_detalles()
         if user.rol == Usuario.Roles.ESPECIALISTA:
-            return Cita.objects.filter(especialista=user).order_by('-fecha_creacion')
-        return Cita.objects.filter(alumno=user).order_by('-fecha_creacion')
+            return queryset.filter(especialista=user).order_by('-fecha_creacion')
+        return queryset.filter(alumno=user).order_by('-fecha_creacion')
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            if instance.estado == Cita.Estado.CONFIRMADA or instance.google_event_id:
+                encolar(instance, OperacionCalendario.Accion.BORRAR)
+            instance.delete()
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def confirmar(self, request, pk=None):
@@ -24,9 +56,12 @@ class CitaViewSet(viewsets.ModelViewSet):
         if cita.estado != Cita.Estado.PENDIENTE:
             return Response({"error": "Solo se pueden confirmar citas pendientes."}, status=status.HTTP_400_BAD_REQUEST)
 
-        cita.estado = Cita.Estado.CONFIRMADA
-        cita.save()
-        # TODO: Trigger Google Calendar Event Creation here
+        with transaction.atomic():
+            cita.estado = Cita.Estado.CONFIRMADA
+            cita.save()
+            notificar_citas([cita], Notificacion.Tipo.CITA_CONFIRMADA)
+            # Sent by `manage.py sincronizar_calendario`, never on the request
+            encolar(cita, OperacionCalendario.Accion.CREAR)
         return Response({"status": "Cita confirmada"})
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
@@ -35,11 +70,23 @@ class CitaViewSet(viewsets.ModelViewSet):
         if request.user != cita.especialista:
              return Response({"error": "No tienes permiso para rechazar esta cita."}, status=status.HTTP_403_FORBIDDEN)
 
-        cita.estado = Cita.Estado.RECHAZADA
-        # Free up the slot
-        cita.horario.disponible = True
-        cita.horario.save()
-        cita.save()
+        if cita.estado not in Cita.ESTADOS_ACTIVOS:
+            return Response({"error": "Solo se pueden rechazar citas pendientes o confirmadas."}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            if cita.estado == Cita.Estado.CONFIRMADA:
+                encolar(cita, OperacionCalendario.Accion.BORRAR)
+            cita.estado = Cita.Estado.RECHAZADA
+            cita.save(update_fields=['estado', 'updated_at'])
+            # Free up the slot, unless another active appointment already holds it
+            liberado = HorarioDisponible.objects.filter(pk=cita.horario_id).exclude(
+                citas__estado__in=Cita.ESTADOS_ACTIVOS
+            ).update(disponible=True, updated_at=timezone.now())
+            if liberado:
+                cita.horario.disponible = True
+                invalidar([(cita.especialista_id, cita.horario.fecha)])
+                publicar_horario(cita.horario)
+            notificar_citas([cita], Notificacion.Tipo.CITA_RECHAZADA)
         return Response({"status": "Cita rechazada"})
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
@@ -51,6 +98,29 @@ class CitaViewSet(viewsets.ModelViewSet):
         if cita.estado != Cita.Estado.CONFIRMADA:
             return Response({"error": "Solo se pueden completar citas confirmadas."}, status=status.HTTP_400_BAD_REQUEST)
 
-        cita.estado = Cita.Estado.COMPLETADA
-        cita.save()
+        with transaction.atomic():
+            cita.estado = Cita.Estado.COMPLETADA
+            cita.save()
+            notificar_citas([cita], Notificacion.Tipo.CITA_COMPLETADA)
         return Response({"status": "Cita completada"})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdministrador])
+def reporte(request, tipo):
+    """
+    Stream report `tipo` (citas.reportes) as CSV or XLSX, filtered by the query string.
+
+    Administrators tied to a department (not staff) only get that department.
+    """
+    if tipo not in REPORTES:
+        raise Http404
+    filtros = ReporteFiltroSerializer(data=request.query_params)
+    filtros.is_valid(raise_exception=True)
+    datos = filtros.validated_data
+    if not request.user.is_staff and request.user.departamento_id:
+        datos['departamento'] = request.user.departamento_id
+    contenido, content_type, nombre = exportar(tipo, datos)
+    response = StreamingHttpResponse(contenido, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return response
@@ -0,0 +1,72 @@
+"""
+Thread-free ASGI application for the server-sent events endpoint.
+
+Django's ASGIHandler runs every request in its own ThreadSensitiveContext, and the
+synchronous request_started/request_finished receivers pin an executor thread to
+that context for as long as the response lasts: one idle thread per open stream.
+`sistema_citas.asgi` routes RUTA_EVENTOS here instead, where the headers and
+the stream run on the event loop; only the token check borrows a thread.
+"""
+
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .eventos import CABECERAS_SSE, canales_del_token, flujo_eventos
+
+RUTA_EVENTOS = '/api/notificaciones/eventos/'
+
+
+def _cabeceras_cors(cabeceras):
+    origen = cabeceras.get(b'origin')
+    if origen and (settings.CORS_ALLOW_ALL_ORIGINS or origen.decode() in getattr(settings, 'CORS_ALLOWED_ORIGINS', ())):
+        return [(b'access-control-allow-origin', origen), (b'vary', b'Origin')]
+    return []
+
+
+async def _esperar_desconexion(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def _enviar_flujo(flujo, send):
+    async for parte in flujo:
+        await send({'type': 'http.response.body', 'body': parte, 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def eventos_app(scope, receive, send):
+    cabeceras = dict(scope['headers'])
+    crudo = parse_qs(scope['query_string'].decode()).get('token', [None])[0]
+    if not crudo:
+        _, _, crudo = cabeceras.get(b'authorization', b'').decode().partition(' ')
+    # The version check may query the database; the executor is only held for the check
+    suscripcion = await sync_to_async(canales_del_token)(crudo)
+    cors = _cabeceras_cors(cabeceras)
+
+    if suscripcion is None:
+        await send({
+            'type': 'http.response.start', 'status': 401,
+            'headers': [(b'content-type', b'application/json')] + cors,
+        })
+        await send({'type': 'http.response.body', 'body': json.dumps({'detail': 'Token inválido o expirado.'}).encode()})
+        return
+
+    await send({
+        'type': 'http.response.start', 'status': 200,
+        'headers': [(b'content-type', b'text/event-stream')]
+        + [(nombre.lower().encode(), valor.encode()) for nombre, valor in CABECERAS_SSE] + cors,
+    })
+    flujo = flujo_eventos(*suscripcion)
+    envio = asyncio.ensure_future(_enviar_flujo(flujo, send))
+    desconexion = asyncio.ensure_future(_esperar_desconexion(receive))
+    try:
+        await asyncio.wait({envio, desconexion}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        envio.cancel()
+        desconexion.cancel()
+        await asyncio.gather(envio, desconexion, return_exceptions=True)
+        await flujo.aclose()
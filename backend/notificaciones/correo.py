@@ -0,0 +1,124 @@
+"""
+Email outbox.
+
+Request handlers only INSERT a CorreoSaliente row (`encolar_correo`); the
+`enviar_correos` worker delivers pending rows in batches over a single SMTP
+connection, retrying failures with exponential backoff until they are moved to
+the FALLIDO (dead letter) state.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CorreoSaliente
+
+logger = logging.getLogger(__name__)
+
+
+def encolar_correo(destinatario, asunto, cuerpo_texto, cuerpo_html=''):
+    return CorreoSaliente.objects.create(
+        destinatario=destinatario,
+        asunto=asunto,
+        cuerpo_texto=cuerpo_texto,
+        cuerpo_html=cuerpo_html,
+    )
+
+
+def encolar_correos(correos):
+    """Queue many unsaved CorreoSaliente rows with one INSERT per batch."""
+    return CorreoSaliente.objects.bulk_create(correos, batch_size=500)
+
+
+def _reservar_lote(tamano):
+    """
+    Claim up to `tamano` due messages.
+
+    The claimed rows get `proximo_intento` pushed forward by the lease time, so a
+    second worker (or a crashed one) does not pick them up while they are in
+    flight. On backends with SKIP LOCKED, concurrent workers skip each other's rows.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        lote = list(
+            CorreoSaliente.objects.select_for_update(skip_locked=True)
+            .filter(estado=CorreoSaliente.Estado.PENDIENTE, proximo_intento__lte=ahora)
+            .order_by('proximo_intento')[:tamano]
+        )
+        if lote:
+            CorreoSaliente.objects.filter(pk__in=[c.pk for c in lote]).update(
+                proximo_intento=ahora + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS)
+            )
+    return lote
+
+
+def _mensaje(correo, connection):
+    mensaje = EmailMultiAlternatives(
+        correo.asunto,
+        correo.cuerpo_texto,
+        settings.DEFAULT_FROM_EMAIL,
+        [correo.destinatario],
+        connection=connection,
+    )
+    if correo.cuerpo_html:
+        mensaje.attach_alternative(correo.cuerpo_html, 'text/html')
+    return mensaje
+
+
+def _registrar_fallo(correo, error):
+    correo.intentos += 1
+    correo.ultimo_error = str(error)[:2000]
+    if correo.intentos >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        correo.estado = CorreoSaliente.Estado.FALLIDO
+        logger.error("Correo %s a %s movido a FALLIDO: %s", correo.pk, correo.destinatario, error)
+    else:
+        espera = min(
+            settings.EMAIL_OUTBOX_BACKOFF_SECONDS * 2 ** (correo.intentos - 1),
+            settings.EMAIL_OUTBOX_MAX_BACKOFF_SECONDS,
+        )
+        correo.proximo_intento = timezone.now() + timedelta(seconds=espera)
+        logger.warning("Correo %s a %s falló (intento %s): %s", correo.pk, correo.destinatario, correo.intentos, error)
+    correo.save(update_fields=['intentos', 'ultimo_error', 'estado', 'proximo_intento'])
+
+
+def enviar_pendientes(tamano=None):
+    """
+    Deliver one batch of due messages. Returns `(enviados, fallidos)`.
+
+    All messages in the batch share one connection to the email backend; a
+    failure to open it counts as a failed attempt for the whole batch.
+    """
+    lote = _reservar_lote(tamano or settings.EMAIL_OUTBOX_BATCH_SIZE)
+    if not lote:
+        return 0, 0
+
+    enviados, fallidos = [], 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as exc:
+        for correo in lote:
+            _registrar_fallo(correo, exc)
+        return 0, len(lote)
+
+    try:
+        for correo in lote:
+            try:
+                connection.send_messages([_mensaje(correo, connection)])
+            except Exception as exc:
+                _registrar_fallo(correo, exc)
+                fallidos += 1
+            else:
+                enviados.append(correo.pk)
+    finally:
+        connection.close()
+
+    if enviados:
+        CorreoSaliente.objects.filter(pk__in=enviados).update(
+            estado=CorreoSaliente.Estado.ENVIADO, fecha_envio=timezone.now(), ultimo_error=''
+        )
+    return len(enviados), fallidos
@@ -0,0 +1,281 @@
+"""
+Publish/subscribe for the server-sent events endpoint (`/api/notificaciones/eventos/`).
+
+Request threads publish with `publicar()` after their transaction commits; every
+open SSE connection is a coroutine waiting on a `Suscripcion`, so an ASGI worker
+holds thousands of idle clients on one event loop. Each event is encoded once
+and handed to every subscriber of its loop with a single `call_soon_threadsafe`.
+
+`BusEnMemoria` only reaches the connections of its own process; with several
+workers set EVENTOS_BUS_BACKEND to `notificaciones.eventos.BusRedis`, which
+relays every event through a Redis pub/sub channel to all processes.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from usuarios.authentication import VERSION_CLAIM, version_vigente
+
+CANAL_HORARIOS = 'horarios'
+
+logger = logging.getLogger(__name__)
+
+CABECERAS_SSE = (
+    ('Cache-Control', 'no-cache'),
+    ('X-Accel-Buffering', 'no'),  # do not let nginx buffer the stream
+)
+
+
+def canal_usuario(usuario_id):
+    return f'usuario:{usuario_id}'
+
+
+class Suscripcion:
+    """Pending SSE frames of one connection, filled from any thread, drained on its loop."""
+
+    def __init__(self, canales, maximo_pendientes):
+        self.canales = tuple(canales)
+        self.loop = asyncio.get_running_loop()
+        self.maximo_pendientes = maximo_pendientes
+        self.pendientes = deque()
+        self.aviso = asyncio.Event()
+        # Set when the client falls too far behind: the stream is closed and the
+        # browser reconnects and refetches instead of the server buffering forever.
+        self.desbordada = False
+
+    def _entregar(self, frame):
+        if len(self.pendientes) >= self.maximo_pendientes:
+            self.desbordada = True
+        else:
+            self.pendientes.append(frame)
+        self.aviso.set()
+
+    async def recibir(self, espera):
+        """Wait up to `espera` seconds and return every pending frame (empty on timeout)."""
+        if not self.pendientes and not self.desbordada:
+            try:
+                async with asyncio.timeout(espera):
+                    await self.aviso.wait()
+            except TimeoutError:
+                return []
+        self.aviso.clear()
+        frames = list(self.pendientes)
+        self.pendientes.clear()
+        return frames
+
+
+class BusEnMemoria:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suscripciones = defaultdict(set)
+
+    def suscribir(self, canales):
+        """Must be called from the event loop that will consume the subscription."""
+        suscripcion = Suscripcion(canales, settings.EVENTOS_MAX_PENDIENTES)
+        with self._lock:
+            for canal in suscripcion.canales:
+                self._suscripciones[canal].add(suscripcion)
+        return suscripcion
+
+    def cancelar(self, suscripcion):
+        with self._lock:
+            for canal in suscripcion.canales:
+                suscriptores = self._suscripciones.get(canal)
+                if suscriptores is not None:
+                    suscriptores.discard(suscripcion)
+                    if not suscriptores:
+                        del self._suscripciones[canal]
+
+    def conexiones(self):
+        with self._lock:
+            return len({s for suscriptores in self._suscripciones.values() for s in suscriptores})
+
+    def publicar(self, canal, tipo, datos):
+        self._difundir(canal, codificar(tipo, datos))
+
+    def _difundir(self, canal, frame):
+        with self._lock:
+            suscriptores = list(self._suscripciones.get(canal, ()))
+        _en_sus_loops(suscriptores, _entregar_a_todos, frame)
+
+
+def _en_sus_loops(suscripciones, funcion, *args):
+    """Call `funcion(group, *args)` on each subscription's event loop, one call per loop."""
+    por_loop = defaultdict(list)
+    for suscripcion in suscripciones:
+        por_loop[suscripcion.loop].append(suscripcion)
+    for loop, grupo in por_loop.items():
+        try:
+            loop.call_soon_threadsafe(funcion, grupo, *args)
+        except RuntimeError:
+            # Loop already closed (server shutting down); its streams are gone anyway
+            pass
+
+
+def _entregar_a_todos(suscripciones, frame):
+    for suscripcion in suscripciones:
+        suscripcion._entregar(frame)
+
+
+def _desbordar(suscripciones):
+    for suscripcion in suscripciones:
+        suscripcion.desbordada = True
+        suscripcion.aviso.set()
+
+
+class BusRedis(BusEnMemoria):
+    """
+    Relays events through Redis pub/sub so the connections of every worker process see them.
+
+    Publishing is a PUBLISH; one daemon thread per process listens on all channels
+    and fans the frames out to the local subscriptions exactly like BusEnMemoria.
+    A dropped connection is logged and retried with exponential backoff; once it
+    is back, the open streams are closed as if they had overflowed, since the
+    events published meanwhile are lost, and the browsers reconnect and refetch.
+    """
+    prefijo = 'sistema_citas:eventos:'
+
+    def __init__(self):
+        super().__init__()
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImproperlyConfigured("BusRedis necesita el paquete 'redis' (pip install redis).") from exc
+        self._redis = redis.Redis.from_url(settings.EVENTOS_REDIS_URL)
+        self._escucha = None
+
+    def publicar(self, canal, tipo, datos):
+        self._redis.publish(self.prefijo + canal, codificar(tipo, datos))
+
+    def suscribir(self, canales):
+        with self._lock:
+            if self._escucha is None:
+                self._escucha = threading.Thread(target=self._escuchar, daemon=True)
+                self._escucha.start()
+        return super().suscribir(canales)
+
+    def _escuchar(self):
+        espera = settings.EVENTOS_REDIS_BACKOFF_SECONDS
+        caida = False
+        while True:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            error = None
+            try:
+                pubsub.psubscribe(self.prefijo + '*')
+                if caida:
+                    logger.info("Escucha de eventos en Redis restablecida.")
+                    self._desbordar_todas()
+                    caida = False
+                espera = settings.EVENTOS_REDIS_BACKOFF_SECONDS
+                for mensaje in pubsub.listen():
+                    canal = mensaje['channel'].decode()[len(self.prefijo):]
+                    self._difundir(canal, mensaje['data'])
+            except Exception as exc:
+                # Whatever happened, the thread must survive it: it is the only listener of the process
+                error = exc
+            finally:
+                pubsub.close()
+            logger.warning(
+                "Se perdió la escucha de eventos en Redis (%s); reintento en %s s.",
+                error or "conexión cerrada", espera,
+            )
+            caida = True
+            time.sleep(espera)
+            espera = min(espera * 2, settings.EVENTOS_REDIS_MAX_BACKOFF_SECONDS)
+
+    def _desbordar_todas(self):
+        with self._lock:
+            suscripciones = {s for suscriptores in self._suscripciones.values() for s in suscriptores}
+        _en_sus_loops(suscripciones, _desbordar)
+
+
+def codificar(tipo, datos):
+    """One SSE frame, as bytes: encoded once per event, shared by every connection."""
+    datos = json.dumps(datos, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return f"event: {tipo}\ndata: {datos}\n\n".encode()
+
+
+@lru_cache(maxsize=None)
+def _bus(ruta):
+    return import_string(ruta)()
+
+
+def get_bus():
+    return _bus(settings.EVENTOS_BUS_BACKEND)
+
+
+def publicar(canal, tipo, datos):
+    """Publish once the current transaction commits (immediately outside one)."""
+    transaction.on_commit(lambda: get_bus().publicar(canal, tipo, datos))
+
+
+def publicar_horario(horario):
+    publicar(CANAL_HORARIOS, 'horario', {
+        'id': horario.pk,
+        'especialista': horario.especialista_id,
+        'fecha': horario.fecha,
+        'hora_inicio': horario.hora_inicio,
+        'disponible': horario.disponible,
+    })
+
+
+def publicar_cita(cita):
+    datos = {'id': cita.pk, 'estado': cita.estado, 'horario': cita.horario_id}
+    publicar(canal_usuario(cita.alumno_id), 'cita', datos)
+    publicar(canal_usuario(cita.especialista_id), 'cita', datos)
+
+
+def canales_del_token(crudo):
+    """
+    Channels an access token may listen to, or None if it is invalid or revoked.
+
+    Besides the signature and expiry, the token's version must still be the
+    user's current one, as for every other endpoint (usuarios.authentication);
+    that reads the shared cache, and the database on a miss, so call it through
+    sync_to_async. Returns `(canales, expira)`; the stream must end at `expira`
+    (epoch seconds).
+    """
+    try:
+        token = AccessToken(crudo or '')
+    except TokenError:
+        return None
+    usuario_id = token.get(jwt_settings.USER_ID_CLAIM)
+    if usuario_id is None:
+        return None
+    vigente = version_vigente(usuario_id)
+    # Tokens issued before the version claim only need an account that can still sign in
+    if vigente < 0 or token.get(VERSION_CLAIM, vigente) != vigente:
+        return None
+    return [CANAL_HORARIOS, canal_usuario(usuario_id)], token['exp']
+
+
+async def flujo_eventos(canales, expira):
+    """SSE body: frames published on `canales`, with a heartbeat comment while idle."""
+    bus = get_bus()
+    # Subscribed from inside the stream so a client that never gets here leaves nothing behind
+    suscripcion = bus.suscribir(canales)
+    try:
+        yield b'retry: 3000\n\n'
+        while not suscripcion.desbordada:
+            restante = expira - time.time()
+            if restante <= 0:
+                return
+            frames = await suscripcion.recibir(min(settings.EVENTOS_HEARTBEAT_SECONDS, restante))
+            # A comment line keeps proxies from closing an idle connection
+            yield b''.join(frames) or b': ping\n\n'
+    finally:
+        bus.cancelar(suscripcion)
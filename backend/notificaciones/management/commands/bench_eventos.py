@@ -0,0 +1,106 @@
+import asyncio
+import json
+import resource
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.tokens import AccessToken
+
+from notificaciones.eventos import CANAL_HORARIOS, get_bus
+from sistema_citas.asgi import application
+from sistema_citas.benchmarks import percentiles
+
+
+class Command(BaseCommand):
+    help = (
+        "Server-sent events fan-out: opens N idle SSE connections against the ASGI application "
+        "in-process, publishes events from another thread and measures publish-to-client latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=5000)
+        parser.add_argument('--eventos', type=int, default=20)
+        parser.add_argument('--intervalo', type=float, default=0.1, help="Seconds between events.")
+
+    def handle(self, *args, **options):
+        resultado = asyncio.run(self.medir(options['clientes'], options['eventos'], options['intervalo']))
+        self.stdout.write(json.dumps(resultado, indent=2))
+
+    async def medir(self, n_clientes, n_eventos, intervalo):
+        bus = get_bus()
+        fin = asyncio.Event()
+        conectados = asyncio.Semaphore(0)
+        latencias = []
+        recibidos = [0] * n_eventos
+
+        inicio = time.perf_counter()
+        clientes = [
+            asyncio.create_task(self.cliente(i, fin, conectados, latencias, recibidos))
+            for i in range(n_clientes)
+        ]
+        for _ in range(n_clientes):
+            await conectados.acquire()
+        conexion = time.perf_counter() - inicio
+
+        # Published from a plain thread, like a request thread of the booking API
+        publicador = threading.Thread(target=self.publicar, args=(bus, n_eventos, intervalo))
+        publicador.start()
+        for evento in range(n_eventos):
+            while recibidos[evento] < n_clientes:
+                await asyncio.sleep(0.001)
+        publicador.join()
+        hilos = threading.active_count()
+
+        fin.set()
+        await asyncio.gather(*clientes)
+        return {
+            'clientes': n_clientes,
+            'eventos': n_eventos,
+            'segundos_para_conectar': round(conexion, 3),
+            'hilos_con_conexiones_abiertas': hilos,
+            'rss_max_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'entregas': len(latencias),
+            'latencia_por_entrega': percentiles(latencias),
+            'conexiones_abiertas_al_final': bus.conexiones(),
+        }
+
+    def publicar(self, bus, n_eventos, intervalo):
+        for evento in range(n_eventos):
+            time.sleep(intervalo)
+            bus.publicar(CANAL_HORARIOS, 'horario', {'evento': evento, 't': time.perf_counter()})
+
+    async def cliente(self, usuario_id, fin, conectados, latencias, recibidos):
+        token = AccessToken()
+        token['user_id'] = usuario_id
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': '/api/notificaciones/eventos/',
+            'raw_path': b'/api/notificaciones/eventos/', 'query_string': f'token={token}'.encode(),
+            'headers': [(b'host', b'localhost')], 'client': ('127.0.0.1', 0), 'server': ('localhost', 8000),
+        }
+        pedido = False
+
+        async def receive():
+            nonlocal pedido
+            if not pedido:
+                pedido = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await fin.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(mensaje):
+            if mensaje['type'] != 'http.response.body':
+                return
+            cuerpo = mensaje.get('body', b'')
+            if cuerpo.startswith(b'retry:'):
+                conectados.release()
+            if cuerpo.startswith(b'event:'):
+                # Only the publish timestamp matters; skip full JSON parsing per client
+                ahora = time.perf_counter()
+                for datos in cuerpo.split(b'data: ')[1:]:
+                    evento, t = datos[:datos.index(b'}')].split(b',')
+                    latencias.append(ahora - float(t[4:]))
+                    recibidos[int(evento[10:])] += 1
+
+        await application(scope, receive, send)
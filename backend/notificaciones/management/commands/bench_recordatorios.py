@@ -0,0 +1,80 @@
+import json
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from agenda.models import HorarioDisponible
+from citas.benchmarks import sembrar_usuarios
+from citas.models import Cita
+from notificaciones.models import CorreoSaliente, Notificacion
+from notificaciones.recordatorios import citas_por_recordar, programar_recordatorios
+from sistema_citas.benchmarks import base_de_datos_temporal
+from usuarios.models import Usuario
+
+POR_ESPECIALISTA = 48  # 30-minute slots around the clock
+
+
+class Command(BaseCommand):
+    help = (
+        "Reminder scheduler on a throwaway database holding N CONFIRMADA appointments spread over "
+        "the next 24 hours: the first tick (every 24-hour reminder due at once), a steady-state tick "
+        "a minute later, and the tick an hour later that sends the next hour's 1-hour reminders."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--citas', type=int, default=50000)
+        parser.add_argument('--lote', type=int, default=None)
+
+    def handle(self, *args, **options):
+        with base_de_datos_temporal():
+            resultado = self.medir(options['citas'], options['lote'])
+        self.stdout.write(json.dumps(resultado, indent=2))
+
+    def sembrar(self, n, ahora):
+        especialistas = sembrar_usuarios(-(-n // POR_ESPECIALISTA), rol=Usuario.Roles.ESPECIALISTA, prefijo='especialista')
+        alumnos = sembrar_usuarios(n)
+        inicio = timezone.localtime(ahora).replace(tzinfo=None, minute=0, second=0, microsecond=0) + timedelta(minutes=30)
+        horarios = []
+        for i in range(n):
+            comienzo = inicio + timedelta(minutes=30 * (i % POR_ESPECIALISTA))
+            horarios.append(HorarioDisponible(
+                especialista=especialistas[i // POR_ESPECIALISTA], fecha=comienzo.date(),
+                hora_inicio=comienzo.time(), hora_fin=(comienzo + timedelta(minutes=25)).time(), disponible=False,
+            ))
+        HorarioDisponible.objects.bulk_create(horarios, batch_size=1000)
+        Cita.objects.bulk_create([
+            Cita(alumno_id=alumno.pk, especialista_id=horario.especialista_id, horario_id=horario.pk,
+                 motivo='Benchmark', estado=Cita.Estado.CONFIRMADA)
+            for alumno, horario in zip(alumnos, HorarioDisponible.objects.order_by('id').only('id', 'especialista_id'))
+        ], batch_size=1000)
+
+    def tick(self, ahora, lote):
+        consultas = 0
+
+        def contar(execute, sql, params, many, context):
+            nonlocal consultas
+            if not sql.lstrip().upper().startswith(('BEGIN', 'COMMIT', 'SAVEPOINT', 'RELEASE')):
+                consultas += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(contar):
+            inicio = time.perf_counter()
+            enviados = programar_recordatorios(ahora, lote)
+            segundos = time.perf_counter() - inicio
+        return {'segundos': round(segundos, 3), 'consultas': consultas, 'enviados': enviados}
+
+    def medir(self, n, lote):
+        ahora = timezone.make_aware(datetime.combine(timezone.localdate(), datetime.min.time()) + timedelta(hours=7))
+        inicio = time.perf_counter()
+        self.sembrar(n, ahora)
+        resultado = {'citas': n, 'segundos_sembrando': round(time.perf_counter() - inicio, 1)}
+        resultado['primer_tick'] = self.tick(ahora, lote)
+        resultado['tick_estable'] = self.tick(ahora + timedelta(minutes=1), lote)
+        resultado['tick_una_hora_despues'] = self.tick(ahora + timedelta(hours=1), lote)
+        resultado['notificaciones'] = Notificacion.objects.count()
+        resultado['correos_en_cola'] = CorreoSaliente.objects.count()
+        resultado['plan'] = citas_por_recordar(ahora).explain()
+        return resultado
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notificaciones.correo import enviar_pendientes
+
+
+class Command(BaseCommand):
+    help = "Delivers queued emails (CorreoSaliente) in batches over one SMTP connection per batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=None, help="Messages per batch (EMAIL_OUTBOX_BATCH_SIZE).")
+        parser.add_argument('--loop', action='store_true', help="Keep polling the outbox instead of exiting when it is empty.")
+        parser.add_argument('--intervalo', type=float, default=5.0, help="Seconds to sleep when there is nothing to send.")
+
+    def handle(self, *args, **options):
+        total_enviados = total_fallidos = 0
+        try:
+            while True:
+                enviados, fallidos = enviar_pendientes(options['lote'])
+                total_enviados += enviados
+                total_fallidos += fallidos
+                if enviados or fallidos:
+                    self.stdout.write(f"{enviados} enviados, {fallidos} fallidos")
+                    continue
+                if not options['loop']:
+                    break
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Total: {total_enviados} enviados, {total_fallidos} fallidos"))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notificaciones.recordatorios import programar_recordatorios
+
+
+class Command(BaseCommand):
+    help = (
+        "Queues the 24-hour and 1-hour appointment reminders that are due (in-app notification "
+        "plus email), one scan of the upcoming appointments per tick."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=None, help="Reminders per batch (REMINDER_BATCH_SIZE).")
+        parser.add_argument('--loop', action='store_true', help="Keep running one tick per interval instead of exiting.")
+        parser.add_argument('--intervalo', type=float, default=60.0, help="Seconds between ticks.")
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                inicio = time.monotonic()
+                enviados = programar_recordatorios(lote=options['lote'])
+                duracion = time.monotonic() - inicio
+                if any(enviados.values()) or not options['loop']:
+                    resumen = ', '.join(f"{cantidad} {tipo}" for tipo, cantidad in enviados.items())
+                    self.stdout.write(f"{resumen} ({duracion:.2f} s)")
+                if not options['loop']:
+                    break
+                time.sleep(max(options['intervalo'] - duracion, 0))
+        except KeyboardInterrupt:
+            pass
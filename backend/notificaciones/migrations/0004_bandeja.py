@@ -0,0 +1,25 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0004_reserva_concurrente'),
+        ('notificaciones', '0003_correosaliente'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacion',
+            name='tipo',
+            field=models.CharField(blank=True, choices=[('CITA_SOLICITADA', 'Cita solicitada'), ('CITA_CONFIRMADA', 'Cita confirmada'), ('CITA_RECHAZADA', 'Cita rechazada'), ('CITA_COMPLETADA', 'Cita completada')], max_length=30),
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['usuario', 'leida', '-fecha_creacion', '-id'], name='notificacion_bandeja_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0005_updated_at'),
+        ('notificaciones', '0004_bandeja'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificacion',
+            name='tipo',
+            field=models.CharField(blank=True, choices=[('CITA_SOLICITADA', 'Cita solicitada'), ('CITA_CONFIRMADA', 'Cita confirmada'), ('CITA_RECHAZADA', 'Cita rechazada'), ('CITA_COMPLETADA', 'Cita completada'), ('RECORDATORIO_24H', 'Recordatorio 24 horas antes'), ('RECORDATORIO_1H', 'Recordatorio 1 hora antes')], max_length=30),
+        ),
+        migrations.AddConstraint(
+            model_name='notificacion',
+            constraint=models.UniqueConstraint(condition=models.Q(('tipo__in', ['RECORDATORIO_24H', 'RECORDATORIO_1H'])), fields=('cita', 'tipo'), name='recordatorio_unico_por_cita'),
+        ),
+    ]
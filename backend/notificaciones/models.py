@@ -1,8 +1,18 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 class Notificacion(models.Model):
+    class Tipo(models.TextChoices):
+        CITA_SOLICITADA = 'CITA_SOLICITADA', 'Cita solicitada'
+        CITA_CONFIRMADA = 'CITA_CONFIRMADA', 'Cita confirmada'
+        CITA_RECHAZADA = 'CITA_RECHAZADA', 'Cita rechazada'
+        CITA_COMPLETADA = 'CITA_COMPLETADA', 'Cita completada'
+        RECORDATORIO_24H = 'RECORDATORIO_24H', 'Recordatorio 24 horas antes'
+        RECORDATORIO_1H = 'RECORDATORIO_1H', 'Recordatorio 1 hora antes'
+
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notificaciones')
+    tipo = models.CharField(max_length=30, choices=Tipo.choices, blank=True)
     titulo = models.CharField(max_length=200)
     mensaje = models.TextField()
     leida = models.BooleanField(default=False)
@@ -11,5 +21,51 @@ class Notificacion(models.Model):
     # Opcional: Relacionar con una cita específica
     cita = models.ForeignKey('citas.Cita', on_delete=models.SET_NULL, null=True, blank=True)
 
+    class Meta:
+        constraints = [
+            # Idempotency key of the reminder scheduler (notificaciones.recordatorios)
+            models.UniqueConstraint(
+                fields=['cita', 'tipo'],
+                condition=models.Q(tipo__in=['RECORDATORIO_24H', 'RECORDATORIO_1H']),
+                name='recordatorio_unico_por_cita',
+            ),
+        ]
+        indexes = [
+            # Inbox order (unread first, newest first) and the unread count are
+            # both answered from this index without touching the table rows.
+            models.Index(fields=['usuario', 'leida', '-fecha_creacion', '-id'], name='notificacion_bandeja_idx'),
+        ]
+
     def __str__(self):
         return f"{self.usuario} - {self.titulo}"
+
+
+class CorreoSaliente(models.Model):
+    """Outbound email queued by the request thread and delivered by `manage.py enviar_correos`."""
+    class Estado(models.TextChoices):
+        PENDIENTE = 'PENDIENTE', 'Pendiente'
+        ENVIADO = 'ENVIADO', 'Enviado'
+        FALLIDO = 'FALLIDO', 'Fallido'  # dead letter: retries exhausted
+
+    destinatario = models.EmailField()
+    asunto = models.CharField(max_length=255)
+    cuerpo_texto = models.TextField()
+    cuerpo_html = models.TextField(blank=True)
+    estado = models.CharField(max_length=10, choices=Estado.choices, default=Estado.PENDIENTE)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_envio = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['proximo_intento'],
+                condition=models.Q(estado='PENDIENTE'),
+                name='correo_pendiente_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.destinatario} - {self.asunto} ({self.estado})"
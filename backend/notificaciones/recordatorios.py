@@ -0,0 +1,108 @@
+"""
+Appointment reminders, 24 hours and 1 hour before every CONFIRMADA appointment.
+
+`manage.py enviar_recordatorios --loop` calls `programar_recordatorios` once per
+tick. Each tick is a single SELECT. It range-scans horario_fecha_hora_idx over the
+next 24 hours and keeps only the appointments whose due reminder has no
+Notificacion yet. The due reminder is the 1-hour one inside the last hour,
+otherwise the 24-hour one. The rows found are written in batches: one bulk INSERT
+of Notificacion rows plus one of CorreoSaliente rows per batch, in one transaction.
+
+The Notificacion row is the idempotency key. Its (cita, tipo) is unique for
+reminders (recordatorio_unico_por_cita), so a restart, a late tick or a second
+worker never sends a reminder twice. An appointment confirmed less than an hour
+before it starts only gets the 1-hour reminder.
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from citas.models import Cita
+from usuarios.emails import appointment_reminder_email
+
+from .correo import encolar_correos
+from .models import Notificacion
+from .servicio import notificacion_de_cita, notificar
+
+logger = logging.getLogger(__name__)
+
+Tipo = Notificacion.Tipo
+
+# Nearest first: an appointment is due for the first one whose lead time it is within
+RECORDATORIOS = (
+    (Tipo.RECORDATORIO_1H, timedelta(hours=1)),
+    (Tipo.RECORDATORIO_24H, timedelta(hours=24)),
+)
+
+
+def _inicio_entre(desde, hasta):
+    """Slot start in (desde, hasta], for naive local datetimes, as a range on (fecha, hora_inicio)."""
+    return (
+        Q(horario__fecha__gte=desde.date(), horario__fecha__lte=hasta.date())
+        & (Q(horario__fecha__gt=desde.date()) | Q(horario__hora_inicio__gt=desde.time()))
+        & (Q(horario__fecha__lt=hasta.date()) | Q(horario__hora_inicio__lte=hasta.time()))
+    )
+
+
+def citas_por_recordar(ahora):
+    """CONFIRMADA appointments starting in the next 24 hours whose due reminder was not sent."""
+    ahora = timezone.localtime(ahora).replace(tzinfo=None)
+    pendientes = Q()
+    desde = ahora
+    for tipo, antelacion in RECORDATORIOS:
+        hasta = ahora + antelacion
+        enviado = Exists(Notificacion.objects.filter(cita=OuterRef('pk'), tipo=tipo))
+        pendientes |= _inicio_entre(desde, hasta) & ~enviado
+        desde = hasta
+    return (
+        Cita.objects.filter(estado=Cita.Estado.CONFIRMADA)
+        .filter(_inicio_entre(ahora, desde), pendientes)
+        .select_related('horario', 'especialista', 'alumno')
+        .only(
+            'id', 'alumno_id', 'especialista_id', 'horario_id',
+            'horario__fecha', 'horario__hora_inicio',
+            'especialista__first_name', 'especialista__last_name',
+            'alumno__first_name', 'alumno__email',
+        )
+        .order_by('horario__fecha', 'horario__hora_inicio', 'id')
+    )
+
+
+def recordatorio_de(cita, ahora):
+    """`(tipo, cuando)` of the reminder due for `cita`; `ahora` is a naive local datetime."""
+    faltan = datetime.combine(cita.horario.fecha, cita.horario.hora_inicio) - ahora
+    tipo = next(tipo for tipo, antelacion in RECORDATORIOS if faltan <= antelacion)
+    if tipo == Tipo.RECORDATORIO_1H:
+        return tipo, 'en menos de una hora'
+    return tipo, 'hoy' if cita.horario.fecha == ahora.date() else 'mañana'
+
+
+def programar_recordatorios(ahora=None, lote=None):
+    """Queue every due reminder; returns `{tipo: reminders queued}`."""
+    ahora = ahora or timezone.now()
+    lote = lote or settings.REMINDER_BATCH_SIZE
+    citas = list(citas_por_recordar(ahora))
+    local = timezone.localtime(ahora).replace(tzinfo=None)
+    enviados = dict.fromkeys((tipo for tipo, _ in RECORDATORIOS), 0)
+    for inicio in range(0, len(citas), lote):
+        notificaciones, correos = [], []
+        for cita in citas[inicio:inicio + lote]:
+            tipo, cuando = recordatorio_de(cita, local)
+            notificaciones.append(notificacion_de_cita(cita, tipo, cuando=cuando))
+            correos.append(appointment_reminder_email(cita, cuando))
+        try:
+            with transaction.atomic():
+                notificar(notificaciones)
+                encolar_correos(correos)
+        except IntegrityError:
+            # Another worker sent part of this batch; the next tick picks up the rest
+            logger.warning("Lote de recordatorios omitido: ya enviado por otro proceso")
+            continue
+        for notificacion in notificaciones:
+            enviados[notificacion.tipo] += 1
+    return enviados
@@ -0,0 +1,8 @@
+from rest_framework import serializers
+from .models import Notificacion
+
+class NotificacionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Notificacion
+        fields = ('id', 'tipo', 'titulo', 'mensaje', 'leida', 'fecha_creacion', 'cita')
+        read_only_fields = fields
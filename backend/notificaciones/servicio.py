@@ -0,0 +1,91 @@
+"""
+In-app notifications for appointment events.
+
+Callers describe what happened (`notificar_citas(citas, tipo)`); this module
+decides who is told and what they read, and inserts every row of the event with
+one bulk INSERT. Both participants get a push event with the new state, and
+confirmations and rejections also queue the matching email.
+"""
+
+from usuarios.emails import send_appointment_confirmed_email, send_appointment_rejected_email
+
+from .eventos import publicar_cita
+from .models import Notificacion
+
+Tipo = Notificacion.Tipo
+
+# tipo -> (recipient field on Cita, title, message formatted with `cita`).
+# Messages only reach through the relations they print, so no unused join is needed.
+MENSAJES = {
+    Tipo.CITA_SOLICITADA: (
+        'especialista', 'Nueva solicitud de cita',
+        '{cita.alumno.first_name} {cita.alumno.last_name} solicitó una cita para el '
+        '{cita.horario.fecha:%d/%m/%Y} a las {cita.horario.hora_inicio:%H:%M}.',
+    ),
+    Tipo.CITA_CONFIRMADA: (
+        'alumno', 'Cita confirmada',
+        'Tu cita con {cita.especialista.first_name} {cita.especialista.last_name} del '
+        '{cita.horario.fecha:%d/%m/%Y} a las {cita.horario.hora_inicio:%H:%M} fue confirmada.',
+    ),
+    Tipo.CITA_RECHAZADA: (
+        'alumno', 'Cita rechazada',
+        'Tu solicitud de cita con {cita.especialista.first_name} {cita.especialista.last_name} del '
+        '{cita.horario.fecha:%d/%m/%Y} a las {cita.horario.hora_inicio:%H:%M} fue rechazada.',
+    ),
+    Tipo.CITA_COMPLETADA: (
+        'alumno', 'Cita completada',
+        'Tu cita con {cita.especialista.first_name} {cita.especialista.last_name} del '
+        '{cita.horario.fecha:%d/%m/%Y} fue marcada como completada.',
+    ),
+    # `cuando` comes from notificaciones.recordatorios ("mañana", "en una hora", ...)
+    Tipo.RECORDATORIO_24H: (
+        'alumno', 'Recordatorio de cita',
+        'Tienes una cita {cuando} con {cita.especialista.first_name} {cita.especialista.last_name}, '
+        'el {cita.horario.fecha:%d/%m/%Y} a las {cita.horario.hora_inicio:%H:%M}.',
+    ),
+    Tipo.RECORDATORIO_1H: (
+        'alumno', 'Tu cita es en una hora',
+        'Tienes una cita {cuando} con {cita.especialista.first_name} {cita.especialista.last_name}, '
+        'a las {cita.horario.hora_inicio:%H:%M}.',
+    ),
+}
+
+CORREOS = {
+    Tipo.CITA_CONFIRMADA: send_appointment_confirmed_email,
+    Tipo.CITA_RECHAZADA: send_appointment_rejected_email,
+}
+
+
+def notificacion_de_cita(cita, tipo, **contexto):
+    """Unsaved Notificacion telling the right participant of `cita` about `tipo`."""
+    destinatario, titulo, mensaje = MENSAJES[tipo]
+    return Notificacion(
+        usuario_id=getattr(cita, f'{destinatario}_id'),
+        cita=cita,
+        tipo=tipo,
+        titulo=titulo,
+        mensaje=mensaje.format(cita=cita, **contexto),
+    )
+
+
+def notificar(notificaciones):
+    """Insert many unsaved Notificacion rows with one INSERT per batch."""
+    return Notificacion.objects.bulk_create(notificaciones, batch_size=500)
+
+
+def notificar_citas(citas, tipo):
+    """
+    Notify every appointment in `citas` about `tipo`.
+
+    `citas` should come from `Cita.objects.con_detalles()` (or have alumno,
+    especialista and horario loaded) so building the messages runs no queries.
+    """
+    citas = list(citas)
+    creadas = notificar([notificacion_de_cita(cita, tipo) for cita in citas])
+    for cita in citas:
+        publicar_cita(cita)
+    enviar_correo = CORREOS.get(tipo)
+    if enviar_correo:
+        for cita in citas:
+            enviar_correo(cita)
+    return creadas
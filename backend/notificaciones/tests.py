@@ -1,3 +1,370 @@
-from django.test import TestCase
+import asyncio
+import threading
+from datetime import date, datetime, time, timedelta
+from smtplib import SMTPException
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from agenda.models import HorarioDisponible
+from citas.benchmarks import proximo_dia_habil
+from citas.models import Cita
+from usuarios.authentication import PREFIJO_VERSION, VERSION_CLAIM
+from usuarios.models import Usuario
+from .asgi import RUTA_EVENTOS, eventos_app
+from .correo import encolar_correo, enviar_pendientes
+from .eventos import BusEnMemoria, BusRedis, canal_usuario, get_bus
+from .models import CorreoSaliente, Notificacion
+from .recordatorios import programar_recordatorios
+
+
+class BackendQueFalla(EmailBackend):
+    def send_messages(self, messages):
+        raise SMTPException("550 buzón no disponible")
+
+
+class BackendSinConexion(EmailBackend):
+    def open(self):
+        raise ConnectionRefusedError("smtp caído")
+
+
+class BusDePrueba(BusEnMemoria):
+    def __init__(self):
+        super().__init__()
+        self.publicados = []
+
+    def publicar(self, canal, tipo, datos):
+        self.publicados.append((canal, tipo, datos))
+
+
+class CorreoSalienteTests(TestCase):
+    def test_registro_solo_encola_el_correo(self):
+        response = APIClient().post('/api/auth/register/', {
+            'email': 'nuevo@tecnl.mx', 'password': 'Clave-segura-123',
+            'first_name': 'Nuevo', 'last_name': 'Alumno',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(mail.outbox), 0)
+        correo = CorreoSaliente.objects.get()
+        self.assertEqual(correo.destinatario, 'nuevo@tecnl.mx')
+        self.assertIn('/verify-email/', correo.cuerpo_texto)
+
+        self.assertEqual(enviar_pendientes(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+        correo.refresh_from_db()
+        self.assertEqual(correo.estado, CorreoSaliente.Estado.ENVIADO)
+        self.assertIsNotNone(correo.fecha_envio)
+
+    def test_envio_por_lotes(self):
+        for i in range(5):
+            encolar_correo(f'a{i}@tecnl.mx', 'Asunto', 'Texto')
+        self.assertEqual(enviar_pendientes(tamano=3), (3, 0))
+        self.assertEqual(enviar_pendientes(tamano=3), (2, 0))
+        self.assertEqual(enviar_pendientes(tamano=3), (0, 0))
+        self.assertEqual(len(mail.outbox), 5)
+
+    @override_settings(
+        EMAIL_BACKEND='notificaciones.tests.BackendQueFalla',
+        EMAIL_OUTBOX_MAX_ATTEMPTS=3,
+        EMAIL_OUTBOX_BACKOFF_SECONDS=10,
+    )
+    def test_reintento_con_espera_y_cola_de_fallidos(self):
+        correo = encolar_correo('a@tecnl.mx', 'Asunto', 'Texto')
+        esperas = []
+        for _ in range(3):
+            antes = timezone.now()
+            with self.assertLogs('notificaciones.correo', 'WARNING'):
+                self.assertEqual(enviar_pendientes(), (0, 1))
+            correo.refresh_from_db()
+            esperas.append((correo.proximo_intento - antes).total_seconds())
+            # Not due yet: the next run must skip it
+            self.assertEqual(enviar_pendientes(), (0, 0))
+            CorreoSaliente.objects.filter(pk=correo.pk).update(proximo_intento=timezone.now() - timedelta(seconds=1))
+
+        correo.refresh_from_db()
+        self.assertEqual(correo.estado, CorreoSaliente.Estado.FALLIDO)
+        self.assertEqual(correo.intentos, 3)
+        self.assertIn('550', correo.ultimo_error)
+        # Exponential backoff: 10s, 20s
+        self.assertAlmostEqual(esperas[0], 10, delta=1)
+        self.assertAlmostEqual(esperas[1], 20, delta=1)
+
+    @override_settings(EMAIL_BACKEND='notificaciones.tests.BackendSinConexion')
+    def test_fallo_de_conexion_reprograma_todo_el_lote(self):
+        for i in range(3):
+            encolar_correo(f'a{i}@tecnl.mx', 'Asunto', 'Texto')
+        with self.assertLogs('notificaciones.correo', 'WARNING'):
+            self.assertEqual(enviar_pendientes(), (0, 3))
+        self.assertFalse(CorreoSaliente.objects.filter(intentos=0).exists())
+
+
+class NotificacionTestData(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.especialista = Usuario.objects.create_user(
+            username='esp', email='esp@tecnl.mx', password='x',
+            first_name='Ana', last_name='Ruiz', rol=Usuario.Roles.ESPECIALISTA,
+        )
+        cls.alumno = Usuario.objects.create_user(
+            username='alumno', email='alumno@tecnl.mx', password='x', first_name='Luis', last_name='Paz',
+        )
+        cls.horario = HorarioDisponible.objects.create(
+            especialista=cls.especialista, fecha=proximo_dia_habil(), hora_inicio=time(9), hora_fin=time(10),
+        )
+
+    def _client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+
+class NotificacionTests(NotificacionTestData):
+    def test_ciclo_de_la_cita_notifica_a_cada_participante(self):
+        response = self._client(self.alumno).post(
+            '/api/citas/citas/', {'horario_id': self.horario.pk, 'motivo': 'Motivo'}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        aviso = Notificacion.objects.get(usuario=self.especialista)
+        self.assertEqual(aviso.tipo, Notificacion.Tipo.CITA_SOLICITADA)
+        self.assertIn('Luis Paz', aviso.mensaje)
+
+        cita_id = response.data['id']
+        especialista = self._client(self.especialista)
+        especialista.post(f'/api/citas/citas/{cita_id}/confirmar/')
+        especialista.post(f'/api/citas/citas/{cita_id}/completar/')
+        self.assertEqual(
+            list(Notificacion.objects.filter(usuario=self.alumno).order_by('id').values_list('tipo', flat=True)),
+            [Notificacion.Tipo.CITA_CONFIRMADA, Notificacion.Tipo.CITA_COMPLETADA],
+        )
+        self.assertTrue(CorreoSaliente.objects.filter(destinatario='alumno@tecnl.mx', asunto__contains='confirmada').exists())
+
+    def test_bandeja_no_leidas_primero(self):
+        cita = Cita.objects.create(alumno=self.alumno, especialista=self.especialista, horario=self.horario, motivo='M')
+        Notificacion.objects.bulk_create([
+            Notificacion(usuario=self.alumno, cita=cita, titulo=f'N{i}', mensaje='m', leida=i % 2 == 0)
+            for i in range(6)
+        ])
+        client = self._client(self.alumno)
+        with self.assertNumQueries(1):
+            response = client.get('/api/notificaciones/notificaciones/', {'page_size': 4})
+        titulos = [n['titulo'] for n in response.data['results']]
+        self.assertEqual(titulos, ['N5', 'N3', 'N1', 'N4'])
+        siguiente = client.get(response.data['next'])
+        self.assertEqual([n['titulo'] for n in siguiente.data['results']], ['N2', 'N0'])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(client.get('/api/notificaciones/notificaciones/no-leidas/').data, {'no_leidas': 3})
+        with self.assertNumQueries(1):
+            self.assertEqual(client.post('/api/notificaciones/notificaciones/leer-todas/').data, {'actualizadas': 3})
+        self.assertEqual(client.get('/api/notificaciones/notificaciones/no-leidas/').data, {'no_leidas': 0})
+
+    def test_solo_sus_notificaciones(self):
+        otra = Notificacion.objects.create(usuario=self.especialista, titulo='T', mensaje='m')
+        client = self._client(self.alumno)
+        self.assertEqual(client.post(f'/api/notificaciones/notificaciones/{otra.pk}/leer/').status_code, 404)
+        self.assertEqual(client.get('/api/notificaciones/notificaciones/').data['results'], [])
+
+
+class FinDeLaPrueba(BaseException):
+    """Ends BusRedis._escuchar, which otherwise loops for the life of the process."""
+
+
+class PubSubFalso:
+    def __init__(self, mensajes):
+        self.mensajes = mensajes
+
+    def psubscribe(self, patron):
+        pass
+
+    def listen(self):
+        for mensaje in self.mensajes:
+            if isinstance(mensaje, BaseException):
+                raise mensaje
+            yield mensaje
+
+    def close(self):
+        pass
+
+
+class RedisFalso:
+    def __init__(self, *conexiones):
+        self.conexiones = list(conexiones)
+
+    def pubsub(self, ignore_subscribe_messages):
+        return PubSubFalso(self.conexiones.pop(0))
+
+
+@override_settings(EVENTOS_REDIS_BACKOFF_SECONDS=0)
+class BusRedisTests(SimpleTestCase):
+    async def test_reconecta_y_cierra_los_flujos_que_perdieron_eventos(self):
+        # Built without __init__: the redis package is optional
+        bus = BusRedis.__new__(BusRedis)
+        BusEnMemoria.__init__(bus)
+        mensaje = {'channel': (BusRedis.prefijo + canal_usuario(7)).encode(), 'data': b'event: cita\n\n'}
+        bus._redis = RedisFalso(
+            [ConnectionError("Connection reset by peer")],
+            [mensaje, FinDeLaPrueba()],
+        )
+        # The test runs the listener itself instead of suscribir() starting its thread
+        bus._escucha = threading.current_thread()
+        suscripcion = bus.suscribir([canal_usuario(7)])
+        with self.assertLogs('notificaciones.eventos', 'INFO') as logs, self.assertRaises(FinDeLaPrueba):
+            await asyncio.to_thread(bus._escuchar)
+        await asyncio.sleep(0)
+        self.assertIn('Connection reset by peer', logs.output[0])
+        self.assertIn('restablecida', logs.output[1])
+        self.assertTrue(suscripcion.desbordada)
+        self.assertEqual(await suscripcion.recibir(0), [b'event: cita\n\n'])
+
+
+class EventosTests(SimpleTestCase):
+    def _abrir(self, query_string):
+        """Run one SSE request against the ASGI app; returns (task, sent messages, disconnect event)."""
+        enviados = asyncio.Queue()
+        desconectar = asyncio.Event()
+        pedido = False
+
+        async def receive():
+            nonlocal pedido
+            if not pedido:
+                pedido = True
+                return {'type': 'http.request', 'body': b''}
+            await desconectar.wait()
+            return {'type': 'http.disconnect'}
+
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': RUTA_EVENTOS,
+            'query_string': query_string.encode(), 'headers': [(b'origin', b'http://localhost:3000')],
+        }
+        tarea = asyncio.create_task(eventos_app(scope, receive, enviados.put))
+        return tarea, enviados, desconectar
+
+    def setUp(self):
+        cache.clear()
+        # Current token_version of user 7, so the check does not reach the database
+        cache.set(PREFIJO_VERSION + '7', 2)
+
+    def _token(self, version=2):
+        token = AccessToken()
+        token['user_id'] = 7
+        token[VERSION_CLAIM] = version
+        return token
+
+    async def test_recibe_sus_eventos_publicados_desde_otro_hilo(self):
+        token = self._token()
+        tarea, enviados, desconectar = self._abrir(f'token={token}')
+        inicio = await enviados.get()
+        self.assertEqual(inicio['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), inicio['headers'])
+        self.assertIn((b'access-control-allow-origin', b'http://localhost:3000'), inicio['headers'])
+        self.assertEqual((await enviados.get())['body'], b'retry: 3000\n\n')
+
+        for canal in (canal_usuario(8), canal_usuario(7)):
+            hilo = threading.Thread(target=get_bus().publicar, args=(canal, 'cita', {'id': 1, 'estado': 'CONFIRMADA'}))
+            hilo.start()
+            hilo.join()
+        mensaje = await asyncio.wait_for(enviados.get(), 1)
+        self.assertEqual(mensaje['body'], b'event: cita\ndata: {"id":1,"estado":"CONFIRMADA"}\n\n')
+        self.assertTrue(enviados.empty())
+
+        desconectar.set()
+        await tarea
+        self.assertEqual(get_bus().conexiones(), 0)
+
+    async def test_token_invalido(self):
+        tarea, enviados, _ = self._abrir('token=basura')
+        await tarea
+        self.assertEqual((await enviados.get())['status'], 401)
+
+    async def test_token_revocado(self):
+        tarea, enviados, _ = self._abrir(f'token={self._token(version=1)}')
+        await tarea
+        self.assertEqual((await enviados.get())['status'], 401)
+
+
+@override_settings(EVENTOS_BUS_BACKEND='notificaciones.tests.BusDePrueba')
+class PublicacionTests(NotificacionTestData):
+    def setUp(self):
+        get_bus().publicados.clear()
+
+    def test_reserva_y_rechazo_publican_horario_y_cita(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._client(self.alumno).post(
+                '/api/citas/citas/', {'horario_id': self.horario.pk, 'motivo': 'Motivo'}, format='json'
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            self._client(self.especialista).post(f'/api/citas/citas/{response.data["id"]}/rechazar/')
+
+        publicados = [(canal, tipo, datos.get('disponible', datos.get('estado'))) for canal, tipo, datos in get_bus().publicados]
+        self.assertEqual(publicados, [
+            ('horarios', 'horario', False),
+            (canal_usuario(self.alumno.pk), 'cita', 'PENDIENTE'),
+            (canal_usuario(self.especialista.pk), 'cita', 'PENDIENTE'),
+            ('horarios', 'horario', True),
+            (canal_usuario(self.alumno.pk), 'cita', 'RECHAZADA'),
+            (canal_usuario(self.especialista.pk), 'cita', 'RECHAZADA'),
+        ])
+
+
+class RecordatorioTests(TestCase):
+    AHORA = timezone.make_aware(datetime(2030, 3, 4, 8, 0))  # Monday
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.especialista = Usuario.objects.create_user(
+            username='esp', email='esp@tecnl.mx', password='x',
+            first_name='Ana', last_name='Ruiz', rol=Usuario.Roles.ESPECIALISTA,
+        )
+        cls.citas = {}
+        for nombre, fecha, inicio, estado in (
+            ('manana', date(2030, 3, 5), time(7, 30), Cita.Estado.CONFIRMADA),
+            ('pronto', date(2030, 3, 4), time(8, 40), Cita.Estado.CONFIRMADA),
+            ('lejos', date(2030, 3, 5), time(9, 0), Cita.Estado.CONFIRMADA),
+            ('pasada', date(2030, 3, 4), time(7, 30), Cita.Estado.CONFIRMADA),
+            ('pendiente', date(2030, 3, 4), time(12, 0), Cita.Estado.PENDIENTE),
+        ):
+            alumno = Usuario.objects.create_user(
+                username=nombre, email=f'{nombre}@tecnl.mx', password='x', first_name=nombre.capitalize(),
+            )
+            horario = HorarioDisponible.objects.create(
+                especialista=cls.especialista, fecha=fecha, hora_inicio=inicio,
+                hora_fin=(datetime.combine(fecha, inicio) + timedelta(minutes=20)).time(), disponible=False,
+            )
+            cls.citas[nombre] = Cita.objects.create(
+                alumno=alumno, especialista=cls.especialista, horario=horario, motivo='M', estado=estado,
+            )
+
+    def _recordatorios(self):
+        return set(Notificacion.objects.values_list('cita__alumno__username', 'tipo'))
+
+    def test_envia_el_recordatorio_que_corresponde(self):
+        enviados = programar_recordatorios(self.AHORA, lote=1)
+        self.assertEqual(enviados, {Notificacion.Tipo.RECORDATORIO_1H: 1, Notificacion.Tipo.RECORDATORIO_24H: 1})
+        self.assertEqual(self._recordatorios(), {
+            ('manana', Notificacion.Tipo.RECORDATORIO_24H), ('pronto', Notificacion.Tipo.RECORDATORIO_1H),
+        })
+        correo = CorreoSaliente.objects.get(destinatario='manana@tecnl.mx')
+        self.assertIn('tienes una cita mañana', correo.cuerpo_texto)
+        self.assertIn('Ana Ruiz', Notificacion.objects.get(cita=self.citas['manana']).mensaje)
+
+    def test_reiniciar_no_duplica(self):
+        programar_recordatorios(self.AHORA)
+        with self.assertNumQueries(1):
+            enviados = programar_recordatorios(self.AHORA + timedelta(minutes=1))
+        self.assertEqual(sum(enviados.values()), 0)
+        self.assertEqual(CorreoSaliente.objects.count(), 2)
+
+    def test_el_recordatorio_de_una_hora_llega_despues(self):
+        programar_recordatorios(self.AHORA)
+        enviados = programar_recordatorios(self.AHORA + timedelta(hours=22, minutes=45))
+        self.assertEqual(enviados[Notificacion.Tipo.RECORDATORIO_1H], 1)
+        self.assertEqual(enviados[Notificacion.Tipo.RECORDATORIO_24H], 1)  # 'lejos' enters its window
+        self.assertEqual(
+            Notificacion.objects.filter(cita=self.citas['manana']).count(), 2,
+        )
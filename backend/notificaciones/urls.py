@@ -0,0 +1,11 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import NotificacionViewSet, eventos
+
+router = DefaultRouter()
+router.register(r'notificaciones', NotificacionViewSet, basename='notificacion')
+
+urlpatterns = [
+    path('eventos/', eventos, name='eventos'),
+    path('', include(router.urls)),
+]
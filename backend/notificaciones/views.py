@@ -1,3 +1,68 @@
-from django.shortcuts import render
+from asgiref.sync import sync_to_async
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from rest_framework import mixins, permissions, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from .eventos import CABECERAS_SSE, canales_del_token, flujo_eventos
+from .models import Notificacion
+from .serializers import NotificacionSerializer
+from sistema_citas.pagination import KeysetPagination
+from sistema_citas.routers import ReplicaReadMixin
 
-# Create your views here.
+class NotificacionPagination(KeysetPagination):
+    # Unread first (False < True), newest first: the order of notificacion_bandeja_idx
+    ordering = ('leida', '-fecha_creacion', '-id')
+    page_size = 20
+    max_page_size = 100
+
+class NotificacionViewSet(ReplicaReadMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    serializer_class = NotificacionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificacionPagination
+    replica_actions = ('list', 'no_leidas')
+
+    def get_queryset(self):
+        queryset = Notificacion.objects.filter(usuario=self.request.user)
+        if self.action == 'list' and self.request.query_params.get('leida', '').lower() in ('0', 'false'):
+            queryset = queryset.filter(leida=False)
+        return queryset
+
+    @action(detail=False, methods=['get'], url_path='no-leidas')
+    def no_leidas(self, request):
+        # Meant to be polled: a COUNT over the (usuario, leida) prefix of the index
+        total = Notificacion.objects.filter(usuario=request.user, leida=False).count()
+        return Response({'no_leidas': total})
+
+    @action(detail=True, methods=['post'])
+    def leer(self, request, pk=None):
+        actualizadas = Notificacion.objects.filter(pk=pk, usuario=request.user).update(leida=True)
+        if not actualizadas:
+            raise Http404
+        return Response({'actualizadas': actualizadas})
+
+    @action(detail=False, methods=['post'], url_path='leer-todas')
+    def leer_todas(self, request):
+        actualizadas = Notificacion.objects.filter(usuario=request.user, leida=False).update(leida=True)
+        return Response({'actualizadas': actualizadas})
+
+
+async def eventos(request):
+    """
+    Server-sent events: slot availability for everybody plus the user's own appointment changes.
+
+    EventSource cannot send headers, so the access token may come as `?token=`;
+    the stream ends when the token expires and the browser reconnects with a
+    fresh one. Under ASGI this path is served by notificaciones.asgi instead,
+    which does not tie a thread to every open connection.
+    """
+    crudo = request.GET.get('token')
+    if not crudo:
+        _, _, crudo = request.headers.get('Authorization', '').partition(' ')
+    suscripcion = await sync_to_async(canales_del_token)(crudo)
+    if suscripcion is None:
+        return JsonResponse({'detail': 'Token inválido o expirado.'}, status=401)
+
+    response = StreamingHttpResponse(flujo_eventos(*suscripcion), content_type='text/event-stream')
+    for header, value in CABECERAS_SSE:
+        response[header] = value
+    return response
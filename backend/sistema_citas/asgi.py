@@ -13,4 +13,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sistema_citas.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up. Long-lived SSE connections skip the Django
+# handler, which would hold one thread per open stream.
+from notificaciones.asgi import RUTA_EVENTOS, eventos_app  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == RUTA_EVENTOS:
+        return await eventos_app(scope, receive, send)
+    return await django_application(scope, receive, send)
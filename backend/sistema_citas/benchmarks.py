@@ -0,0 +1,89 @@
+"""
+Helpers shared by the bench_* management commands and the load tests.
+
+Benchmarks always run against a throwaway test database so they can seed and
+hammer freely without touching real data.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from statistics import quantiles
+
+from django.db import connection, connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+@contextmanager
+def base_de_datos_temporal(verbosity=0):
+    """
+    Create the test database, point the default connection at it, and drop it afterwards.
+
+    Also sets up Django's test environment (locmem email, 'testserver' allowed host)
+    so the in-process test client can be used, and mutes the per-request 4xx/5xx log
+    lines that a load run would otherwise flood the console with. SQLite gets its
+    own temporary file so a benchmark never clobbers the test suite's database.
+    Test mirrors (the `replica` alias) are pointed at it as well.
+    """
+    nombre_original = connection.settings_dict['NAME']
+    ajustes_test = connection.settings_dict.setdefault('TEST', {})
+    nombre_test_original = ajustes_test.get('NAME')
+    directorio = None
+    if connection.vendor == 'sqlite':
+        directorio = tempfile.mkdtemp(prefix='bench_')
+        ajustes_test['NAME'] = os.path.join(directorio, 'bench.sqlite3')
+    logger = logging.getLogger('django.request')
+    nivel_original = logger.level
+    logger.setLevel(logging.CRITICAL)
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    espejos = {
+        alias: connections[alias].settings_dict['NAME']
+        for alias in connections
+        if connections[alias].settings_dict.get('TEST', {}).get('MIRROR') == connection.alias
+    }
+    for alias in espejos:
+        connections[alias].close()
+        connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+    try:
+        yield
+    finally:
+        for alias, nombre in espejos.items():
+            connections[alias].close()
+            connections[alias].settings_dict['NAME'] = nombre
+        connection.creation.destroy_test_db(nombre_original, verbosity=verbosity)
+        teardown_test_environment()
+        logger.setLevel(nivel_original)
+        if directorio:
+            ajustes_test['NAME'] = nombre_test_original
+            shutil.rmtree(directorio, ignore_errors=True)
+
+
+def en_paralelo(funcion, argumentos, hilos):
+    """Run `funcion(arg)` for every argument on `hilos` threads; returns results in order."""
+    def tarea(argumento):
+        try:
+            return funcion(argumento)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=hilos) as executor:
+        return list(executor.map(tarea, argumentos))
+
+
+def percentiles(muestras):
+    """p50/p95/p99 of a list of durations in seconds, reported in milliseconds."""
+    if not muestras:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+    if len(muestras) == 1:
+        valor = round(muestras[0] * 1000, 3)
+        return {'p50_ms': valor, 'p95_ms': valor, 'p99_ms': valor}
+    cortes = quantiles(muestras, n=100, method='inclusive')
+    return {
+        'p50_ms': round(cortes[49] * 1000, 3),
+        'p95_ms': round(cortes[94] * 1000, 3),
+        'p99_ms': round(cortes[98] * 1000, 3),
+    }
@@ -0,0 +1,73 @@
+"""
+Conditional GET (ETag / If-None-Match) for the API viewsets.
+
+The ETag is worked out before anything is serialized, so an unchanged poll costs
+one small query and an empty 304:
+
+- list(): a one-row aggregate over the filtered queryset, max(updated_at) plus
+  count(). An insert, update or delete in the user's scope changes it, and so
+  does an edit of a related row that is listed in `fingerprint_related`.
+- retrieve(): the object's own updated_at (and its related ones).
+
+Writes that bypass Model.save() (queryset .update(), save(update_fields=...))
+must bump updated_at themselves for this to hold.
+"""
+
+import hashlib
+from functools import reduce
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework.response import Response
+
+
+class ConditionalGetMixin:
+    fingerprint_field = 'updated_at'
+    # Lookups of related updated_at fields whose rows the serializer renders,
+    # e.g. ('horario__updated_at',)
+    fingerprint_related = ()
+
+    def conditional_get_enabled(self):
+        # Streamed lists (StreamingListMixin) are sent as they are read, with no ETag
+        parametro = getattr(self, 'stream_query_param', 'stream')
+        return self.request.query_params.get(parametro, '').lower() not in ('1', 'true')
+
+    def list_fingerprint(self, queryset):
+        aggregates = {'count': Count('pk'), 'latest': Max(self.fingerprint_field)}
+        for position, lookup in enumerate(self.fingerprint_related):
+            aggregates[f'related_{position}'] = Max(lookup)
+        return list(queryset.order_by().aggregate(**aggregates).values())
+
+    def object_fingerprint(self, instance):
+        return [
+            reduce(getattr, lookup.split('__'), instance)
+            for lookup in (self.fingerprint_field, *self.fingerprint_related)
+        ]
+
+    def make_etag(self, fingerprint):
+        # The user and the full path are part of it: the same fingerprint means
+        # the same body only for the same scope, filters and page.
+        raw = '|'.join(map(str, [self.request.user.pk, self.request.get_full_path(), *fingerprint]))
+        return '"%s"' % hashlib.blake2b(raw.encode(), digest_size=12).hexdigest()
+
+    def conditional_response(self, etag, render):
+        response = get_conditional_response(self.request, etag=etag)
+        if response is None:
+            response = render()
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if not self.conditional_get_enabled():
+            return super().list(request, *args, **kwargs)
+        fingerprint = self.list_fingerprint(self.filter_queryset(self.get_queryset()))
+        render_list = super().list
+        return self.conditional_response(self.make_etag(fingerprint), lambda: render_list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        if not self.conditional_get_enabled():
+            return Response(self.get_serializer(instance).data)
+        etag = self.make_etag(self.object_fingerprint(instance))
+        return self.conditional_response(etag, lambda: Response(self.get_serializer(instance).data))
@@ -0,0 +1,89 @@
+"""
+Database profile chosen from environment variables (see `.env.example`).
+
+DB_ENGINE=sqlite (default) is for single-node installs. The file is opened in WAL
+mode, so readers never block the writer. It uses synchronous=NORMAL (durable at
+every WAL checkpoint) and a busy timeout, so concurrent writers wait instead of
+failing. Write transactions start IMMEDIATE: a transaction that reads and then
+writes takes the lock up front. Otherwise, under WAL, it would fail with
+"database is locked" and not wait.
+
+DB_ENGINE=postgresql is for multi-worker deployments. Connections are kept open
+for DB_CONN_MAX_AGE seconds and health-checked before they are reused. Setting
+DB_POOL_MAX_SIZE switches to a psycopg connection pool shared by the threads of
+each process. A pool and persistent connections cannot be combined, so the pool
+sets CONN_MAX_AGE to 0.
+
+Setting DB_REPLICA_HOST (PostgreSQL) or SQLITE_REPLICA_PATH (SQLite) adds a
+`replica` alias. sistema_citas.routers sends the read-heavy list endpoints
+there. In tests the alias mirrors `default`.
+"""
+
+import os
+
+REPLICA_ALIAS = 'replica'
+
+SQLITE_INIT_COMMAND = 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL'
+
+
+def _sqlite(path, env):
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'OPTIONS': {
+            'init_command': SQLITE_INIT_COMMAND,
+            # Seconds a connection waits for a lock (SQLite's busy_timeout)
+            'timeout': float(env.get('SQLITE_BUSY_TIMEOUT', 20)),
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+
+
+def _postgresql(env, prefix='DB_'):
+    def get(name, default=None):
+        # Replica settings fall back to the primary's
+        return env.get(prefix + name, env.get('DB_' + name, default))
+
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': get('NAME', 'sistema_citas'),
+        'USER': get('USER', ''),
+        'PASSWORD': get('PASSWORD', ''),
+        'HOST': get('HOST', 'localhost'),
+        'PORT': get('PORT', '5432'),
+        'CONN_MAX_AGE': int(env.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
+    }
+    if env.get('DB_POOL_MAX_SIZE'):
+        database['CONN_MAX_AGE'] = 0
+        database['OPTIONS']['pool'] = {
+            'min_size': int(env.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(env['DB_POOL_MAX_SIZE']),
+            # Seconds a request waits for a free connection before failing
+            'timeout': float(env.get('DB_POOL_TIMEOUT', 10)),
+        }
+    return database
+
+
+def database_settings(env=os.environ, base_dir='.'):
+    """The DATABASES setting for the environment `env`."""
+    engine = env.get('DB_ENGINE', 'sqlite')
+    if engine == 'postgresql':
+        databases = {'default': _postgresql(env)}
+        if env.get('DB_REPLICA_HOST'):
+            databases[REPLICA_ALIAS] = _postgresql(env, prefix='DB_REPLICA_')
+    elif engine == 'sqlite':
+        databases = {'default': _sqlite(env.get('SQLITE_PATH', os.path.join(base_dir, 'db.sqlite3')), env)}
+        # File-backed test database: the concurrency tests need SQLite's busy
+        # waiting, the shared in-memory database fails instead of waiting for writers.
+        databases['default']['TEST'] = {'NAME': os.path.join(base_dir, 'test_db.sqlite3')}
+        if env.get('SQLITE_REPLICA_PATH'):
+            databases[REPLICA_ALIAS] = _sqlite(env['SQLITE_REPLICA_PATH'], env)
+    else:
+        raise ValueError(f"DB_ENGINE debe ser 'sqlite' o 'postgresql', no {engine!r}")
+
+    if REPLICA_ALIAS in databases:
+        # Tests and benchmarks read the replica from the primary's throwaway database
+        databases[REPLICA_ALIAS]['TEST'] = {'MIRROR': 'default'}
+    return databases
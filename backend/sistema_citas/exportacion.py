@@ -0,0 +1,160 @@
+"""
+Streaming CSV and XLSX writers for exports.
+
+Both take an iterable of row tuples (normally `values_list(...).iterator()`) and
+return a generator of byte chunks for a StreamingHttpResponse or a file. Rows
+are encoded as they are read and flushed every TAMANO_TROZO bytes, so memory
+stays flat however many rows there are.
+
+XLSX is written with the standard library: the workbook is a zip archive and
+zipfile can write one to an unseekable stream (sizes go in data descriptors
+after each member). The sheet uses inline strings, so there is no shared-string
+table to hold in memory. Numbers are numeric cells; everything else, dates
+included, is written as text.
+"""
+
+import csv
+import re
+import zipfile
+from datetime import date, datetime, time
+from xml.sax.saxutils import escape
+
+TAMANO_TROZO = 64 * 1024
+# Characters XML 1.0 does not allow, even escaped
+_CONTROL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class _Buffer:
+    """Write-only file object whose contents are taken out with `vaciar()`."""
+
+    def __init__(self):
+        self.partes = []
+        self.tamano = 0
+
+    def write(self, datos):
+        if isinstance(datos, str):
+            datos = datos.encode()
+        self.partes.append(datos)
+        self.tamano += len(datos)
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes, self.tamano = [], 0
+        return datos
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, (date, datetime, time)):
+        return valor.isoformat()
+    return str(valor)
+
+
+def csv_streaming(encabezados, filas):
+    """CSV in UTF-8 with a byte-order mark, so spreadsheet apps read accents correctly."""
+    buffer = _Buffer()
+    # csv writes str; the buffer encodes each piece
+    escritor = csv.writer(buffer)
+    buffer.write('\ufeff')
+    escritor.writerow(encabezados)
+    for fila in filas:
+        escritor.writerow([_texto(valor) for valor in fila])
+        if buffer.tamano >= TAMANO_TROZO:
+            yield buffer.vaciar()
+    yield buffer.vaciar()
+
+
+def _columna(indice):
+    letras = ''
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _celda(referencia, valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return f'<c r="{referencia}"><v>{valor}</v></c>'
+    texto = escape(_CONTROL.sub('', _texto(valor)))
+    return f'<c r="{referencia}" t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _fila_xml(numero, columnas, valores):
+    celdas = ''.join(_celda(f'{columna}{numero}', valor) for columna, valor in zip(columnas, valores))
+    return f'<row r="{numero}">{celdas}</row>'
+
+
+_TIPOS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_RELACIONES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_RELACIONES_LIBRO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def _libro(hoja):
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(hoja[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+def xlsx_streaming(encabezados, filas, hoja='Datos'):
+    """A one-sheet workbook: the header row, then one row per item of `filas`."""
+    buffer = _Buffer()
+    columnas = [_columna(i) for i in range(len(encabezados))]
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archivo:
+        archivo.writestr('[Content_Types].xml', _TIPOS)
+        archivo.writestr('_rels/.rels', _RELACIONES)
+        archivo.writestr('xl/workbook.xml', _libro(hoja))
+        archivo.writestr('xl/_rels/workbook.xml.rels', _RELACIONES_LIBRO)
+        with archivo.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as hoja_xml:
+            hoja_xml.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            hoja_xml.write(_fila_xml(1, columnas, encabezados).encode())
+            for numero, fila in enumerate(filas, start=2):
+                hoja_xml.write(_fila_xml(numero, columnas, fila).encode())
+                if buffer.tamano >= TAMANO_TROZO:
+                    yield buffer.vaciar()
+            hoja_xml.write(b'</sheetData></worksheet>')
+    yield buffer.vaciar()
+
+
+FORMATOS = {
+    'csv': (csv_streaming, 'text/csv; charset=utf-8'),
+    'xlsx': (xlsx_streaming, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
@@ -0,0 +1,242 @@
+"""
+Per-request performance instrumentation (PERFORMANCE_METRICS=True).
+
+PerformanceMiddleware times every request. While the request runs, it installs an
+execute wrapper on each database connection, which counts SQL and its time and
+spots duplicate statements (the signature of an N+1). Serializer time comes from
+a timed `BaseSerializer.data`. Each request:
+
+- gets a `Server-Timing` header (visible in the browser's network panel);
+- is logged as one JSON line on the `sistema_citas.performance` logger, at
+  WARNING when it repeated a statement PERFORMANCE_DUPLICATE_QUERY_THRESHOLD
+  times or more;
+- is added to per-route histograms served by `/metrics` in the Prometheus text
+  format, to scrapers sending `Authorization: Bearer <PERFORMANCE_METRICS_TOKEN>`
+  (without a token the endpoint is off). Routes are named after the view, e.g.
+  `CitaViewSet.confirmar`.
+
+The metrics are per process: scrape every worker. When the setting is off, the
+middleware removes itself at startup and nothing is patched, so the cost is zero.
+"""
+
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger('sistema_citas.performance')
+
+# Seconds; the last bucket (+Inf) is implicit
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = ContextVar('performance_record', default=None)
+_patch_lock = threading.Lock()
+_patched = False
+
+
+class RequestRecord:
+    __slots__ = ('queries', 'sql_seconds', 'serializer_seconds', 'serializer_depth', 'statements', 'route')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.serializer_depth = 0
+        self.statements = Counter()
+        self.route = None
+
+    def __call__(self, execute, sql, params, many, context):
+        # Database execute wrapper
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_seconds += time.perf_counter() - start
+            self.queries += 1
+            # `sql` is the parameterized template, the same for every row of an N+1
+            self.statements[sql] += 1
+
+    def duplicates(self, threshold):
+        return [(sql, count) for sql, count in self.statements.items() if count >= threshold]
+
+
+class RouteStats:
+    __slots__ = ('buckets', 'seconds', 'queries', 'sql_seconds', 'serializer_seconds', 'duplicates', 'responses')
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.seconds = 0.0
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.duplicates = 0
+        self.responses = Counter()
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = defaultdict(RouteStats)
+
+    def observe(self, route, method, status, seconds, record, duplicates):
+        with self._lock:
+            stats = self._routes[route]
+            stats.buckets[bisect_left(BUCKETS, seconds)] += 1
+            stats.seconds += seconds
+            stats.queries += record.queries
+            stats.sql_seconds += record.sql_seconds
+            stats.serializer_seconds += record.serializer_seconds
+            stats.duplicates += duplicates
+            stats.responses[method, status] += 1
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+
+    def render(self):
+        """Prometheus text exposition format 0.0.4."""
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines = [
+                '# HELP sistema_citas_request_duration_seconds Request duration by route.',
+                '# TYPE sistema_citas_request_duration_seconds histogram',
+            ]
+            for route, stats in routes:
+                label = _label(route)
+                cumulative = 0
+                for bound, count in zip((*BUCKETS, '+Inf'), stats.buckets):
+                    cumulative += count
+                    lines.append(f'sistema_citas_request_duration_seconds_bucket{{route={label},le="{bound}"}} {cumulative}')
+                lines.append(f'sistema_citas_request_duration_seconds_sum{{route={label}}} {stats.seconds}')
+                lines.append(f'sistema_citas_request_duration_seconds_count{{route={label}}} {cumulative}')
+            for name, help_text, attribute in (
+                ('sistema_citas_db_queries_total', 'SQL statements executed.', 'queries'),
+                ('sistema_citas_db_seconds_total', 'Time spent in SQL.', 'sql_seconds'),
+                ('sistema_citas_serializer_seconds_total', 'Time spent in DRF serializers.', 'serializer_seconds'),
+                ('sistema_citas_duplicate_queries_total', 'Requests that repeated a SQL statement.', 'duplicates'),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                lines += [f'{name}{{route={_label(route)}}} {getattr(stats, attribute)}' for route, stats in routes]
+            lines += [
+                '# HELP sistema_citas_responses_total Responses by route, method and status.',
+                '# TYPE sistema_citas_responses_total counter',
+            ]
+            for route, stats in routes:
+                for (method, status), count in sorted(stats.responses.items()):
+                    lines.append(
+                        f'sistema_citas_responses_total{{route={_label(route)},method="{method}",status="{status}"}} {count}'
+                    )
+        return '\n'.join(lines) + '\n'
+
+
+def _label(value):
+    return '"%s"' % value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+registry = Registry()
+
+
+def route_name(request, view_func):
+    """`CitaViewSet.confirmar` for viewset actions, `RegisterView.post` for APIViews, the function name otherwise."""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return getattr(view_func, '__name__', 'unknown')
+    actions = getattr(view_func, 'actions', None)
+    method = request.method.lower()
+    return f"{cls.__name__}.{actions.get(method, method) if actions else method}"
+
+
+def _patch_serializers():
+    global _patched
+    with _patch_lock:
+        if _patched:
+            return
+        from rest_framework.serializers import BaseSerializer
+
+        data = BaseSerializer.data.fget
+
+        def timed_data(serializer):
+            record = _current.get()
+            if record is None:
+                return data(serializer)
+            # Nested `.data` calls are already inside the outer measurement
+            record.serializer_depth += 1
+            start = time.perf_counter()
+            try:
+                return data(serializer)
+            finally:
+                record.serializer_depth -= 1
+                if not record.serializer_depth:
+                    record.serializer_seconds += time.perf_counter() - start
+
+        BaseSerializer.data = property(timed_data)
+        _patched = True
+
+
+class PerformanceMiddleware:
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_METRICS:
+            raise MiddlewareNotUsed
+        _patch_serializers()
+        self.get_response = get_response
+        self.threshold = settings.PERFORMANCE_DUPLICATE_QUERY_THRESHOLD
+
+    def __call__(self, request):
+        record = RequestRecord()
+        token = _current.set(record)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(record))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        seconds = time.perf_counter() - start
+
+        route = record.route or 'unmatched'
+        duplicates = record.duplicates(self.threshold)
+        registry.observe(route, request.method, response.status_code, seconds, record, bool(duplicates))
+        response['Server-Timing'] = (
+            f'app;dur={seconds * 1000:.2f}, '
+            f'db;dur={record.sql_seconds * 1000:.2f};desc="{record.queries} queries", '
+            f'serializer;dur={record.serializer_seconds * 1000:.2f}'
+        )
+        level = logging.WARNING if duplicates else logging.INFO
+        if logger.isEnabledFor(level):
+            logger.log(level, json.dumps({
+                'route': route,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(seconds * 1000, 3),
+                'db_queries': record.queries,
+                'db_ms': round(record.sql_seconds * 1000, 3),
+                'serializer_ms': round(record.serializer_seconds * 1000, 3),
+                'duplicate_queries': [{'sql': sql[:300], 'count': count} for sql, count in duplicates],
+            }))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _current.get().route = route_name(request, view_func)
+
+
+def metrics(request):
+    """Prometheus scrape endpoint; 404 unless PERFORMANCE_METRICS is on and PERFORMANCE_METRICS_TOKEN is set."""
+    token = settings.PERFORMANCE_METRICS_TOKEN
+    # Routes and traffic are not for anyone who asks: no token, no endpoint
+    if not settings.PERFORMANCE_METRICS or not token:
+        raise Http404
+    if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=401)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,179 @@
+"""
+Keyset (cursor) pagination shared by the API viewsets.
+
+Pages are addressed by the ordering values of the last row already sent instead
+of an OFFSET, so fetching page 1000 costs the same index range scan as page 1.
+"""
+
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from datetime import date, datetime, time
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+
+
+def _encode_value(value):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only keyset pagination over a fixed, unique `ordering`.
+
+    The last ordering field must be unique (normally `id`) so that rows sharing
+    the leading values are never skipped or repeated between pages.
+    """
+    ordering = ('id',)
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request, queryset.model)
+
+        queryset = self.filter_after(queryset.order_by(*self.ordering), position)
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                size = int(request.query_params[self.page_size_query_param])
+                if size > 0:
+                    return min(size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def filter_after(self, queryset, position):
+        """Restrict `queryset` to rows strictly after `position` in `ordering`."""
+        if position is None:
+            return queryset
+        # (a, b, c) > (x, y, z) expanded so the leading column stays a plain
+        # range predicate the index can seek on:
+        #   a >= x AND (a > x OR (a = x AND (b > y OR (b = y AND c > z))))
+        condition = None
+        for field, value in reversed(list(zip(self.ordering, position))):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            strict = Q(**{f'{name}__{lookup}': value})
+            if condition is None:
+                condition = strict
+            else:
+                condition = strict | (Q(**{name: value}) & condition)
+        first = self.ordering[0]
+        leading = 'lte' if first.startswith('-') else 'gte'
+        return queryset.filter(Q(**{f'{first.lstrip("-")}__{leading}': position[0]}) & condition)
+
+    def position_of(self, instance):
+        return [_encode_value(getattr(instance, field.lstrip('-'))) for field in self.ordering]
+
+    def encode_cursor(self, position):
+        raw = json.dumps(position, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, request, model):
+        """The cursor's position, each value converted by its ordering field; 404 if malformed."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            position = [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (ValidationError, ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        # Ordering columns are never NULL; a None could not be compared anyway
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        cursor = self.encode_cursor(self.position_of(self.page[-1]))
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def iterate_batches(self, queryset, batch_size=None):
+        """Yield successive keyset pages of `queryset` until it is exhausted."""
+        batch_size = batch_size or self.max_page_size
+        queryset = queryset.order_by(*self.ordering)
+        position = None
+        while True:
+            batch = list(self.filter_after(queryset, position)[:batch_size])
+            if not batch:
+                return
+            yield batch
+            if len(batch) < batch_size:
+                return
+            position = self.position_of(batch[-1])
+
+
+class StreamingListMixin:
+    """
+    Opt-in `?stream=true` mode on `list()` for exports.
+
+    The whole (filtered) queryset is sent as one JSON array, produced batch by
+    batch with keyset queries so memory stays bounded regardless of table size.
+    """
+    stream_query_param = 'stream'
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get(self.stream_query_param, '').lower() not in ('1', 'true'):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        return StreamingHttpResponse(self.stream_json(queryset), content_type='application/json')
+
+    def stream_json(self, queryset):
+        encoder = JSONEncoder(ensure_ascii=not api_settings.UNICODE_JSON)
+        yield '['
+        first = True
+        for batch in self.paginator.iterate_batches(queryset):
+            for item in self.get_serializer(batch, many=True).data:
+                yield ('' if first else ',') + encoder.encode(item)
+                first = False
+        yield ']'
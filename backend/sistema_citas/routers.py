@@ -0,0 +1,77 @@
+"""
+Primary/replica routing.
+
+Reads stay on the primary unless code is running inside `replica_reads()`. The
+ReplicaReadMixin enters it for a viewset's read-heavy actions, such as dashboard
+lists and polled counters. Those can tolerate the replica's lag. Writes, and every
+query made while the primary is in a transaction, use the primary. So the booking
+transaction always sees its own writes. Without a `replica` alias, everything
+uses `default`.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .database import REPLICA_ALIAS
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_END = object()
+
+
+@contextmanager
+def replica_reads():
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (
+            _replica_reads.get()
+            and REPLICA_ALIAS in connections.settings
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return REPLICA_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives the schema through replication
+        return db != REPLICA_ALIAS
+
+
+def _chunks_from_replica(chunks):
+    # The context is entered around every chunk separately. Under ASGI each
+    # chunk may be produced in a different context.
+    chunks = iter(chunks)
+    while True:
+        with replica_reads():
+            chunk = next(chunks, _END)
+        if chunk is _END:
+            return
+        yield chunk
+
+
+class ReplicaReadMixin:
+    """Serve the viewset actions in `replica_actions` from the replica, including streamed bodies."""
+    replica_actions = ('list',)
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.action_map.get(request.method.lower()) not in self.replica_actions:
+            return super().dispatch(request, *args, **kwargs)
+        with replica_reads():
+            response = super().dispatch(request, *args, **kwargs)
+        if response.streaming:
+            response.streaming_content = _chunks_from_replica(response.streaming_content)
+        return response
@@ -11,10 +11,13 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
 import os
+from importlib.util import find_spec
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
 
+from sistema_citas.database import database_settings
+
 # Load environment variables
 load_dotenv()
 
@@ -47,6 +50,7 @@ INSTALLED_APPS = [
     # Third party
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
 
     # Local apps
@@ -56,9 +60,12 @@ INSTALLED_APPS = [
     'citas',
     'notificaciones',
     'actividades',
+    'calendario',
 ]
 
 MIDDLEWARE = [
+    # Outermost so its timing covers the whole stack; removes itself when disabled
+    'sistema_citas.instrumentation.PerformanceMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -92,17 +99,36 @@ WSGI_APPLICATION = 'sistema_citas.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
+# Profile chosen with DB_ENGINE and related variables, see sistema_citas/database.py
+DATABASES = database_settings(os.environ, BASE_DIR)
+
+DATABASE_ROUTERS = ['sistema_citas.routers.PrimaryReplicaRouter']
 
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
+# Password hashing (usuarios.hashers). argon2 needs argon2-cffi; without it the
+# default profile is pbkdf2. Hashes made with the other profile, or with a different
+# cost, are rehashed on the next successful login. Pick costs with `manage.py bench_login`.
+PASSWORD_HASHER_PROFILE = os.environ.get('PASSWORD_HASHER_PROFILE') or (
+    'argon2' if find_spec('argon2') else 'pbkdf2'
+)
+_PASSWORD_HASHERS = {
+    'argon2': 'usuarios.hashers.Argon2Ajustado',
+    'pbkdf2': 'usuarios.hashers.PBKDF2Ajustado',
+}
+PASSWORD_HASHERS = [
+    _PASSWORD_HASHERS[PASSWORD_HASHER_PROFILE],
+    *(hasher for perfil, hasher in _PASSWORD_HASHERS.items() if perfil != PASSWORD_HASHER_PROFILE),
+]
+# OWASP's argon2id baseline: 19 MiB, 2 passes, 1 lane per hash
+PASSWORD_ARGON2_TIME_COST = int(os.environ.get('PASSWORD_ARGON2_TIME_COST', 2))
+PASSWORD_ARGON2_MEMORY_COST = int(os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 19456))
+PASSWORD_ARGON2_PARALLELISM = int(os.environ.get('PASSWORD_ARGON2_PARALLELISM', 1))
+# Unset: Django's default iteration count
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 0)) or None
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -139,11 +165,22 @@ STATIC_URL = 'static/'
 # DRF Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'usuarios.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Reverse proxies in front of the app; throttles read the client address from
+    # X-Forwarded-For only when this is set
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+}
+
+# Login throttles (usuarios.throttles): all attempts per client address, failed
+# attempts per account. Remove a scope to disable it.
+LOGIN_THROTTLE_CACHE_ALIAS = 'default'
+LOGIN_THROTTLE_RATES = {
+    'login_ip': os.environ.get('LOGIN_THROTTLE_IP_RATE', '120/min'),
+    'login_cuenta': os.environ.get('LOGIN_THROTTLE_ACCOUNT_RATE', '10/min'),
 }
 
 # JWT Configuration
@@ -155,6 +192,14 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# usuarios.authentication: token versions live in the shared cache, full user rows
+# in a per-process cache for a few seconds
+AUTH_CACHE_ALIAS = 'default'
+AUTH_TOKEN_VERSION_TIMEOUT = 5 * 60
+AUTH_USER_CACHE_SECONDS = 30
+# Initial size of the per-process Bloom filter of blacklisted refresh tokens (usuarios.lista_negra)
+JWT_BLACKLIST_BLOOM_CAPACITY = 100_000
+
 CORS_ALLOW_ALL_ORIGINS = True # For development only
 
 AUTH_USER_MODEL = 'usuarios.Usuario'
@@ -167,6 +212,109 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
 
+# Email outbox (notificaciones.correo): requests queue rows, `manage.py enviar_correos` delivers them
+EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get('EMAIL_OUTBOX_BATCH_SIZE', 100))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 6))
+EMAIL_OUTBOX_BACKOFF_SECONDS = 30
+EMAIL_OUTBOX_MAX_BACKOFF_SECONDS = 60 * 60
+EMAIL_OUTBOX_LEASE_SECONDS = 5 * 60
+
+# Appointment reminders (notificaciones.recordatorios), run by `manage.py enviar_recordatorios --loop`
+REMINDER_BATCH_SIZE = int(os.environ.get('REMINDER_BATCH_SIZE', 500))
+
+# Appointment sweeper (citas.barrido), run by `manage.py barrer_citas --loop`. PENDIENTE
+# requests expire this many minutes before their slot starts; CONFIRMADA appointments
+# become NO_ASISTIO this many minutes after their slot ends unless marked COMPLETADA.
+SWEEPER_BATCH_SIZE = int(os.environ.get('SWEEPER_BATCH_SIZE', 1000))
+SWEEPER_PENDING_EXPIRY_MINUTES = int(os.environ.get('SWEEPER_PENDING_EXPIRY_MINUTES', 0))
+SWEEPER_NO_SHOW_GRACE_MINUTES = int(os.environ.get('SWEEPER_NO_SHOW_GRACE_MINUTES', 24 * 60))
+
+# Google Calendar sync (calendario.sincronizacion), run by `manage.py sincronizar_calendario --loop`.
+# Requests only queue operations; the worker sends them in batch requests of up to 50
+# calls. With GOOGLE_CALENDAR_TOKEN set, that bearer token is used as is (the local stub,
+# `manage.py calendario_stub`); otherwise the service account key in
+# GOOGLE_CALENDAR_CREDENTIALS is used, which needs google-auth.
+GOOGLE_CALENDAR_ENABLED = os.environ.get('GOOGLE_CALENDAR_ENABLED', 'false').lower() == 'true'
+GOOGLE_CALENDAR_API_URL = os.environ.get('GOOGLE_CALENDAR_API_URL', 'https://www.googleapis.com').rstrip('/')
+GOOGLE_CALENDAR_CREDENTIALS = os.environ.get('GOOGLE_CALENDAR_CREDENTIALS', str(BASE_DIR / 'credentials.json'))
+GOOGLE_CALENDAR_TOKEN = os.environ.get('GOOGLE_CALENDAR_TOKEN', '')
+GOOGLE_CALENDAR_BATCH_SIZE = int(os.environ.get('GOOGLE_CALENDAR_BATCH_SIZE', 50))
+GOOGLE_CALENDAR_MAX_ATTEMPTS = int(os.environ.get('GOOGLE_CALENDAR_MAX_ATTEMPTS', 8))
+GOOGLE_CALENDAR_BACKOFF_SECONDS = 30
+GOOGLE_CALENDAR_MAX_BACKOFF_SECONDS = 60 * 60
+GOOGLE_CALENDAR_LEASE_SECONDS = 5 * 60
+GOOGLE_CALENDAR_TIMEOUT = 30
+
+# .ics feeds (calendario.ics): rows fetched per cursor round trip, and feeds up to
+# ICS_FEED_CACHE_MAX_BYTES kept in the cache under their version stamp
+ICS_FEED_CHUNK_SIZE = int(os.environ.get('ICS_FEED_CHUNK_SIZE', 2000))
+ICS_FEED_CACHE_ALIAS = 'default'
+ICS_FEED_CACHE_MAX_BYTES = int(os.environ.get('ICS_FEED_CACHE_MAX_BYTES', 512 * 1024))
+ICS_FEED_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Administrative exports (citas.reportes): rows fetched per cursor round trip
+REPORT_CHUNK_SIZE = int(os.environ.get('REPORT_CHUNK_SIZE', 2000))
+
+# Server-sent events (notificaciones.eventos). Serve /api/notificaciones/eventos/ from an
+# ASGI server (sistema_citas.asgi); with more than one worker process use BusRedis.
+EVENTOS_BUS_BACKEND = os.environ.get('EVENTOS_BUS_BACKEND', 'notificaciones.eventos.BusEnMemoria')
+EVENTOS_REDIS_URL = os.environ.get('EVENTOS_REDIS_URL', 'redis://localhost:6379/0')
+EVENTOS_HEARTBEAT_SECONDS = 15
+EVENTOS_MAX_PENDIENTES = 100
+# BusRedis: wait before reconnecting a dropped pub/sub connection, doubled up to the maximum
+EVENTOS_REDIS_BACKOFF_SECONDS = 1
+EVENTOS_REDIS_MAX_BACKOFF_SECONDS = 30
+
+# Caches. Local memory is per process: with several workers, set REDIS_CACHE_URL (or
+# CACHE_DIR for a file cache shared on one host) so invalidations reach all of them.
+if os.environ.get('REDIS_CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_CACHE_URL'],
+        }
+    }
+elif os.environ.get('CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['CACHE_DIR'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'sistema-citas',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# Public availability cache (agenda.cache)
+AGENDA_CACHE_ALIAS = 'default'
+AGENDA_CACHE_TIMEOUT = 10 * 60
+
+# Per-request timing, Server-Timing headers and /metrics (sistema_citas.instrumentation)
+PERFORMANCE_METRICS = os.environ.get('PERFORMANCE_METRICS', '').lower() in ('1', 'true')
+PERFORMANCE_METRICS_TOKEN = os.environ.get('PERFORMANCE_METRICS_TOKEN', '')
+PERFORMANCE_DUPLICATE_QUERY_THRESHOLD = 3
+
+# One JSON line per request at INFO; at WARNING only requests with duplicate queries
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'sistema_citas.performance': {
+            'handlers': ['console'],
+            'level': os.environ.get('PERFORMANCE_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
 
 # Frontend URL for email links
 FRONTEND_URL = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
@@ -0,0 +1,156 @@
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from citas.benchmarks import sembrar_horarios, sembrar_usuarios
+from usuarios.models import Usuario
+from .database import REPLICA_ALIAS, database_settings
+from .instrumentation import PerformanceMiddleware, registry
+from .routers import PrimaryReplicaRouter, replica_reads
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+
+    def test_sqlite_afinado(self):
+        default = database_settings({}, '/srv')['default']
+        self.assertEqual(default['NAME'], '/srv/db.sqlite3')
+        self.assertIn('journal_mode=WAL', default['OPTIONS']['init_command'])
+        self.assertIn('synchronous=NORMAL', default['OPTIONS']['init_command'])
+        self.assertEqual(default['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+
+    def test_dos_archivos_sqlite(self):
+        databases = database_settings({'SQLITE_REPLICA_PATH': '/srv/replica.sqlite3'}, '/srv')
+        self.assertEqual(databases[REPLICA_ALIAS]['NAME'], '/srv/replica.sqlite3')
+        self.assertEqual(databases[REPLICA_ALIAS]['TEST'], {'MIRROR': 'default'})
+
+    def test_postgresql_persistente(self):
+        default = database_settings({'DB_ENGINE': 'postgresql', 'DB_CONN_MAX_AGE': '300'})['default']
+        self.assertEqual(default['CONN_MAX_AGE'], 300)
+        self.assertTrue(default['CONN_HEALTH_CHECKS'])
+        self.assertNotIn('pool', default['OPTIONS'])
+
+    def test_postgresql_con_pool_y_replica(self):
+        databases = database_settings({
+            'DB_ENGINE': 'postgresql', 'DB_NAME': 'citas', 'DB_HOST': 'primaria',
+            'DB_POOL_MAX_SIZE': '20', 'DB_REPLICA_HOST': 'replica',
+        })
+        self.assertEqual(databases['default']['CONN_MAX_AGE'], 0)
+        self.assertEqual(databases['default']['OPTIONS']['pool']['max_size'], 20)
+        self.assertEqual(databases[REPLICA_ALIAS]['HOST'], 'replica')
+        self.assertEqual(databases[REPLICA_ALIAS]['NAME'], 'citas')
+
+    def test_motor_desconocido(self):
+        with self.assertRaises(ValueError):
+            database_settings({'DB_ENGINE': 'mysql'})
+
+
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    router = PrimaryReplicaRouter()
+
+    def test_sin_replica_todo_va_a_la_primaria(self):
+        with mock.patch.dict(connections.settings), replica_reads():
+            connections.settings.pop(REPLICA_ALIAS, None)
+            self.assertEqual(self.router.db_for_read(Usuario), DEFAULT_DB_ALIAS)
+
+    def test_lecturas_marcadas_van_a_la_replica(self):
+        with mock.patch.dict(connections.settings, {REPLICA_ALIAS: connections.settings[DEFAULT_DB_ALIAS]}):
+            self.assertEqual(self.router.db_for_read(Usuario), DEFAULT_DB_ALIAS)
+            with replica_reads():
+                self.assertEqual(self.router.db_for_read(Usuario), REPLICA_ALIAS)
+                self.assertEqual(self.router.db_for_write(Usuario), DEFAULT_DB_ALIAS)
+            self.assertFalse(self.router.allow_migrate(REPLICA_ALIAS, 'usuarios'))
+
+
+@skipUnless(REPLICA_ALIAS in settings.DATABASES, "Run with SQLITE_REPLICA_PATH (or DB_REPLICA_HOST) set.")
+class ReplicaRoutingTests(TransactionTestCase):
+    """End-to-end routing, e.g. `SQLITE_REPLICA_PATH=replica.sqlite3 python manage.py test`."""
+    databases = '__all__'
+
+    def setUp(self):
+        self.especialista = sembrar_usuarios(1, rol=Usuario.Roles.ESPECIALISTA, prefijo='especialista')[0]
+        self.alumno = sembrar_usuarios(1)[0]
+        self.horario_id = sembrar_horarios(self.especialista, 1)[0]
+
+    def _client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_listados_en_replica_y_reserva_en_primaria(self):
+        client = self._client(self.alumno)
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primaria, \
+                CaptureQueriesContext(connections[REPLICA_ALIAS]) as replica:
+            response = client.post(
+                '/api/citas/citas/', {'horario_id': self.horario_id, 'motivo': 'Replica'}, format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(replica), 0)
+        self.assertGreater(len(primaria), 0)
+
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primaria, \
+                CaptureQueriesContext(connections[REPLICA_ALIAS]) as replica:
+            response = client.get('/api/citas/citas/')
+            self.assertEqual(client.get('/api/citas/citas/?stream=true').status_code, 200)
+            streamed = b''.join(client.get('/api/citas/citas/?stream=true').streaming_content)
+        self.assertEqual(len(response.json()['results']), 1)
+        self.assertIn(b'Replica', streamed)
+        self.assertEqual(len(primaria), 0)
+        self.assertGreater(len(replica), 0)
+
+    def test_transaccion_abierta_lee_de_la_primaria(self):
+        with transaction.atomic(), replica_reads():
+            self.assertEqual(PrimaryReplicaRouter().db_for_read(Usuario), DEFAULT_DB_ALIAS)
+
+
+@override_settings(PERFORMANCE_METRICS=True, PERFORMANCE_METRICS_TOKEN='secreto')
+class PerformanceMiddlewareTests(TestCase):
+
+    def setUp(self):
+        registry.clear()
+        self.alumno = sembrar_usuarios(1)[0]
+
+    def test_server_timing_y_metricas_por_ruta(self):
+        client = APIClient()
+        client.force_authenticate(self.alumno)
+        response = client.get('/api/citas/citas/')
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="2 queries", serializer;dur=')
+
+        metricas = client.get('/metrics', HTTP_AUTHORIZATION='Bearer secreto').content.decode()
+        self.assertIn('sistema_citas_request_duration_seconds_bucket{route="CitaViewSet.list",le="+Inf"} 1', metricas)
+        self.assertIn('sistema_citas_db_queries_total{route="CitaViewSet.list"} 2', metricas)
+        self.assertIn(
+            'sistema_citas_responses_total{route="CitaViewSet.list",method="GET",status="200"} 1', metricas
+        )
+
+    def test_consultas_repetidas_se_registran_como_n_mas_1(self):
+        def vista(request):
+            for _ in range(3):
+                Usuario.objects.filter(pk=self.alumno.pk).exists()
+            return HttpResponse()
+
+        with self.assertLogs('sistema_citas.performance', 'WARNING') as logs:
+            PerformanceMiddleware(vista)(RequestFactory().get('/lento/'))
+        self.assertIn('"count": 3', logs.output[0])
+        self.assertIn('sistema_citas_duplicate_queries_total{route="unmatched"} 1', registry.render())
+
+    def test_metricas_con_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer otro').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secreto').status_code, 200)
+
+    @override_settings(PERFORMANCE_METRICS_TOKEN='')
+    def test_sin_token_no_se_sirven(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+    @override_settings(PERFORMANCE_METRICS=False)
+    def test_desactivado(self):
+        client = APIClient()
+        client.force_authenticate(self.alumno)
+        self.assertNotIn('Server-Timing', client.get('/api/citas/citas/'))
+        self.assertEqual(client.get('/metrics').status_code, 404)
@@ -17,11 +17,16 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from sistema_citas.instrumentation import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('usuarios.urls')),
     path('api/agenda/', include('agenda.urls')),
     path('api/citas/', include('citas.urls')),
+    path('api/notificaciones/', include('notificaciones.urls')),
+    path('api/calendario/', include('calendario.urls')),
+    path('metrics', metrics, name='metrics'),
 ]
 
 
@@ -0,0 +1,147 @@
+"""
+JWT authentication without a user SELECT per request.
+
+Access tokens carry the Usuario.CLAIMS and the user's `token_version` (`ver`).
+ClaimsJWTAuthentication builds `request.user` from them as a Usuario instance
+whose other fields are deferred. Role checks, ownership comparisons and
+`filter(especialista=request.user)` work as with a loaded row. A view that reads
+a field not carried in the token gets it from a per-process cache of full rows,
+valid for AUTH_USER_CACHE_SECONDS.
+
+A token is accepted only while its `ver` equals the user's current
+token_version, read from the shared cache (the database on a miss). Changing a
+claimed field or the password bumps the version (Usuario.save), so tokens with
+stale claims are rejected. Tokens issued before `ver` existed take the
+database path of the stock JWTAuthentication.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .lista_negra import RefreshTokenConFrente
+from .models import Usuario
+
+VERSION_CLAIM = 'ver'
+PREFIJO_VERSION = 'usuarios:token_version:'
+MAX_USUARIOS_EN_CACHE = 10000
+
+_usuarios = {}
+_usuarios_lock = threading.Lock()
+
+
+def _cache():
+    return caches[settings.AUTH_CACHE_ALIAS]
+
+
+def version_vigente(usuario_id):
+    """Current token_version of the user, or -1 if it cannot sign in (inactive or deleted)."""
+    clave = PREFIJO_VERSION + str(usuario_id)
+    version = _cache().get(clave)
+    if version is None:
+        fila = Usuario.objects.filter(pk=usuario_id).values_list('token_version', 'is_active').first()
+        version = fila[0] if fila and fila[1] else -1
+        _cache().add(clave, version, settings.AUTH_TOKEN_VERSION_TIMEOUT)
+    return version
+
+
+def olvidar_usuario(usuario_id):
+    """Drop the cached version and row of a user that changed, now and again after commit."""
+    def borrar():
+        _cache().delete(PREFIJO_VERSION + str(usuario_id))
+        with _usuarios_lock:
+            _usuarios.pop(usuario_id, None)
+
+    borrar()
+    transaction.on_commit(borrar)
+
+
+def usuario_completo(usuario_id):
+    """Full Usuario row from the per-process cache; one query on a miss or once expired."""
+    ahora = time.monotonic()
+    entrada = _usuarios.get(usuario_id)
+    if entrada is not None and entrada[0] > ahora:
+        return entrada[1]
+    usuario = Usuario.objects.get(pk=usuario_id)
+    with _usuarios_lock:
+        if len(_usuarios) >= MAX_USUARIOS_EN_CACHE:
+            _usuarios.clear()
+        _usuarios[usuario_id] = (ahora + settings.AUTH_USER_CACHE_SECONDS, usuario)
+    return usuario
+
+
+def completar_desde_cache(usuario):
+    """Fill the deferred fields of a token-built user from the cached full row."""
+    completo = usuario_completo(usuario.pk)
+    for campo in Usuario._meta.concrete_fields:
+        if campo.attname not in usuario.__dict__:
+            usuario.__dict__[campo.attname] = completo.__dict__[campo.attname]
+
+
+def claims_de_usuario(usuario):
+    return {**{campo: getattr(usuario, campo) for campo in Usuario.CLAIMS}, VERSION_CLAIM: usuario.token_version}
+
+
+def usuario_desde_token(token):
+    """Usuario instance with the token's claims loaded and every other field deferred."""
+    valores = {
+        'id': Usuario._meta.pk.to_python(token[jwt_settings.USER_ID_CLAIM]),
+        'token_version': token[VERSION_CLAIM],
+        **{campo: token[campo] for campo in Usuario.CLAIMS},
+    }
+    campos = [campo.attname for campo in Usuario._meta.concrete_fields if campo.attname in valores]
+    usuario = Usuario.from_db(DEFAULT_DB_ALIAS, campos, [valores[campo] for campo in campos])
+    usuario._desde_token = True
+    return usuario
+
+
+def validar_version(token):
+    usuario_id = token.get(jwt_settings.USER_ID_CLAIM)
+    if usuario_id is None:
+        raise InvalidToken("El token no identifica a ningún usuario.")
+    if version_vigente(usuario_id) != token[VERSION_CLAIM]:
+        raise AuthenticationFailed("El token fue revocado; inicia sesión de nuevo.", code='token_revoked')
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if VERSION_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        validar_version(validated_token)
+        return usuario_desde_token(validated_token)
+
+
+class VersionedTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refuses refresh tokens whose claims were revoked, so they cannot mint new access tokens.
+
+    The version check also covers what the stock serializer loads the user for
+    (deleted or inactive accounts), so versioned tokens rotate without that query.
+    """
+    token_class = RefreshTokenConFrente
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if VERSION_CLAIM not in refresh:
+            return super().validate(attrs)
+        validar_version(refresh)
+
+        data = {'access': str(refresh.access_token)}
+        if jwt_settings.ROTATE_REFRESH_TOKENS:
+            with transaction.atomic():
+                if jwt_settings.BLACKLIST_AFTER_ROTATION:
+                    refresh.blacklist()
+                refresh.set_jti()
+                refresh.set_exp()
+                refresh.set_iat()
+                refresh.outstand()
+            data['refresh'] = str(refresh)
+        return data
@@ -1,205 +1,127 @@
-from django.core.mail import send_mail
+"""
+Transactional emails.
+
+Every message type is a pair of Django templates under
+`usuarios/templates/usuarios/emails/` (`<tipo>.html` and `<tipo>.txt`). A template
+is rendered through the engine only once per process, with a marker in place of
+each per-user field; the output is frozen into a `str.format` shell so a message
+costs one `format_map` call with the escaped field values instead of a full
+template render. Per-user fields must therefore be printed as plain `{{ campo }}`:
+filters or tags that inspect their value would only ever see the marker.
+"""
+
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.template.loader import render_to_string
-from django.utils.html import strip_tags
-from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
-from django.conf import settings
+from django.utils.html import escape
+from django.utils.http import urlsafe_base64_encode
+
+from notificaciones.correo import encolar_correo
+from notificaciones.models import CorreoSaliente
 from .tokens import account_activation_token
 
+# Subject and per-user fields of every message type
+TIPOS_CORREO = {
+    'verificacion': ('Verifica tu cuenta - Sistema de Citas TECNL', ('nombre', 'enlace')),
+    'confirmacion': (
+        'Tu cita fue confirmada - Sistema de Citas TECNL',
+        ('nombre', 'especialista', 'fecha', 'hora', 'enlace'),
+    ),
+    'rechazo': (
+        'Tu solicitud de cita fue rechazada - Sistema de Citas TECNL',
+        ('nombre', 'especialista', 'fecha', 'hora', 'enlace'),
+    ),
+    'recordatorio': (
+        'Recordatorio de tu cita - Sistema de Citas TECNL',
+        ('nombre', 'especialista', 'fecha', 'hora', 'cuando', 'enlace'),
+    ),
+}
+
+DIAS = ('lunes', 'martes', 'miércoles', 'jueves', 'viernes', 'sábado', 'domingo')
+
+# Private-use code points: never produced by the templates nor touched by autoescaping
+_ABRE, _CIERRA = '\ue000', '\ue001'
+_MARCADOR = re.compile(f'{_ABRE}(\\w+){_CIERRA}')
+
+
+@lru_cache(maxsize=None)
+def compilar_plantilla(nombre, campos):
+    """Render `nombre` once with markers for `campos` and return it as a format string."""
+    salida = render_to_string(nombre, {campo: f'{_ABRE}{campo}{_CIERRA}' for campo in campos})
+    salida = salida.replace('{', '{{').replace('}', '}}')
+    shell = _MARCADOR.sub(r'{\1}', salida)
+    if _ABRE in shell or _CIERRA in shell:
+        raise ImproperlyConfigured(
+            f"La plantilla {nombre} transforma un campo por usuario; solo se admite {{{{ campo }}}}."
+        )
+    return shell
+
+
+def renderizar_correo(tipo, **valores):
+    """Return `(asunto, texto, html)` for a message type and its per-user fields."""
+    asunto, campos = TIPOS_CORREO[tipo]
+    faltantes = set(campos) - valores.keys()
+    if faltantes:
+        raise ValueError(f"Faltan campos para el correo '{tipo}': {', '.join(sorted(faltantes))}")
+    texto = compilar_plantilla(f'usuarios/emails/{tipo}.txt', campos).format_map(
+        {campo: str(valores[campo]) for campo in campos}
+    )
+    html = compilar_plantilla(f'usuarios/emails/{tipo}.html', campos).format_map(
+        {campo: escape(valores[campo]) for campo in campos}
+    )
+    return asunto, texto, html
+
+
+def construir_correo(tipo, destinatario, **valores):
+    """Unsaved CorreoSaliente for `tipo`, to be queued in bulk with `encolar_correos`."""
+    asunto, texto, html = renderizar_correo(tipo, **valores)
+    return CorreoSaliente(destinatario=destinatario, asunto=asunto, cuerpo_texto=texto, cuerpo_html=html)
+
+
+def _datos_cita(cita):
+    fecha = cita.horario.fecha
+    return {
+        'nombre': cita.alumno.first_name,
+        'especialista': cita.especialista.get_full_name(),
+        'fecha': f"{DIAS[fecha.weekday()]} {fecha:%d/%m/%Y}",
+        'hora': f"{cita.horario.hora_inicio:%H:%M}",
+    }
+
+
 def send_verification_email(user):
-    """Send email verification link to user"""
+    """Queue the email verification link for the user"""
     token = account_activation_token.make_token(user)
     uid = urlsafe_base64_encode(force_bytes(user.pk))
-    
-    verification_link = f"{settings.FRONTEND_URL}/verify-email/{uid}/{token}"
-    
-    subject = 'Verifica tu cuenta - Sistema de Citas TECNL'
-    
-    # HTML email with improved design
-    html_message = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <style>
-            body {{
-                font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
-                background-color: #f3f4f6;
-                margin: 0;
-                padding: 0;
-                line-height: 1.6;
-            }}
-            .email-wrapper {{
-                max-width: 600px;
-                margin: 0 auto;
-                background-color: #f3f4f6;
-                padding: 20px;
-            }}
-            .email-container {{
-                background: #ffffff;
-                border-radius: 12px;
-                overflow: hidden;
-                box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-            }}
-            .header {{
-                background: linear-gradient(135deg, #2563eb 0%, #1d4ed8 100%);
-                color: white;
-                padding: 40px 30px;
-                text-align: center;
-            }}
-            .header h1 {{
-                margin: 0;
-                font-size: 28px;
-                font-weight: 600;
-            }}
-            .header-icon {{
-                font-size: 48px;
-                margin-bottom: 10px;
-            }}
-            .content {{
-                padding: 40px 30px;
-                color: #374151;
-            }}
-            .content p {{
-                margin: 0 0 16px 0;
-                font-size: 16px;
-            }}
-            .button-container {{
-                text-align: center;
-                margin: 35px 0;
-            }}
-            .verify-button {{
-                display: inline-block;
-                background: linear-gradient(135deg, #2563eb 0%, #1d4ed8 100%);
-                color: #ffffff !important;
-                padding: 16px 40px;
-                text-decoration: none;
-                border-radius: 8px;
-                font-size: 18px;
-                font-weight: 600;
-                box-shadow: 0 4px 12px rgba(37, 99, 235, 0.4);
-                transition: all 0.3s ease;
-            }}
-            .verify-button:hover {{
-                box-shadow: 0 6px 16px rgba(37, 99, 235, 0.5);
-                transform: translateY(-2px);
-            }}
-            .link-section {{
-                background-color: #f9fafb;
-                border-left: 4px solid #2563eb;
-                padding: 20px;
-                margin: 25px 0;
-                border-radius: 6px;
-            }}
-            .link-section p {{
-                margin: 0 0 10px 0;
-                font-size: 14px;
-                color: #6b7280;
-            }}
-            .link-text {{
-                font-size: 12px;
-                color: #2563eb;
-                word-break: break-all;
-                font-family: 'Courier New', monospace;
-                background: #eff6ff;
-                padding: 10px;
-                border-radius: 4px;
-                display: block;
-            }}
-            .warning-box {{
-                background-color: #fef2f2;
-                border-left: 4px solid #ef4444;
-                padding: 16px;
-                margin: 25px 0;
-                border-radius: 6px;
-            }}
-            .warning-box p {{
-                margin: 0;
-                font-size: 14px;
-                color: #991b1b;
-            }}
-            .footer {{
-                background: #f9fafb;
-                padding: 30px;
-                text-align: center;
-                border-top: 1px solid #e5e7eb;
-            }}
-            .footer p {{
-                margin: 5px 0;
-                font-size: 13px;
-                color: #6b7280;
-            }}
-            .footer strong {{
-                color: #374151;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="email-wrapper">
-            <div class="email-container">
-                <div class="header">
-                    <div class="header-icon">📧</div>
-                    <h1>Verifica tu correo electrónico</h1>
-                </div>
-                
-                <div class="content">
-                    <p>Hola <strong>{user.first_name}</strong>,</p>
-                    
-                    <p>¡Bienvenido al Sistema de Citas de TECNL! 🎉</p>
-                    
-                    <p>Para completar tu registro y poder acceder al sistema, necesitamos verificar tu correo electrónico. Haz clic en el botón de abajo:</p>
-                    
-                    <div class="button-container">
-                        <a href="{verification_link}" class="verify-button">✓ Verificar mi correo</a>
-                    </div>
-                    
-                    <div class="link-section">
-                        <p><strong>¿No puedes hacer clic en el botón?</strong></p>
-                        <p>Copia y pega el siguiente enlace en tu navegador:</p>
-                        <span class="link-text">{verification_link}</span>
-                    </div>
-                    
-                    <div class="warning-box">
-                        <p><strong>⚠️ Importante:</strong> Este enlace expirará en 24 horas por seguridad.</p>
-                    </div>
-                    
-                    <p style="margin-top: 30px; font-size: 14px; color: #6b7280;">
-                        Si no creaste esta cuenta, puedes ignorar este correo de forma segura.
-                    </p>
-                </div>
-                
-                <div class="footer">
-                    <p><strong>Sistema de Citas Psicológicas - TECNL</strong></p>
-                    <p>Este es un correo automático, por favor no responder.</p>
-                </div>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    plain_message = f"""
-    Hola {user.first_name},
-    
-    ¡Bienvenido al Sistema de Citas de TECNL!
-    
-    Para verificar tu correo electrónico, visita el siguiente enlace:
-    {verification_link}
-    
-    Este enlace expirará en 24 horas.
-    
-    Si no creaste esta cuenta, puedes ignorar este correo.
-    
-    ---
-    Sistema de Citas Psicológicas - TECNL
-    """
-    
-    send_mail(
-        subject,
-        plain_message,
-        settings.DEFAULT_FROM_EMAIL,
-        [user.email],
-        html_message=html_message,
-        fail_silently=False,
+    asunto, texto, html = renderizar_correo(
+        'verificacion',
+        nombre=user.first_name,
+        enlace=f"{settings.FRONTEND_URL}/verify-email/{uid}/{token}",
+    )
+    # Delivered asynchronously by `manage.py enviar_correos`
+    encolar_correo(user.email, asunto, texto, html)
+
+
+def send_appointment_confirmed_email(cita):
+    asunto, texto, html = renderizar_correo(
+        'confirmacion', enlace=f"{settings.FRONTEND_URL}/student", **_datos_cita(cita)
+    )
+    encolar_correo(cita.alumno.email, asunto, texto, html)
+
+
+def send_appointment_rejected_email(cita):
+    asunto, texto, html = renderizar_correo(
+        'rechazo', enlace=f"{settings.FRONTEND_URL}/student/book", **_datos_cita(cita)
+    )
+    encolar_correo(cita.alumno.email, asunto, texto, html)
+
+
+def appointment_reminder_email(cita, cuando):
+    """Unsaved reminder for `cita`; `cuando` completes "tienes una cita ..." (e.g. "mañana")."""
+    return construir_correo(
+        'recordatorio', cita.alumno.email,
+        cuando=cuando, enlace=f"{settings.FRONTEND_URL}/student", **_datos_cita(cita)
     )
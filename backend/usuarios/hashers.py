@@ -0,0 +1,35 @@
+"""
+Password hashers whose cost comes from settings.
+
+Which one is preferred is chosen by PASSWORD_HASHER_PROFILE. The other one stays in
+PASSWORD_HASHERS, so existing hashes keep verifying and are rehashed with the
+preferred hasher and cost on the user's next login (Usuario.check_password).
+`manage.py bench_login` measures registration and login at a given cost.
+"""
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher
+
+
+class Argon2Ajustado(Argon2PasswordHasher):
+    """Argon2id with PASSWORD_ARGON2_TIME_COST / _MEMORY_COST (KiB) / _PARALLELISM."""
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class PBKDF2Ajustado(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with PASSWORD_PBKDF2_ITERATIONS, or Django's default when unset."""
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS or PBKDF2PasswordHasher.iterations
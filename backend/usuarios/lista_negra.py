@@ -0,0 +1,252 @@
+"""
+Refresh-token blacklist (rest_framework_simplejwt.token_blacklist) with an in-memory front.
+
+Every refresh token is checked against the blacklist. Each process keeps a Bloom
+filter of the blacklisted jtis, so a token that was never blacklisted (every
+legitimate refresh) is accepted without a query. Only filter hits, meaning
+blacklisted tokens and about FALSO_POSITIVO of the rest, go on to the indexed
+jti lookup.
+
+The filter must know about tokens blacklisted by other processes. Each
+blacklisting increments a generation counter in the shared cache. Before a check,
+a process whose generation is behind reads only the rows newer than the last one
+it loaded. A missing counter (evicted or never set) tells nothing about what
+was blacklisted meanwhile, so it is recreated with a fresh value and the new
+rows are read again. `purgar_tokens` changes the epoch instead, and the
+processes rebuild the filter without the pruned rows.
+
+The counter only works in a cache every process sees (REDIS_CACHE_URL or
+CACHE_DIR). With the default local-memory cache a process would never hear of
+the others' blacklistings, so the front is off and every refresh token is looked
+up in the database.
+"""
+
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .models import Usuario
+
+FALSO_POSITIVO = 0.001
+CLAVE_GENERACION = 'jwt:lista_negra:generacion'
+CLAVE_EPOCA = 'jwt:lista_negra:epoca'
+LOTE_CARGA = 20000
+
+
+def _cache():
+    return caches[settings.AUTH_CACHE_ALIAS]
+
+
+def _cache_compartida():
+    return not isinstance(_cache(), (LocMemCache, DummyCache))
+
+
+class FiltroBloom:
+    def __init__(self, capacidad, falso_positivo=FALSO_POSITIVO):
+        self.capacidad = capacidad
+        self.bits = max(8, int(-capacidad * math.log(falso_positivo) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacidad * math.log(2)))
+        self.tabla = bytearray((self.bits + 7) // 8)
+        self.elementos = 0
+
+    def _posiciones(self, jti):
+        # simplejwt jtis are uuid4 hex: already uniformly random, so they are split
+        # into the two hashes of the double-hashing scheme without hashing again
+        try:
+            valor = int(jti, 16)
+        except ValueError:
+            valor = int.from_bytes(hashlib.blake2b(jti.encode(), digest_size=16).digest(), 'big')
+        h1, h2 = valor & 0xFFFFFFFFFFFFFFFF, (valor >> 64) | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def agregar(self, jti):
+        for posicion in self._posiciones(jti):
+            self.tabla[posicion >> 3] |= 1 << (posicion & 7)
+        self.elementos += 1
+
+    def __contains__(self, jti):
+        return all(self.tabla[posicion >> 3] & (1 << (posicion & 7)) for posicion in self._posiciones(jti))
+
+
+class FrenteListaNegra:
+    """Per-process Bloom front of the BlacklistedToken table, kept in sync through the shared cache."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filtro = None
+        self._ultimo_id = 0
+        self._generacion = None
+        self._epoca = None
+
+    def puede_estar(self, jti):
+        """False only if `jti` is certainly not blacklisted."""
+        if not _cache_compartida():
+            return True
+        generacion, epoca = self._versiones()
+        if self._filtro is None or generacion is None or epoca != self._epoca or generacion != self._generacion:
+            with self._lock:
+                if generacion is None:
+                    # Started before the rows are read, so a blacklisting in between
+                    # still moves the generation past ours
+                    generacion = _iniciar_generacion()
+                    self._generacion = None
+                if self._filtro is None or epoca != self._epoca:
+                    self._reconstruir()
+                    self._epoca = epoca
+                elif generacion != self._generacion:
+                    self._cargar_nuevos()
+                self._generacion = generacion
+        return jti in self._filtro
+
+    def agregar(self, jti):
+        # Known here right away; the other processes learn it from the generation
+        with self._lock:
+            if self._filtro is not None:
+                self._filtro.agregar(jti)
+        transaction.on_commit(self._publicar)
+
+    def _publicar(self):
+        generacion = _nueva_generacion()
+        with self._lock:
+            # Nobody else blacklisted anything since our last sync: nothing to load
+            if self._generacion is not None and generacion == self._generacion + 1:
+                self._generacion = generacion
+
+    def _versiones(self):
+        valores = _cache().get_many([CLAVE_GENERACION, CLAVE_EPOCA])
+        return valores.get(CLAVE_GENERACION), valores.get(CLAVE_EPOCA, 0)
+
+    def _reconstruir(self):
+        total = BlacklistedToken.objects.count()
+        self._filtro = FiltroBloom(max(total * 2, settings.JWT_BLACKLIST_BLOOM_CAPACITY))
+        self._ultimo_id = 0
+        self._cargar_nuevos()
+
+    def _cargar_nuevos(self):
+        while True:
+            filas = list(
+                BlacklistedToken.objects.filter(id__gt=self._ultimo_id)
+                .order_by('id').values_list('id', 'token__jti')[:LOTE_CARGA]
+            )
+            for _, jti in filas:
+                self._filtro.agregar(jti)
+            if filas:
+                self._ultimo_id = filas[-1][0]
+            if len(filas) < LOTE_CARGA:
+                break
+        if self._filtro.elementos > self._filtro.capacidad:
+            # Past its capacity the false-positive rate climbs: rebuild larger on the next check
+            self._epoca = None
+
+    def reiniciar(self):
+        with self._lock:
+            self._filtro = None
+
+
+def _iniciar_generacion():
+    """Recreate a missing generation counter with a value no process has synced to."""
+    cache = _cache()
+    cache.add(CLAVE_GENERACION, time.time_ns(), timeout=None)
+    return cache.get(CLAVE_GENERACION)
+
+
+def _nueva_generacion():
+    try:
+        return _cache().incr(CLAVE_GENERACION)
+    except ValueError:
+        return _iniciar_generacion()
+
+
+def nueva_epoca():
+    """Make every process rebuild its filter (after rows were deleted)."""
+    _cache().set(CLAVE_EPOCA, time.time_ns(), timeout=None)
+
+
+frente = FrenteListaNegra()
+
+
+class RefreshTokenConFrente(RefreshToken):
+    """
+    RefreshToken whose blacklist check skips the database for never-blacklisted jtis.
+
+    Rotation also writes less. The outstanding row is inserted with the user's id
+    (no user SELECT) in a single INSERT ... ON CONFLICT DO NOTHING. Blacklisting a
+    token that is already blacklisted fails, so two concurrent refreshes with the
+    same token cannot both succeed.
+    """
+
+    def check_blacklist(self):
+        if frente.puede_estar(self.payload[jwt_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+    def _usuario_id(self):
+        usuario_id = self.payload.get(jwt_settings.USER_ID_CLAIM)
+        return Usuario._meta.pk.to_python(usuario_id) if usuario_id is not None else None
+
+    def outstand(self):
+        OutstandingToken.objects.bulk_create([OutstandingToken(
+            jti=self.payload[jwt_settings.JTI_CLAIM],
+            user_id=self._usuario_id(),
+            created_at=self.current_time,
+            token=str(self),
+            expires_at=datetime_from_epoch(self.payload['exp']),
+        )], ignore_conflicts=True)
+
+    def blacklist(self):
+        jti = self.payload[jwt_settings.JTI_CLAIM]
+        outstanding = OutstandingToken.objects.filter(jti=jti).values_list('id', flat=True)
+        with transaction.atomic(savepoint=False):
+            token_id = outstanding.first()
+            if token_id is None:
+                # Issued before the blacklist app was installed
+                self.outstand()
+                token_id = outstanding.first()
+            try:
+                with transaction.atomic():
+                    blacklisted = BlacklistedToken.objects.create(token_id=token_id)
+            except IntegrityError:
+                raise TokenError("El token ya fue usado.")
+            frente.agregar(jti)
+        return blacklisted, True
+
+
+def purgar_expirados(lote=5000, pausa=0.0, ahora=None):
+    """
+    Delete expired outstanding tokens (and their blacklist rows) in chunks of `lote`.
+
+    Each chunk is its own short transaction, with `pausa` seconds between chunks, so
+    logins and refreshes are never blocked for long. Returns `(outstanding,
+    blacklisted)` deleted counts.
+    """
+    ahora = ahora or timezone.now()
+    total_outstanding = total_blacklisted = 0
+    while True:
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=ahora).values_list('id', flat=True)[:lote]
+        )
+        if not ids:
+            break
+        with transaction.atomic():
+            total_blacklisted += BlacklistedToken.objects.filter(token_id__in=ids).delete()[0]
+            total_outstanding += OutstandingToken.objects.filter(id__in=ids).delete()[0]
+        if len(ids) < lote:
+            break
+        if pausa:
+            time.sleep(pausa)
+    if total_blacklisted:
+        # The filters still hold the deleted jtis: rebuild them smaller
+        nueva_epoca()
+    return total_outstanding, total_blacklisted
@@ -0,0 +1,70 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from citas.benchmarks import sembrar_usuarios
+from sistema_citas.benchmarks import base_de_datos_temporal, percentiles
+from usuarios.authentication import ClaimsJWTAuthentication, claims_de_usuario
+from usuarios.models import Usuario
+
+
+class Command(BaseCommand):
+    help = (
+        "Authentication cost per request on a throwaway database: the stock JWTAuthentication "
+        "(one user SELECT) against ClaimsJWTAuthentication (user built from the token claims), "
+        "for authenticate() alone and for a full request to /api/notificaciones/notificaciones/no-leidas/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        with base_de_datos_temporal():
+            resultado = self.medir(options['peticiones'])
+        self.stdout.write(json.dumps(resultado, indent=2))
+
+    def medir(self, n):
+        usuario = sembrar_usuarios(1, rol=Usuario.Roles.ESPECIALISTA, prefijo='especialista')[0]
+        sin_claims = RefreshToken.for_user(usuario).access_token
+        con_claims = RefreshToken.for_user(usuario).access_token
+        for claim, valor in claims_de_usuario(usuario).items():
+            con_claims[claim] = valor
+        variantes = (
+            ('JWTAuthentication', JWTAuthentication(), sin_claims),
+            ('ClaimsJWTAuthentication', ClaimsJWTAuthentication(), con_claims),
+        )
+        resultado = {'peticiones': n}
+        for nombre, autenticacion, token in variantes:
+            cabecera = f'Bearer {token}'
+            peticion = Request(APIRequestFactory().get('/', HTTP_AUTHORIZATION=cabecera))
+            autenticacion.authenticate(peticion)  # Warm the token version cache
+
+            with CaptureQueriesContext(connection) as consultas:
+                inicio = time.perf_counter()
+                for _ in range(n):
+                    autenticacion.authenticate(peticion)
+                solo_autenticar = time.perf_counter() - inicio
+
+            # Through the API a token without claims takes the stock JWTAuthentication path
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=cabecera)
+            muestras = []
+            with CaptureQueriesContext(connection) as consultas_peticion:
+                for _ in range(n):
+                    inicio = time.perf_counter()
+                    client.get('/api/notificaciones/notificaciones/no-leidas/')
+                    muestras.append(time.perf_counter() - inicio)
+            resultado[nombre] = {
+                'authenticate_us': round(solo_autenticar / n * 1e6, 2),
+                'consultas_por_authenticate': len(consultas) / n,
+                'peticion_completa': percentiles(muestras),
+                'consultas_por_peticion': len(consultas_peticion) / n,
+            }
+        return resultado
@@ -0,0 +1,42 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+
+from usuarios.emails import TIPOS_CORREO, renderizar_correo
+
+
+class Command(BaseCommand):
+    help = (
+        "Render cost per email: a full Django template render (cached loader) against the "
+        "precompiled shells used by usuarios.emails, for every message type."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mensajes', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        n = options['mensajes']
+        resultado = {'mensajes': n, 'tipos': {}}
+        for tipo, (_, campos) in TIPOS_CORREO.items():
+            lote = [{campo: f'{campo} <{i}>' for campo in campos} for i in range(n)]
+            renderizar_correo(tipo, **lote[0])  # Compile outside the timed loop
+
+            inicio = time.perf_counter()
+            for valores in lote:
+                render_to_string(f'usuarios/emails/{tipo}.txt', valores)
+                render_to_string(f'usuarios/emails/{tipo}.html', valores)
+            plantilla = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            for valores in lote:
+                renderizar_correo(tipo, **valores)
+            compilada = time.perf_counter() - inicio
+
+            resultado['tipos'][tipo] = {
+                'plantilla_us_por_mensaje': round(plantilla / n * 1e6, 2),
+                'compilada_us_por_mensaje': round(compilada / n * 1e6, 2),
+                'aceleracion': round(plantilla / compilada, 1),
+            }
+        self.stdout.write(json.dumps(resultado, indent=2))
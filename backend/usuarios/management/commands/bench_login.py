@@ -0,0 +1,94 @@
+import json
+import time
+from importlib.util import find_spec
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from citas.benchmarks import cliente, fase, medir_peticion
+from sistema_citas.benchmarks import base_de_datos_temporal, percentiles
+from usuarios.models import Usuario
+
+HASHERS = {
+    'argon2': 'usuarios.hashers.Argon2Ajustado',
+    'pbkdf2': 'usuarios.hashers.PBKDF2Ajustado',
+}
+
+
+def perfil(especificacion):
+    """'pbkdf2:600000' or 'argon2:<time_cost>:<memory_cost KiB>:<parallelism>' → settings overrides."""
+    nombre, *costos = especificacion.split(':')
+    if nombre == 'pbkdf2' and len(costos) <= 1:
+        ajustes = {'PASSWORD_PBKDF2_ITERATIONS': int(costos[0]) if costos else None}
+    elif nombre == 'argon2' and len(costos) in (0, 3):
+        claves = ('PASSWORD_ARGON2_TIME_COST', 'PASSWORD_ARGON2_MEMORY_COST', 'PASSWORD_ARGON2_PARALLELISM')
+        ajustes = dict(zip(claves, map(int, costos)))
+    else:
+        raise CommandError(f"Perfil no válido: {especificacion}")
+    preferido = HASHERS[nombre]
+    ajustes['PASSWORD_HASHERS'] = [preferido, *(h for h in HASHERS.values() if h != preferido)]
+    return nombre, ajustes
+
+
+class Command(BaseCommand):
+    help = (
+        "Registration and login under concurrency for each password hasher profile, on a throwaway "
+        "database: hash time on one thread, then register and login phases with latency percentiles "
+        "and requests per second. Profiles: pbkdf2[:iterations] or argon2[:time:memory_kib:parallelism]."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'perfiles', nargs='*', default=['pbkdf2:1000000', 'pbkdf2:600000', 'argon2:2:19456:1', 'argon2:3:65536:4'],
+        )
+        parser.add_argument('--usuarios', type=int, default=200)
+        parser.add_argument('--hilos', type=int, default=8)
+
+    def handle(self, *args, **options):
+        perfiles = [perfil(especificacion) for especificacion in options['perfiles']]
+        resultado = {'usuarios': options['usuarios'], 'hilos': options['hilos']}
+        with base_de_datos_temporal():
+            for numero, (especificacion, (nombre, ajustes)) in enumerate(zip(options['perfiles'], perfiles)):
+                if nombre == 'argon2' and not find_spec('argon2'):
+                    self.stderr.write(f"{especificacion}: argon2-cffi no está instalado, se omite")
+                    continue
+                with override_settings(**ajustes):
+                    resultado[especificacion] = self.medir(numero, options['usuarios'], options['hilos'])
+        self.stdout.write(json.dumps(resultado, indent=2))
+
+    def medir(self, numero, n, hilos):
+        password = 'Benchmark-2024'
+        muestras = []
+        for _ in range(10):
+            inicio = time.perf_counter()
+            make_password(password)
+            muestras.append(time.perf_counter() - inicio)
+
+        prefijo = f'login{numero}x'
+        participantes = [
+            {'email': f'{prefijo}{i}@tecnl.mx', 'client': cliente(numero * n + i)} for i in range(n)
+        ]
+
+        def registrar(participante):
+            resultado = medir_peticion(participante['client'], 'post', '/api/auth/register/', {
+                'email': participante['email'], 'first_name': 'Login', 'last_name': participante['email'],
+                'password': password,
+            })
+            assert resultado[0].status_code == 201, resultado[0].data
+            return resultado
+
+        def iniciar_sesion(participante):
+            resultado = medir_peticion(participante['client'], 'post', '/api/auth/login/', {
+                'email': participante['email'], 'password': password,
+            })
+            assert resultado[0].status_code == 200, resultado[0].data
+            return resultado
+
+        registro = fase(registrar, participantes, hilos)
+        Usuario.objects.filter(email__startswith=prefijo).update(email_verified=True)
+        return {
+            'hash': percentiles(muestras),
+            'register': registro,
+            'login': fase(iniciar_sesion, participantes, hilos),
+        }
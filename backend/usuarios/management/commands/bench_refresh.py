@@ -0,0 +1,111 @@
+import json
+import tempfile
+import time
+from datetime import timedelta
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.views import TokenRefreshView
+
+from citas.benchmarks import sembrar_usuarios
+from sistema_citas.benchmarks import base_de_datos_temporal, percentiles
+from usuarios.authentication import VersionedTokenRefreshSerializer
+from usuarios.lista_negra import frente
+from usuarios.serializers import MyTokenObtainPairSerializer
+
+LOTE = 20000
+CONTROL = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+
+
+class Command(BaseCommand):
+    help = (
+        "Throughput of /api/auth/refresh/ (rotation + blacklisting) on a throwaway database that "
+        "already holds N blacklisted tokens: simplejwt's stock serializer, which queries the blacklist "
+        "on every refresh, against the Bloom-fronted VersionedTokenRefreshSerializer. The front needs a "
+        "shared cache, so the run uses a throwaway file cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lista-negra', type=int, default=1_000_000, help="Blacklisted tokens to seed.")
+        parser.add_argument('--refrescos', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory(prefix='bench_') as directorio, override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directorio,
+        }}), base_de_datos_temporal():
+            resultado = self.medir(options['lista_negra'], options['refrescos'])
+        self.stdout.write(json.dumps(resultado, indent=2))
+
+    def sembrar(self, n):
+        """N outstanding + blacklisted rows, inserted with executemany in batches."""
+        expira = connection.ops.adapt_datetimefield_value(timezone.now() + timedelta(days=1))
+        ahora = connection.ops.adapt_datetimefield_value(timezone.now())
+        outstanding = OutstandingToken._meta.db_table
+        blacklisted = BlacklistedToken._meta.db_table
+        with transaction.atomic(), connection.cursor() as cursor:
+            for inicio in range(1, n + 1, LOTE):
+                ids = range(inicio, min(inicio + LOTE, n + 1))
+                cursor.executemany(
+                    f'INSERT INTO {outstanding} (id, jti, token, created_at, expires_at) VALUES (%s, %s, %s, %s, %s)',
+                    [(i, uuid4().hex, '', ahora, expira) for i in ids],
+                )
+                cursor.executemany(
+                    f'INSERT INTO {blacklisted} (id, token_id, blacklisted_at) VALUES (%s, %s, %s)',
+                    [(i, i, ahora) for i in ids],
+                )
+
+    def medir(self, n_lista_negra, n_refrescos):
+        inicio = time.perf_counter()
+        self.sembrar(n_lista_negra)
+        resultado = {
+            'tokens_en_lista_negra': n_lista_negra,
+            'refrescos': n_refrescos,
+            'segundos_sembrando': round(time.perf_counter() - inicio, 1),
+        }
+        usuario = sembrar_usuarios(1)[0]
+        factory = APIRequestFactory()
+
+        frente.reiniciar()
+        inicio = time.perf_counter()
+        frente.puede_estar(uuid4().hex)
+        resultado['filtro'] = {
+            'segundos_cargando': round(time.perf_counter() - inicio, 2),
+            'bytes': len(frente._filtro.tabla),
+            'hashes': frente._filtro.hashes,
+            'falsos_positivos': sum(frente.puede_estar(uuid4().hex) for _ in range(100000)) / 100000,
+        }
+
+        for nombre, serializer_class in (
+            ('TokenRefreshSerializer', TokenRefreshSerializer),
+            ('VersionedTokenRefreshSerializer', VersionedTokenRefreshSerializer),
+        ):
+            vista = TokenRefreshView.as_view(serializer_class=serializer_class)
+            refresh = str(MyTokenObtainPairSerializer.get_token(usuario))
+            muestras = []
+            consultas = {'consultas': 0, 'control_de_transaccion': 0}
+
+            def contar(execute, sql, params, many, context):
+                consultas['control_de_transaccion' if sql.lstrip().upper().startswith(CONTROL) else 'consultas'] += 1
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(contar):
+                total = time.perf_counter()
+                for _ in range(n_refrescos):
+                    inicio = time.perf_counter()
+                    response = vista(factory.post('/api/auth/refresh/', {'refresh': refresh}, format='json'))
+                    muestras.append(time.perf_counter() - inicio)
+                    assert response.status_code == 200, response.data
+                    refresh = response.data['refresh']
+                total = time.perf_counter() - total
+            resultado[nombre] = {
+                'refrescos_por_segundo': round(n_refrescos / total, 1),
+                'latencia': percentiles(muestras),
+                **{f'{clave}_por_refresco': round(valor / n_refrescos, 2) for clave, valor in consultas.items()},
+            }
+        return resultado
@@ -0,0 +1,71 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from citas.benchmarks import cliente, fase, medir_peticion
+from sistema_citas.benchmarks import base_de_datos_temporal, percentiles
+from usuarios.models import Usuario
+from usuarios.usernames import siguiente_username
+
+NOMBRES = [('Juan', 'García'), ('María', 'Hernández'), ('José', 'López'), ('Ana', 'Martínez'), ('Luis', 'Pérez')]
+
+
+def username_con_bucle(base):
+    """The allocator this replaced: one exists() per namesake."""
+    username = base
+    contador = 1
+    while Usuario.objects.filter(username=username).exists():
+        username = f"{base}{contador}"
+        contador += 1
+    return username
+
+
+class Command(BaseCommand):
+    help = (
+        "Registers N users sharing a few common names through /api/auth/register/ on a throwaway "
+        "database, then times picking the next free username with the single-query allocator "
+        "against the old exists() loop. Passwords use a fast hasher so only allocation is measured."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=10000)
+        parser.add_argument('--hilos', type=int, default=8)
+
+    def handle(self, *args, **options):
+        with base_de_datos_temporal(), override_settings(
+            PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+        ):
+            resultado = self.medir(options['usuarios'], options['hilos'])
+        self.stdout.write(json.dumps(resultado, indent=2))
+
+    def medir(self, n, hilos):
+        participantes = [
+            {'numero': i, 'client': cliente(i), 'nombre': NOMBRES[i % len(NOMBRES)]} for i in range(n)
+        ]
+
+        def registrar(participante):
+            first_name, last_name = participante['nombre']
+            resultado = medir_peticion(participante['client'], 'post', '/api/auth/register/', {
+                'email': f"homonimo{participante['numero']}@tecnl.mx", 'first_name': first_name,
+                'last_name': last_name, 'password': 'Benchmark-2024',
+            })
+            assert resultado[0].status_code == 201, resultado[0].data
+            return resultado
+
+        resultado = {'usuarios': n, 'nombres': len(NOMBRES), 'register': fase(registrar, participantes, hilos)}
+        resultado['usernames_distintos'] = Usuario.objects.values('username').distinct().count()
+
+        base = f"{NOMBRES[0][0]}.{NOMBRES[0][1]}".lower()
+        for nombre, asignar in (('siguiente_username', siguiente_username), ('bucle_exists', username_con_bucle)):
+            muestras = []
+            for _ in range(5):
+                inicio = time.perf_counter()
+                siguiente = asignar(base)
+                muestras.append(time.perf_counter() - inicio)
+            resultado[nombre] = {'siguiente': siguiente, 'latencia': percentiles(muestras)}
+        resultado['plan'] = Usuario.objects.filter(
+            username__gte=base, username__lt=f'{base}:',
+        ).values('username').explain()
+        return resultado
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from usuarios.lista_negra import purgar_expirados
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes expired refresh tokens from the outstanding and blacklist tables in chunks. "
+        "Schedule it (e.g. daily cron); it replaces simplejwt's single-statement flushexpiredtokens."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=5000, help="Rows per DELETE.")
+        parser.add_argument('--pausa', type=float, default=0.0, help="Seconds to sleep between chunks.")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        outstanding, blacklisted = purgar_expirados(options['lote'], options['pausa'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{outstanding} tokens expirados eliminados ({blacklisted} en la lista negra) "
+            f"en {time.perf_counter() - inicio:.2f} s"
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0002_usuario_email_verified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='token_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0.2 on 2026-10-17 20:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Index for `purgar_tokens`, which deletes expired rows of simplejwt's outstanding token table."""
+
+    dependencies = [
+        ('usuarios', '0003_token_version'),
+        ('token_blacklist', '0013_alter_blacklistedtoken_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS outstandingtoken_expires_idx '
+            'ON token_blacklist_outstandingtoken (expires_at)',
+            'DROP INDEX IF EXISTS outstandingtoken_expires_idx',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 20:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0004_outstandingtoken_expires_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.contrib.auth.hashers import check_password, make_password
 from django.contrib.auth.models import AbstractUser
 
 class Usuario(AbstractUser):
@@ -17,8 +18,59 @@ class Usuario(AbstractUser):
     departamento = models.ForeignKey('departamentos.Departamento', on_delete=models.SET_NULL, null=True, blank=True, related_name='especialistas')
     cedula = models.CharField(max_length=50, blank=True, null=True)
 
+    # Copied into every access token (MyTokenObtainPairSerializer). Changing any of
+    # them, or the password, bumps token_version, which revokes the tokens issued before.
+    token_version = models.PositiveIntegerField(default=0)
+    # Appointment and slot lists render the users' names and contact details inline,
+    # so their ETags (sistema_citas.condicional) include this
+    updated_at = models.DateTimeField(auto_now=True)
+    CLAIMS = ('email', 'rol', 'first_name', 'last_name', 'is_staff', 'is_active', 'email_verified')
+
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 
+    _claims_cargados = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._claims_cargados = instance._valores_claims()
+        return instance
+
+    def _valores_claims(self):
+        return tuple(self.__dict__.get(campo) for campo in self.CLAIMS)
+
+    def set_password(self, raw_password):
+        super().set_password(raw_password)
+        self.token_version += 1
+
+    def check_password(self, raw_password):
+        # Rehashing with the preferred hasher or cost (usuarios.hashers) keeps the same
+        # password: write only that column and leave token_version alone.
+        def rehash(raw_password):
+            self.password = make_password(raw_password)
+            self._password = None
+            type(self)._default_manager.filter(pk=self.pk).update(password=self.password)
+
+        return check_password(raw_password, self.password, rehash)
+
+    def save(self, *args, **kwargs):
+        if self._claims_cargados is not None and self._valores_claims() != self._claims_cargados:
+            self.token_version += 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'token_version', 'updated_at'}
+        super().save(*args, **kwargs)
+        self._claims_cargados = self._valores_claims()
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # A user built from token claims (usuarios.authentication) fills the fields
+        # it lacks from the per-process user cache instead of one query per field.
+        if getattr(self, '_desde_token', False) and from_queryset is None:
+            from .authentication import completar_desde_cache
+            completar_desde_cache(self)
+            return
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.rol})"
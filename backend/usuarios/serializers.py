@@ -1,6 +1,11 @@
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from .authentication import claims_de_usuario
+from .lista_negra import RefreshTokenConFrente
+from .usernames import USERNAME_ATTEMPTS, USERNAME_BASE_MAX_LENGTH, siguiente_username
 from .emails import send_verification_email
 
 Usuario = get_user_model()
@@ -22,44 +27,65 @@ class UsuarioSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         # Auto-generate username from first_name + last_name if not provided
+        base_username = None
         if not validated_data.get('username'):
             first = validated_data.get('first_name', '').lower().replace(' ', '')
             last = validated_data.get('last_name', '').lower().replace(' ', '')
-            base_username = f"{first}.{last}"
-            
-            # Ensure uniqueness by appending a number if needed
-            username = base_username
-            counter = 1
-            while Usuario.objects.filter(username=username).exists():
-                username = f"{base_username}{counter}"
-                counter += 1
-            
-            validated_data['username'] = username
+            base_username = f"{first}.{last}"[:USERNAME_BASE_MAX_LENGTH]
         
         # Default role is ALUMNO if not specified
         validated_data['rol'] = Usuario.Roles.ALUMNO
-        user = Usuario.objects.create_user(**validated_data)
-        
-        # Send verification email
-        try:
-            send_verification_email(user)
-        except Exception as e:
-            # Log error but don't fail registration
-            print(f"⚠️ Error sending verification email: {e}")
-            # In production, you might want to log this to a monitoring service
-        
-        return user
+        # Same as create_user, but hashing first: inside the transaction the write lock
+        # (BEGIN IMMEDIATE on SQLite) would be held for the whole hash
+        password = make_password(validated_data.pop('password'))
+        validated_data['email'] = Usuario.objects.normalize_email(validated_data['email'])
+        for intento in range(1, USERNAME_ATTEMPTS + 1):
+            try:
+                with transaction.atomic():
+                    if base_username is not None:
+                        validated_data['username'] = siguiente_username(base_username)
+                    validated_data['username'] = Usuario.normalize_username(validated_data['username'])
+                    user = Usuario(password=password, **validated_data)
+                    user.save()
+                    
+                    # Queue the verification email: one INSERT in the same transaction,
+                    # the SMTP round-trip happens in the enviar_correos worker
+                    send_verification_email(user)
+            except IntegrityError:
+                # A concurrent registration got past the unique validators first
+                duplicados = self._duplicados(validated_data, base_username is None)
+                if duplicados:
+                    raise serializers.ValidationError(duplicados)
+                # On PostgreSQL it can take the generated name between the lookup
+                # and the INSERT (SQLite serializes them): pick again
+                if base_username is None or intento == USERNAME_ATTEMPTS:
+                    raise
+                continue
+            return user
+
+    def _duplicados(self, validated_data, username_elegido):
+        """Errors for the unique fields already taken; a generated username is left to the retry."""
+        duplicados = {}
+        if Usuario.objects.filter(email=validated_data['email']).exists():
+            duplicados['email'] = ["Ya existe un usuario con este correo."]
+        if validated_data.get('matricula') and Usuario.objects.filter(matricula=validated_data['matricula']).exists():
+            duplicados['matricula'] = ["Ya existe un usuario con esta matrícula."]
+        if username_elegido and Usuario.objects.filter(username=validated_data['username']).exists():
+            duplicados['username'] = ["Ya existe un usuario con este nombre de usuario."]
+        return duplicados
 
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = RefreshTokenConFrente
+
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
 
-        # Add custom claims
-        token['email'] = user.email
-        token['rol'] = user.rol
+        # Add custom claims: enough to authenticate later requests without a query
+        # (usuarios.authentication), plus the display name the frontend shows
+        for claim, valor in claims_de_usuario(user).items():
+            token[claim] = valor
         token['full_name'] = f"{user.first_name} {user.last_name}"
-        token['email_verified'] = user.email_verified
         
         return token
     
@@ -1,3 +1,296 @@
-from django.test import TestCase
+import tempfile
+from datetime import timedelta
+from importlib.util import find_spec
+from unittest import skipUnless
+from unittest.mock import patch
+from uuid import uuid4
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from django.template.loader import render_to_string
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import authentication
+from .authentication import usuario_desde_token
+from .emails import TIPOS_CORREO, renderizar_correo
+from .lista_negra import CLAVE_GENERACION, FiltroBloom, _nueva_generacion, frente, purgar_expirados
+from .models import Usuario
+from .serializers import UsuarioSerializer
+from .usernames import siguiente_username
+
+
+class CorreoPlantillaTests(SimpleTestCase):
+    def test_coincide_con_el_render_completo(self):
+        for tipo, (_, campos) in TIPOS_CORREO.items():
+            valores = {campo: f'<{campo}> & "{{x}}"' for campo in campos}
+            _, texto, html = renderizar_correo(tipo, **valores)
+            self.assertEqual(html, render_to_string(f'usuarios/emails/{tipo}.html', valores))
+            self.assertEqual(texto, render_to_string(f'usuarios/emails/{tipo}.txt', valores))
+
+    def test_texto_sin_escapar(self):
+        _, texto, html = renderizar_correo('verificacion', nombre='Ana & Luis', enlace='http://x/?a=1&b=2')
+        self.assertIn('Hola Ana & Luis', texto)
+        self.assertIn('http://x/?a=1&amp;b=2', html)
+
+    def test_campo_faltante(self):
+        with self.assertRaises(ValueError):
+            renderizar_correo('rechazo', nombre='Ana')
+
+
+class AutenticacionPorClaimsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        authentication._usuarios.clear()
+        self.usuario = Usuario.objects.create_user(
+            username='ana', email='ana@tecnl.mx', password='Secreta-123', first_name='Ana',
+            last_name='Ruiz', rol=Usuario.Roles.ESPECIALISTA, email_verified=True, matricula='E0001',
+        )
+
+    def _login(self):
+        response = APIClient().post('/api/auth/login/', {'email': 'ana@tecnl.mx', 'password': 'Secreta-123'})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def _get(self, access, url='/api/citas/citas/'):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        return client.get(url)
+
+    def test_autenticar_no_consulta_al_usuario(self):
+        access = self._login()['access']
+        self.assertEqual(self._get(access).status_code, 200)
+        # Only the list's own fingerprint and page queries
+        with self.assertNumQueries(2):
+            self.assertEqual(self._get(access).status_code, 200)
+
+    def test_campos_fuera_del_token_salen_de_la_cache(self):
+        token = AccessToken(self._login()['access'])
+        with self.assertNumQueries(1):
+            self.assertEqual(usuario_desde_token(token).matricula, 'E0001')
+        with self.assertNumQueries(0):
+            usuario = usuario_desde_token(token)
+            self.assertEqual((usuario.rol, usuario.matricula), (Usuario.Roles.ESPECIALISTA, 'E0001'))
+            self.assertEqual(usuario, self.usuario)
+
+    def test_cambiar_el_rol_revoca_los_tokens(self):
+        tokens = self._login()
+        self.assertEqual(self._get(tokens['access']).status_code, 200)
+        usuario = Usuario.objects.get(pk=self.usuario.pk)
+        usuario.rol = Usuario.Roles.ALUMNO
+        usuario.save(update_fields=['rol'])
+        self.assertEqual(self._get(tokens['access']).status_code, 401)
+        response = APIClient().post('/api/auth/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self._get(self._login()['access']).status_code, 200)
+
+    def test_cambiar_la_contrasena_revoca_los_tokens(self):
+        access = self._login()['access']
+        self.usuario.set_password('Otra-clave-456')
+        self.usuario.save()
+        self.assertEqual(self._get(access).status_code, 401)
+
+    def test_tokens_sin_version_usan_la_base_de_datos(self):
+        access = RefreshToken.for_user(self.usuario).access_token
+        with self.assertNumQueries(3):
+            self.assertEqual(self._get(access).status_code, 200)
+
+
+class ListaNegraTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # The front is only on with a cache shared by the processes; a file cache stands in for Redis
+        directorio = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.enterClassContext(override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directorio,
+        }}))
+        super().setUpClass()
+
+    def setUp(self):
+        cache.clear()
+        frente.reiniciar()
+        self.usuario = Usuario.objects.create_user(
+            username='luis', email='luis@tecnl.mx', password='Secreta-123', first_name='Luis',
+            last_name='Paz', email_verified=True,
+        )
+
+    def _refresh(self, refresh):
+        return APIClient().post('/api/auth/refresh/', {'refresh': refresh})
+
+    def test_rotacion_invalida_el_token_anterior_sin_consultar_la_lista(self):
+        refresh = APIClient().post(
+            '/api/auth/login/', {'email': 'luis@tecnl.mx', 'password': 'Secreta-123'}
+        ).data['refresh']
+        # The first refresh also loads the filter and caches the token version
+        self.assertEqual(self._refresh(refresh).status_code, 200)
+        self.assertEqual(self._refresh(refresh).status_code, 401)
+
+        nuevo = APIClient().post(
+            '/api/auth/login/', {'email': 'luis@tecnl.mx', 'password': 'Secreta-123'}
+        ).data['refresh']
+        with CaptureQueriesContext(connection) as consultas:
+            response = self._refresh(nuevo)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in consultas if q['sql'].startswith('SELECT') and 'blacklistedtoken' in q['sql']])
+        self.assertEqual(self._refresh(nuevo).status_code, 401)
+        self.assertEqual(self._refresh(response.data['refresh']).status_code, 200)
+
+    def test_el_filtro_ve_lo_que_agregan_otros_procesos(self):
+        jti = uuid4().hex
+        self.assertFalse(frente.puede_estar(jti))
+        token = OutstandingToken.objects.create(jti=jti, token='x', expires_at=timezone.now() + timedelta(days=1))
+        BlacklistedToken.objects.create(token=token)
+        self.assertFalse(frente.puede_estar(jti))
+        _nueva_generacion()
+        self.assertTrue(frente.puede_estar(jti))
+
+    def _en_lista_negra(self):
+        jti = uuid4().hex
+        token = OutstandingToken.objects.create(jti=jti, token='x', expires_at=timezone.now() + timedelta(days=1))
+        BlacklistedToken.objects.create(token=token)
+        return jti
+
+    def test_generacion_perdida_recarga_de_la_base_de_datos(self):
+        _nueva_generacion()
+        self.assertFalse(frente.puede_estar(uuid4().hex))
+        # Evicted, then another process blacklists and recreates the counter
+        jti = self._en_lista_negra()
+        cache.delete(CLAVE_GENERACION)
+        _nueva_generacion()
+        self.assertTrue(frente.puede_estar(jti))
+        # Evicted before the process that blacklisted could publish
+        jti = self._en_lista_negra()
+        cache.delete(CLAVE_GENERACION)
+        self.assertTrue(frente.puede_estar(jti))
+
+    def test_sin_cache_compartida_consulta_siempre(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertTrue(frente.puede_estar(uuid4().hex))
+
+    def test_filtro_bloom(self):
+        filtro = FiltroBloom(1000)
+        dentro = [uuid4().hex for _ in range(1000)]
+        for jti in dentro:
+            filtro.agregar(jti)
+        self.assertTrue(all(jti in filtro for jti in dentro))
+        falsos = sum(uuid4().hex in filtro for _ in range(20000))
+        self.assertLess(falsos, 100)
+
+    def test_purgar_por_lotes(self):
+        ahora = timezone.now()
+        for i in range(5):
+            token = OutstandingToken.objects.create(jti=f'viejo{i}', token='x', expires_at=ahora - timedelta(days=1))
+            if i % 2:
+                BlacklistedToken.objects.create(token=token)
+        OutstandingToken.objects.create(jti='vigente', token='x', expires_at=ahora + timedelta(days=1))
+        self.assertEqual(purgar_expirados(lote=2), (5, 2))
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), ['vigente'])
+
+
+@override_settings(PASSWORD_HASHER_PROFILE='pbkdf2', PASSWORD_HASHERS=[
+    'usuarios.hashers.PBKDF2Ajustado', 'usuarios.hashers.Argon2Ajustado',
+], PASSWORD_PBKDF2_ITERATIONS=1000)
+class LoginTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = Usuario.objects.create_user(
+            username='eva', email='eva@tecnl.mx', password='Secreta-123', first_name='Eva',
+            last_name='Sol', email_verified=True,
+        )
+
+    def _login(self, password='Secreta-123', email='eva@tecnl.mx', ip='10.0.0.1'):
+        return APIClient(REMOTE_ADDR=ip).post('/api/auth/login/', {'email': email, 'password': password})
+
+    def test_cambio_de_costo_rehashea_sin_revocar_tokens(self):
+        access = self._login().data['access']
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertEqual(self._login().status_code, 200)
+        self.usuario.refresh_from_db()
+        self.assertTrue(self.usuario.password.startswith('pbkdf2_sha256$2000$'))
+        self.assertEqual(self.usuario.token_version, 0)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(client.get('/api/citas/citas/').status_code, 200)
+
+    @skipUnless(find_spec('argon2'), "argon2-cffi no está instalado")
+    def test_perfil_argon2_rehashea_pbkdf2(self):
+        with override_settings(PASSWORD_HASHERS=['usuarios.hashers.Argon2Ajustado', 'usuarios.hashers.PBKDF2Ajustado']):
+            self.assertEqual(self._login().status_code, 200)
+        self.usuario.refresh_from_db()
+        self.assertTrue(self.usuario.password.startswith('argon2$argon2id$v=19$m=19456,t=2,p=1$'))
+
+    @override_settings(LOGIN_THROTTLE_RATES={'login_ip': '3/min'})
+    def test_limite_por_ip(self):
+        for _ in range(3):
+            self.assertEqual(self._login(password='mala').status_code, 401)
+        response = self._login()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self._login(ip='10.0.0.2').status_code, 200)
+
+    @override_settings(LOGIN_THROTTLE_RATES={'login_cuenta': '3/min'})
+    def test_limite_de_fallos_por_cuenta(self):
+        for i in range(3):
+            self.assertEqual(self._login(password='mala', ip=f'10.0.1.{i}').status_code, 401)
+        self.assertEqual(self._login(ip='10.0.2.1').status_code, 429)
+        self.assertEqual(self._login(email=' EVA@tecnl.mx', ip='10.0.2.2').status_code, 429)
+
+    @override_settings(LOGIN_THROTTLE_RATES={'login_cuenta': '3/min'})
+    def test_los_inicios_correctos_no_cuentan(self):
+        for _ in range(5):
+            self.assertEqual(self._login().status_code, 200)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UsernameTests(TestCase):
+    def _registrar(self, i):
+        return APIClient().post('/api/auth/register/', {
+            'email': f'juan{i}@tecnl.mx', 'first_name': 'Juan', 'last_name': 'García', 'password': 'Secreta-123',
+        })
+
+    def test_sufijos_consecutivos(self):
+        nombres = [self._registrar(i).data['username'] for i in range(3)]
+        self.assertEqual(nombres, ['juan.garcía', 'juan.garcía1', 'juan.garcía2'])
+
+    def test_una_consulta_sin_importar_los_homonimos(self):
+        for nombre in ('ana.ruiz', 'ana.ruiz1', 'ana.ruiz12', 'ana.ruiz007', 'ana.ruizb', 'ana.ruiz.3', 'ana.ruiz2'):
+            Usuario.objects.create(username=nombre, email=f'{nombre}@tecnl.mx')
+        with self.assertNumQueries(1):
+            self.assertEqual(siguiente_username('ana.ruiz'), 'ana.ruiz13')
+        self.assertEqual(siguiente_username('ana.r'), 'ana.r')
+        self.assertEqual(siguiente_username('ana.ruiz0'), 'ana.ruiz0')
+
+    def test_sin_depender_del_orden_bytewise(self):
+        for nombre in ('ana.ruiz', 'ana.ruiz1', 'ana.ruiz9', 'ana.ruiz12', 'ana.ruiz-2', 'ana.ruiz:4', 'ana.ruizb'):
+            Usuario.objects.create(username=nombre, email=f'{nombre}@tecnl.mx')
+        # The path taken on PostgreSQL, where the collation may ignore ':' or sort it before the digits
+        with patch('usuarios.usernames.connection') as conexion:
+            conexion.vendor = 'postgresql'
+            self.assertEqual(siguiente_username('ana.ruiz'), 'ana.ruiz13')
+
+    def test_reintenta_si_otro_registro_tomo_el_nombre(self):
+        self._registrar(0)
+        # Simulates a concurrent registration that picked 'juan.garcía' first
+        with patch('usuarios.serializers.siguiente_username', side_effect=['juan.garcía', 'juan.garcía1']):
+            response = self._registrar(1)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['username'], 'juan.garcía1')
+
+    def test_correo_o_matricula_tomados_por_otro_registro(self):
+        Usuario.objects.create(username='otro', email='juan0@tecnl.mx', matricula='A0001')
+        datos = {
+            'email': 'juan0@tecnl.mx', 'first_name': 'Juan', 'last_name': 'García', 'password': 'Secreta-123',
+            'matricula': 'A0001',
+        }
+        # Straight to create(), as a registration that passed the unique validators before the other one
+        with patch('usuarios.serializers.siguiente_username') as siguiente:
+            siguiente.return_value = 'juan.garcía'
+            with self.assertRaises(ValidationError) as error:
+                UsuarioSerializer().create(datos)
+        self.assertEqual(set(error.exception.detail), {'email', 'matricula'})
+        self.assertEqual(siguiente.call_count, 1)
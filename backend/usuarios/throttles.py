@@ -0,0 +1,92 @@
+"""
+Login throttles (MyTokenObtainPairView).
+
+DRF's SimpleRateThrottle keeps a list of timestamps per client and rewrites it on
+every request. These use a fixed-window counter instead: one cache `add`, plus an
+`incr` after the first request of the window. Both are in-memory with the default
+locmem cache. Rates come from LOGIN_THROTTLE_RATES; a missing scope disables it.
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class ContadorThrottle(SimpleRateThrottle):
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    @property
+    def cache(self):
+        return caches[settings.LOGIN_THROTTLE_CACHE_ALIAS]
+
+    def get_rate(self):
+        return settings.LOGIN_THROTTLE_RATES.get(self.scope)
+
+    def clave_de_ventana(self, request, view=None):
+        clave = self.get_cache_key(request, view)
+        if clave is None:
+            return None
+        self.ventana = int(self.timer()) // self.duration
+        return f'{clave}:{self.ventana}'
+
+    def contar(self):
+        if self.cache.add(self.key, 1, self.duration):
+            return 1
+        try:
+            return self.cache.incr(self.key)
+        except ValueError:
+            # The window expired between add and incr
+            self.cache.set(self.key, 1, self.duration)
+            return 1
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.clave_de_ventana(request, view)
+        if self.key is None:
+            return True
+        return self.contar() <= self.num_requests
+
+    def wait(self):
+        return max((self.ventana + 1) * self.duration - self.timer(), 0)
+
+
+class LoginIPThrottle(ContadorThrottle):
+    """Every login attempt from one client address. Set NUM_PROXIES behind a reverse proxy."""
+
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginCuentaThrottle(ContadorThrottle):
+    """
+    Failed logins for one account, whatever address they come from.
+
+    Only failures count (the view calls `registrar_fallo`), so a student who logs in
+    from several devices is never locked out by their own successful logins.
+    """
+
+    scope = 'login_cuenta'
+
+    def get_cache_key(self, request, view):
+        cuenta = request.data.get('email') if hasattr(request.data, 'get') else None
+        if not isinstance(cuenta, str) or not cuenta.strip():
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': cuenta.strip().lower()}
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.clave_de_ventana(request, view)
+        if self.key is None:
+            return True
+        return self.cache.get(self.key, 0) < self.num_requests
+
+    def registrar_fallo(self, request):
+        if self.rate is None:
+            return
+        self.key = self.clave_de_ventana(request)
+        if self.key is not None:
+            self.contar()
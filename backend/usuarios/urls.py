@@ -1,11 +1,12 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
+from .authentication import VersionedTokenRefreshSerializer
 from .views import RegisterView, MyTokenObtainPairView
 from .verification_views import verify_email
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', MyTokenObtainPairView.as_view(), name='login'),
-    path('refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('refresh/', TokenRefreshView.as_view(serializer_class=VersionedTokenRefreshSerializer), name='token_refresh'),
     path('verify-email/<str:uidb64>/<str:token>/', verify_email, name='verify_email'),
 ]
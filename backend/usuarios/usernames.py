@@ -0,0 +1,46 @@
+"""
+Generated usernames: "nombre.apellido", then "nombre.apellido1", "nombre.apellido2", ...
+
+The next free name comes from one query, whatever the number of namesakes. A
+prefix match (`LIKE 'base%'`) narrows the rows to the base's namesakes: on
+PostgreSQL it uses the varchar_pattern_ops index Django adds next to the unique
+one, whatever the database collation. SQLite's LIKE cannot use an index, but
+SQLite compares bytewise, so there the range [base, base + ':') is added, which
+holds every base-plus-digits name (':' follows '9') and seeks the unique index.
+A regex keeps only the exact suffixed names, and the largest suffix comes back
+as an aggregate. Two concurrent
+registrations can still pick the same name, so the caller retries on IntegrityError
+(UsuarioSerializer.create).
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import BigIntegerField, Case, Max, Q, Value, When
+from django.db.models.functions import Cast, Substr
+
+from .models import Usuario
+
+USERNAME_ATTEMPTS = 5
+# Leaves room for a nine-digit suffix within the 150-character username column
+USERNAME_BASE_MAX_LENGTH = 141
+
+
+def _homonimos(base):
+    filtro = Q(username__startswith=base)
+    if connection.vendor == 'sqlite':
+        # Only valid with bytewise comparison; PostgreSQL collations ignore ':' or sort it before digits
+        filtro &= Q(username__gte=base, username__lt=f'{base}:')
+    return filtro
+
+
+def siguiente_username(base):
+    ultimo = Usuario.objects.filter(
+        _homonimos(base), username__regex=rf'^{re.escape(base)}([1-9][0-9]{{0,8}})?$',
+    ).aggregate(ultimo=Max(Case(
+        When(username=base, then=Value(0, output_field=BigIntegerField())),
+        default=Cast(Substr('username', len(base) + 1), BigIntegerField()),
+    )))['ultimo']
+    if ultimo is None:
+        return base
+    return f'{base}{ultimo + 1}'
@@ -1,8 +1,10 @@
 from rest_framework import generics, status
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.permissions import AllowAny
 from .serializers import UsuarioSerializer, MyTokenObtainPairSerializer
+from .throttles import LoginCuentaThrottle, LoginIPThrottle
 
 class RegisterView(generics.CreateAPIView):
     serializer_class = UsuarioSerializer
@@ -11,3 +13,12 @@ class RegisterView(generics.CreateAPIView):
 class MyTokenObtainPairView(TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
     permission_classes = [AllowAny]
+    # Checked before the serializer runs, so a throttled attempt never hashes a password
+    throttle_classes = [LoginIPThrottle, LoginCuentaThrottle]
+
+    def post(self, request, *args, **kwargs):
+        try:
+            return super().post(request, *args, **kwargs)
+        except AuthenticationFailed:
+            LoginCuentaThrottle().registrar_fallo(request)
+            raise
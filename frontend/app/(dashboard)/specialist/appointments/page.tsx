@@ -1,9 +1,11 @@
 "use client";
 
 import { useAuth } from "@/context/AuthContext";
-import { useEffect, useState, useCallback } from "react";
+import { useEffect, useState } from "react";
 import { useRouter } from "next/navigation";
 import api from "@/lib/axios";
+import { usePaginatedList } from "@/lib/pagination";
+import { useServerEvents } from "@/lib/events";
 import { Button } from "@/components/ui/button";
 import { Card, CardHeader, CardTitle } from "@/components/ui/card";
 import { Badge } from "@/components/ui/badge";
@@ -33,28 +35,20 @@ interface Cita {
 export default function SpecialistAppointments() {
     const { user, isLoading } = useAuth();
     const router = useRouter();
-    const [citas, setCitas] = useState<Cita[]>([]);
-    const [loading, setLoading] = useState(true);
+    // Newest first, a page at a time
+    const { items: citas, hasMore, loading, loadingMore, reload: fetchCitas, loadMore } = usePaginatedList<Cita>("/citas/citas/");
     const [filter, setFilter] = useState<'PENDIENTE' | 'CONFIRMADA' | 'ALL'>('PENDIENTE');
     const [processingId, setProcessingId] = useState<number | null>(null);
 
-    const fetchCitas = useCallback(async () => {
-        try {
-            const response = await api.get("/citas/citas/");
-            setCitas(response.data);
-        } catch (error) {
-            console.error("Error fetching citas", error);
-        } finally {
-            setLoading(false);
-        }
-    }, []);
-
     useEffect(() => {
         if (!isLoading && user?.rol === 'ESPECIALISTA') {
             fetchCitas();
         }
     }, [isLoading, user, fetchCitas]);
 
+    // New bookings and state changes are pushed by the server
+    useServerEvents({ cita: () => fetchCitas() }, !isLoading && user?.rol === 'ESPECIALISTA');
+
     const handleAction = async (id: number, action: 'confirmar' | 'rechazar' | 'completar') => {
         if (!confirm(`¿Estás seguro de que deseas ${action} esta cita?`)) return;
         setProcessingId(id);
@@ -219,6 +213,15 @@ export default function SpecialistAppointments() {
                         ))}
                     </div>
                 )}
+
+                {!loading && hasMore && (
+                    <div className="flex justify-center">
+                        <Button variant="outline" onClick={loadMore} disabled={loadingMore}>
+                            {loadingMore && <Loader2 className="h-4 w-4 mr-2 animate-spin" />}
+                            Cargar más
+                        </Button>
+                    </div>
+                )}
             </div>
         </div>
     );
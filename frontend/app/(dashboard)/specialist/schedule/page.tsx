@@ -1,9 +1,10 @@
 "use client";
 
 import { useAuth } from "@/context/AuthContext";
-import { useEffect, useState, useCallback } from "react";
+import { useEffect, useState } from "react";
 import { useRouter } from "next/navigation";
 import api from "@/lib/axios";
+import { usePaginatedList } from "@/lib/pagination";
 import axios from "axios";
 import { Button } from "@/components/ui/button";
 import { Card, CardContent, CardHeader, CardTitle, CardDescription } from "@/components/ui/card";
@@ -42,8 +43,16 @@ import { Calendar } from "@/components/ui/calendar-custom";
 export default function SpecialistSchedule() {
     const { user, isLoading } = useAuth();
     const router = useRouter();
-    const [slots, setSlots] = useState<Horario[]>([]);
-    const [loadingSlots, setLoadingSlots] = useState(true);
+    // HorarioViewSet returns only the specialist's own slots, a page at a time
+    const {
+        items: slots,
+        setItems: setSlots,
+        hasMore,
+        loading: loadingSlots,
+        loadingMore,
+        reload: fetchSlots,
+        loadMore,
+    } = usePaginatedList<Horario>("/agenda/horarios/");
     const [isCreating, setIsCreating] = useState(false);
     const [selectedDate, setSelectedDate] = useState<Date | undefined>(undefined);
 
@@ -59,21 +68,6 @@ export default function SpecialistSchedule() {
         resolver: zodResolver(slotSchema),
     });
 
-    const fetchSlots = useCallback(async () => {
-        try {
-            // Backend filters by 'me' automatically if we implemented it, 
-            // or we need to filter. Let's assume the ViewSet returns all if not filtered,
-            // so strictly we should filter or the backend should.
-            // Checking backend views.py (from memory/context): HorarioViewSet get_queryset filters by user if specialist.
-            const response = await api.get("/agenda/horarios/");
-            setSlots(response.data);
-        } catch (error) {
-            console.error("Error fetching slots", error);
-        } finally {
-            setLoadingSlots(false);
-        }
-    }, []);
-
     useEffect(() => {
         if (!isLoading && user?.rol === 'ESPECIALISTA') {
             fetchSlots();
@@ -127,7 +121,7 @@ export default function SpecialistSchedule() {
         if (!confirm("¿Estás seguro de eliminar este horario?")) return;
         try {
             await api.delete(`/agenda/horarios/${id}/`);
-            setSlots(slots.filter(s => s.id !== id));
+            setSlots(current => current.filter(s => s.id !== id));
         } catch (error) {
             console.error("Error deleting slot", error);
             alert("No se pudo eliminar el horario. Es posible que ya tenga una cita agendada.");
@@ -237,6 +231,14 @@ export default function SpecialistSchedule() {
                                             </div>
                                         </div>
                                     ))}
+                                    {hasMore && (
+                                        <div className="flex justify-center pt-2">
+                                            <Button variant="outline" onClick={loadMore} disabled={loadingMore}>
+                                                {loadingMore && <Loader2 className="mr-2 h-4 w-4 animate-spin" />}
+                                                Cargar más
+                                            </Button>
+                                        </div>
+                                    )}
                                 </div>
                             )}
                         </CardContent>
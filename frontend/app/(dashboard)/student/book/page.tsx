@@ -4,6 +4,8 @@ import { useAuth } from "@/context/AuthContext";
 import { useEffect, useState, useCallback, useMemo } from "react";
 import { useRouter } from "next/navigation";
 import api from "@/lib/axios";
+import { fetchAllPages } from "@/lib/pagination";
+import { useServerEvents } from "@/lib/events";
 import axios from "axios";
 import { Button } from "@/components/ui/button";
 import { Card, CardContent, CardHeader, CardTitle, CardDescription } from "@/components/ui/card";
@@ -36,6 +38,7 @@ export default function StudentBooking() {
     const router = useRouter();
 
     // Data
+    const [availableDates, setAvailableDates] = useState<string[]>([]);
     const [slots, setSlots] = useState<Horario[]>([]);
     const [loadingSlots, setLoadingSlots] = useState(true);
 
@@ -47,37 +50,64 @@ export default function StudentBooking() {
     const [isBooking, setIsBooking] = useState(false);
     const [success, setSuccess] = useState(false);
 
-    const fetchSlots = useCallback(async () => {
+    const fetchAvailableDates = useCallback(async () => {
         try {
-            // Backend: Get all available slots
-            const response = await api.get("/agenda/horarios/", {
-                params: { disponible: true }
-            });
-            setSlots(response.data);
+            // Backend: only the dates that still have free slots
+            const response = await api.get<{ fecha: string; libres: number }[]>("/agenda/horarios/fechas-disponibles/");
+            setAvailableDates(response.data.map(f => f.fecha));
         } catch (error) {
-            console.error("Error fetching slots", error);
+            console.error("Error fetching available dates", error);
         } finally {
             setLoadingSlots(false);
         }
     }, []);
 
+    const fetchSlots = useCallback(async (dateStr: string) => {
+        try {
+            // Backend filters by date and availability, already ordered by hora_inicio
+            setSlots(await fetchAllPages<Horario>("/agenda/horarios/", {
+                disponible: true,
+                desde: dateStr,
+                hasta: dateStr,
+            }));
+        } catch (error) {
+            console.error("Error fetching slots", error);
+        }
+    }, []);
+
     useEffect(() => {
         if (!isLoading && user?.rol === 'ALUMNO') {
-            fetchSlots();
+            fetchAvailableDates();
+        }
+    }, [isLoading, user, fetchAvailableDates]);
+
+    const selectedDateStr = useMemo(() => {
+        if (!selectedDate) return null;
+        return `${selectedDate.getFullYear()}-${String(selectedDate.getMonth() + 1).padStart(2, '0')}-${String(selectedDate.getDate()).padStart(2, '0')}`;
+    }, [selectedDate]);
+
+    useEffect(() => {
+        if (!isLoading && user?.rol === 'ALUMNO' && selectedDateStr) {
+            fetchSlots(selectedDateStr);
+        } else {
+            setSlots([]);
         }
-    }, [isLoading, user, fetchSlots]);
+    }, [isLoading, user, selectedDateStr, fetchSlots]);
 
-    // Derived state: Available dates (string format)
-    const availableDates = useMemo(() => {
-        return Array.from(new Set(slots.map(s => s.fecha)));
-    }, [slots]);
+    // Live availability: drop slots other students take, reload the day when one is freed
+    useServerEvents({
+        horario: (event) => {
+            if (!event.disponible) {
+                setSlots(prev => prev.filter(slot => slot.id !== event.id));
+            } else {
+                fetchAvailableDates();
+                if (event.fecha === selectedDateStr) fetchSlots(event.fecha);
+            }
+        },
+    }, !isLoading && user?.rol === 'ALUMNO');
 
-    // Derived state: Slots for selected date
-    const daySlots = useMemo(() => {
-        if (!selectedDate) return [];
-        const dateStr = `${selectedDate.getFullYear()}-${String(selectedDate.getMonth() + 1).padStart(2, '0')}-${String(selectedDate.getDate()).padStart(2, '0')}`;
-        return slots.filter(s => s.fecha === dateStr).sort((a, b) => a.hora_inicio.localeCompare(b.hora_inicio));
-    }, [slots, selectedDate]);
+    // Slots for selected date
+    const daySlots = selectedDateStr ? slots : [];
 
     const handleBook = async () => {
         if (!bookingSlot || !acceptPrivacy) return;
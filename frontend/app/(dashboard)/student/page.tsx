@@ -35,7 +35,7 @@ export default function StudentDashboard() {
     const fetchCitas = useCallback(async () => {
         try {
             const response = await api.get("/citas/citas/");
-            setCitas(response.data);
+            setCitas(response.data.results);
         } catch (error) {
             console.error("Error fetching citas", error);
         } finally {
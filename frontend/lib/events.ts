@@ -0,0 +1,63 @@
+"use client";
+
+import { useEffect, useRef } from "react";
+
+const EVENTS_URL = "http://localhost:8000/api/notificaciones/eventos/";
+
+export interface HorarioEvent {
+    id: number;
+    especialista: number;
+    fecha: string;
+    hora_inicio: string;
+    disponible: boolean;
+}
+
+export interface CitaEvent {
+    id: number;
+    estado: string;
+    horario: number;
+}
+
+interface EventHandlers {
+    horario?: (event: HorarioEvent) => void;
+    cita?: (event: CitaEvent) => void;
+}
+
+// Subscribes to the server-sent events stream while the component is mounted.
+// EventSource cannot send headers, so the access token goes in the query string;
+// when the server closes the stream (expired token) we reconnect with the current one.
+export function useServerEvents(handlers: EventHandlers, enabled = true) {
+    const handlersRef = useRef(handlers);
+    useEffect(() => {
+        handlersRef.current = handlers;
+    });
+
+    useEffect(() => {
+        if (!enabled || typeof window === "undefined") return;
+        let source: EventSource | null = null;
+        let retry: ReturnType<typeof setTimeout> | undefined;
+
+        const connect = () => {
+            const token = localStorage.getItem("access_token");
+            if (!token) return;
+            source = new EventSource(`${EVENTS_URL}?token=${encodeURIComponent(token)}`);
+            source.addEventListener("horario", (event) => {
+                handlersRef.current.horario?.(JSON.parse((event as MessageEvent).data));
+            });
+            source.addEventListener("cita", (event) => {
+                handlersRef.current.cita?.(JSON.parse((event as MessageEvent).data));
+            });
+            source.onerror = () => {
+                if (source?.readyState === EventSource.CLOSED) {
+                    retry = setTimeout(connect, 3000);
+                }
+            };
+        };
+
+        connect();
+        return () => {
+            clearTimeout(retry);
+            source?.close();
+        };
+    }, [enabled]);
+}
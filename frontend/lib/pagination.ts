@@ -0,0 +1,67 @@
+"use client";
+
+import { useCallback, useRef, useState } from "react";
+import api from "@/lib/axios";
+
+export interface Page<T> {
+    next: string | null;
+    results: T[];
+}
+
+// Follows the cursor `next` links of a paginated list endpoint until the last page.
+// Only for lists that are short by construction (e.g. one day's free slots); long
+// lists are shown a page at a time with usePaginatedList.
+export async function fetchAllPages<T>(url: string, params?: Record<string, unknown>): Promise<T[]> {
+    const items: T[] = [];
+    let response = await api.get<Page<T>>(url, { params });
+    items.push(...response.data.results);
+    while (response.data.next) {
+        response = await api.get<Page<T>>(response.data.next);
+        items.push(...response.data.results);
+    }
+    return items;
+}
+
+// A paginated list endpoint shown a page at a time: `reload` fetches the first page
+// again, `loadMore` appends the page behind the cursor `next` link ("Cargar más").
+export function usePaginatedList<T>(url: string, params?: Record<string, unknown>) {
+    const [items, setItems] = useState<T[]>([]);
+    const [next, setNext] = useState<string | null>(null);
+    const [loading, setLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState(false);
+    // A reload drops whatever page was still on its way for the previous list
+    const generation = useRef(0);
+    const paramsKey = JSON.stringify(params ?? {});
+
+    const reload = useCallback(async () => {
+        const current = ++generation.current;
+        try {
+            const response = await api.get<Page<T>>(url, { params: JSON.parse(paramsKey) });
+            if (current !== generation.current) return;
+            setItems(response.data.results);
+            setNext(response.data.next);
+        } catch (error) {
+            console.error(`Error fetching ${url}`, error);
+        } finally {
+            setLoading(false);
+        }
+    }, [url, paramsKey]);
+
+    const loadMore = useCallback(async () => {
+        if (!next) return;
+        const current = generation.current;
+        setLoadingMore(true);
+        try {
+            const response = await api.get<Page<T>>(next);
+            if (current !== generation.current) return;
+            setItems(previous => [...previous, ...response.data.results]);
+            setNext(response.data.next);
+        } catch (error) {
+            console.error(`Error fetching ${next}`, error);
+        } finally {
+            setLoadingMore(false);
+        }
+    }, [next]);
+
+    return { items, setItems, hasMore: next !== null, loading, loadingMore, reload, loadMore };
+}